@@ -0,0 +1,442 @@
+import gc
+import time
+import tempfile
+import tracemalloc
+from pathlib import Path
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Optional,
+)
+
+import yaml
+import typer
+import numpy as np
+import pandas as pd
+import networkx as nx
+from loguru import logger
+
+from src.config import (
+    PARAMS,
+    REPORTS_DIR,
+)
+from src.data_utils import (
+    affiliations,
+    professions,
+    races,
+)
+
+app = typer.Typer()
+
+BENCHMARKS_DIR = REPORTS_DIR / 'benchmarks'
+
+# Size of the 1x synthetic dataset, roughly the shape of malazan_network_data.csv
+BASE_CHARACTERS = 1_000
+BASE_ROWS = 50_000
+BOOKS = 9
+CHAPTERS_PER_BOOK = 25
+GROUPS_PER_1000_CHARACTERS = 25
+
+
+def generate_cooccurrence_data(scale: float = 1, seed: int = 42) -> pd.DataFrame:
+    """
+    Generate a synthetic co-occurrence dataset with the schema of `malazan_network_data.csv`.
+
+    Characters belong to storyline groups and have Zipf-distributed prominence; most co-occurrences happen
+    inside a group, so the resulting graph is clustered and heavy-tailed like the real one.
+    :param scale: size multiplier of the base dataset (characters and rows)
+    :param seed: random seed for reproducibility
+    :return: DataFrame with columns `name1`, `name2`, `book`, `chapter` (one row per co-occurrence)
+    """
+    rng = np.random.default_rng(seed)
+    n_characters = int(BASE_CHARACTERS * scale)
+    n_rows = int(BASE_ROWS * scale)
+    n_groups = max(1, n_characters * GROUPS_PER_1000_CHARACTERS // 1000)
+
+    group = rng.integers(n_groups, size=n_characters)
+    # every storyline has its own protagonists: Zipf prominence by rank inside the group, times a group weight
+    order = np.argsort(group, kind='stable')
+    group_starts = np.searchsorted(group[order], np.arange(n_groups))
+    rank = np.empty(n_characters, dtype=np.int64)
+    rank[order] = np.arange(n_characters) - group_starts[group[order]] + 1
+    group_weight = 1 / rng.permutation(np.arange(1, n_groups + 1)) ** 0.3
+    prominence = group_weight[group] / rank ** 0.8
+
+    # draw the first character by prominence and the second by prominence within the same group, or for 30% of
+    # rows within a neighboring group (storylines cross), through the cumulative prominence of group-sorted characters
+    first = rng.choice(n_characters, size=n_rows, p=prominence / prominence.sum())
+    cumulative = np.concatenate([[0], np.cumsum(prominence[order])])
+    group_bounds = cumulative[np.searchsorted(group[order], np.arange(n_groups + 1))]
+    second_group = group[first]
+    cross_group = rng.random(n_rows) < 0.3
+    second_group[cross_group] = (second_group[cross_group] + rng.choice([-1, 1], size=cross_group.sum())) % n_groups
+    low, high = group_bounds[second_group], group_bounds[second_group + 1]
+    position = np.searchsorted(cumulative, low + rng.random(n_rows) * (high - low), side='right') - 1
+    second = order[np.clip(position, 0, n_characters - 1)]
+
+    keep = first != second
+    first, second = first[keep], second[keep]
+    names = np.array([f'Character {i}' for i in range(n_characters)], dtype=object)
+    book = rng.integers(1, BOOKS + 1, size=len(first))
+    chapter = rng.integers(1, CHAPTERS_PER_BOOK + 1, size=len(first))
+    return pd.DataFrame({
+        'name1': names[np.minimum(first, second)],
+        'name2': names[np.maximum(first, second)],
+        'book': [f'book_{b:02d}' for b in book],
+        'chapter': [f'chapter_{c:03d}' for c in chapter],
+    })
+
+
+def generate_nodes_data(names: List[str], seed: int = 42) -> pd.DataFrame:
+    """
+    Generate a synthetic interim nodes table (the output of `dataset.get_nodes_data`) for the given characters.
+    :param names: character names
+    :param seed: random seed for reproducibility
+    :return: DataFrame with the columns of `nodes_data.csv`
+    """
+    rng = np.random.default_rng(seed)
+    n = len(names)
+
+    def sample(values: List, missing_share: float = 0.3) -> np.ndarray:
+        column = rng.choice(np.array(values, dtype=object), size=n)
+        column[rng.random(n) < missing_share] = None
+        return column
+
+    first_book = rng.integers(1, BOOKS + 1, size=n)
+    books_appearance = rng.integers(1, BOOKS + 2 - first_book)
+    total_words_count = rng.integers(0, 100_000, size=n)
+    return pd.DataFrame({
+        'id': names,
+        'gender': sample(['Male', 'Female']),
+        'info': sample(professions + races, missing_share=0.0),
+        'profession': sample(professions),
+        'norm_name': [str(name).lower() for name in names],
+        'total_words_count': total_words_count,
+        'books_appearance': books_appearance,
+        'first_book_appearance': first_book,
+        'last_book_appearance': first_book + books_appearance - 1,
+        'pov_words_per_book_with_pov': total_words_count // books_appearance,
+        'affiliation_first': sample(affiliations),
+        'affiliation_second': sample(affiliations),
+        'race_first': sample(races),
+    })
+
+
+class SyntheticPipelineData:
+    """
+    Lazily materialized synthetic inputs of every pipeline stage at one scale.
+
+    :param scale: size multiplier of the base dataset
+    :param workdir: directory for the raw/interim/processed files of this scale
+    :param seed: random seed for reproducibility
+    """
+
+    def __init__(self, scale: float, workdir: Path, seed: int = 42):
+        self.scale = scale
+        self.seed = seed
+        self.raw_dir = workdir / 'raw'
+        self.interim_dir = workdir / 'interim'
+        self.processed_dir = workdir / 'processed'
+        for folder in (self.raw_dir, self.interim_dir, self.processed_dir):
+            folder.mkdir(parents=True, exist_ok=True)
+        self._graph = None
+        self._largest_cc = None
+
+    @property
+    def raw_edges_path(self) -> Path:
+        path = self.raw_dir / 'malazan_network_data.csv'
+        if not path.exists():
+            generate_cooccurrence_data(self.scale, self.seed).to_csv(path, index=False)
+        return path
+
+    @property
+    def edges_path(self) -> Path:
+        from src.dataset import get_edges_data
+
+        path = self.interim_dir / 'edges_data.csv'
+        if not path.exists():
+            _ = self.raw_edges_path
+            get_edges_data(raw_folder=self.raw_dir, processed_folder=self.interim_dir)
+        return path
+
+    @property
+    def nodes_path(self) -> Path:
+        path = self.interim_dir / 'nodes_data.csv'
+        if not path.exists():
+            edges = pd.read_csv(self.edges_path, usecols=['name1', 'name2'])
+            names = pd.unique(edges[['name1', 'name2']].to_numpy().ravel()).tolist()
+            generate_nodes_data(names, self.seed).to_csv(path, index=False)
+        return path
+
+    @property
+    def graph(self) -> nx.Graph:
+        """Co-occurrence graph filtered like `dataset_process.main`, without the node metrics"""
+        if self._graph is None:
+            with open(PARAMS, 'r') as f:
+                threshold = yaml.safe_load(f)['min_co_occurence_threshold']
+            edges = pd.read_csv(self.edges_path)
+            edges = edges[edges['total_co_occurance'] > threshold]
+            self._graph = nx.from_pandas_edgelist(
+                edges, source='name1', target='name2', edge_attr='total_co_occurance'
+            )
+            self._graph.remove_edges_from(nx.selfloop_edges(self._graph))
+        return self._graph
+
+    @property
+    def largest_cc(self) -> nx.Graph:
+        if self._largest_cc is None:
+            self._largest_cc = self.graph.subgraph(max(nx.connected_components(self.graph), key=len)).copy()
+        return self._largest_cc
+
+    def top_nodes(self, k: int = 20) -> List[str]:
+        return [node for node, _ in sorted(self.graph.degree(), key=lambda x: x[1], reverse=True)[:k]]
+
+
+def _bench_find_match(data: SyntheticPipelineData) -> Callable:
+    from src.dataset import find_match
+
+    rng = np.random.default_rng(data.seed)
+    words = np.array(' '.join(professions + races + affiliations).split() + ['of', 'the', 'a', 'warrior'])
+    n_descriptions = int(BASE_CHARACTERS * data.scale)
+    descriptions = [' '.join(rng.choice(words, size=12)) for _ in range(n_descriptions)]
+    return lambda: [find_match(text, races) for text in descriptions]
+
+
+def _bench_get_edges_data(data: SyntheticPipelineData) -> Callable:
+    from src.dataset import get_edges_data
+
+    raw_folder = data.raw_edges_path.parent
+    return lambda: get_edges_data(raw_folder=raw_folder, processed_folder=data.processed_dir)
+
+
+def _bench_dataset_process(data: SyntheticPipelineData) -> Callable:
+    from src import dataset_process
+
+    edges_path, nodes_path = data.edges_path, data.nodes_path
+    # the undecorated stage, so the repetitions do not overwrite the pipeline's timings in reports/timings.yaml
+    return lambda: dataset_process.main.__wrapped__(
+        input_edges_path=edges_path,
+        input_nodes_path=nodes_path,
+        output_dir=data.processed_dir,
+        params_path=PARAMS,
+    )
+
+
+def _bench_centralities(data: SyntheticPipelineData) -> Callable:
+    from src.my_utils import centralities
+
+    graph = data.graph
+    return lambda: centralities(graph)
+
+
+def _bench_similarity(data: SyntheticPipelineData) -> Callable:
+    import matplotlib
+    matplotlib.use('Agg')
+    from src.structural_analysis import NetworkStructuralAnalyser
+
+    graph, top_nodes = data.graph, data.top_nodes()
+    return lambda: NetworkStructuralAnalyser.plot_node_similarity_matrix(
+        graph, top_nodes=top_nodes, similarity_metric='jaccard', figures_dir=data.processed_dir
+    )
+
+
+def _bench_cliques(data: SyntheticPipelineData) -> Callable:
+    from src.community_detection import get_clique_size_distribution
+
+    graph = data.graph
+    return lambda: get_clique_size_distribution(graph, filename=data.processed_dir / 'table_clique_size_distribution.md')
+
+
+def _bench_louvain(data: SyntheticPipelineData) -> Callable:
+    from src.community_detection import FastCommunityUnfolding
+
+    algorithm = FastCommunityUnfolding(data.largest_cc, weight='total_co_occurance')
+    return lambda: algorithm.run()
+
+
+def _bench_louvain_networkx(data: SyntheticPipelineData) -> Callable:
+    graph = data.largest_cc
+    return lambda: nx.community.louvain_communities(graph, weight='total_co_occurance', seed=42)
+
+
+def _bench_leiden(data: SyntheticPipelineData) -> Callable:
+    from src.community_detection import WeightedLeiden
+
+    algorithm = WeightedLeiden(data.largest_cc, weight='total_co_occurance')
+    return lambda: algorithm.run()
+
+
+def _bench_lpa(data: SyntheticPipelineData) -> Callable:
+    from src.community_detection import LPACommunityDetection
+
+    algorithm = LPACommunityDetection(data.largest_cc, weight='total_co_occurance')
+    return lambda: algorithm.run()
+
+
+def _bench_k_clique(data: SyntheticPipelineData) -> Callable:
+    from src.community_detection import KCliquePercolation
+
+    with open(PARAMS, 'r') as f:
+        k = yaml.safe_load(f)['k_clique_percolation_base']
+    algorithm = KCliquePercolation(data.largest_cc)
+    return lambda: algorithm.run(k)
+
+
+def _bench_girvan_newman(data: SyntheticPipelineData) -> Callable:
+    from src.community_detection import GirvanNewmanAlgo
+
+    algorithm = GirvanNewmanAlgo(data.largest_cc)
+    return lambda: algorithm.run(1)
+
+
+def _bench_walktrap(data: SyntheticPipelineData) -> Callable:
+    from src.community_detection import Walktrap
+
+    algorithm = Walktrap(data.largest_cc)
+    return lambda: algorithm.run()
+
+
+# name -> (setup returning the timed callable, largest scale the benchmark is run at)
+BENCHMARKS: Dict[str, tuple] = {
+    'find_match': (_bench_find_match, 1000),
+    'get_edges_data': (_bench_get_edges_data, 100),
+    'dataset_process.main': (_bench_dataset_process, 10),
+    'centralities': (_bench_centralities, 10),
+    'similarity': (_bench_similarity, 1000),
+    'cliques': (_bench_cliques, 100),
+    'community.louvain': (_bench_louvain, 1000),
+    'community.louvain_networkx': (_bench_louvain_networkx, 100),
+    'community.leiden': (_bench_leiden, 1000),
+    'community.lpa': (_bench_lpa, 100),
+    'community.k_clique': (_bench_k_clique, 100),
+    'community.girvan_newman': (_bench_girvan_newman, 10),
+    'community.walktrap': (_bench_walktrap, 10),
+}
+
+
+def measure(func: Callable, repeat: int = 3) -> Dict[str, float]:
+    """
+    Time a callable and measure the peak of memory it allocates.
+    :param func: zero-argument callable to benchmark
+    :param repeat: number of timed runs (the fastest one is reported)
+    :return: dictionary with `time_s` (best wall time), `time_mean_s` and `peak_memory_mb` (tracemalloc peak)
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    # memory is measured in a separate run, tracemalloc slows down the timed code
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'time_s': round(min(timings), 6),
+        'time_mean_s': round(float(np.mean(timings)), 6),
+        'peak_memory_mb': round(peak / 2 ** 20, 3),
+    }
+
+
+def _graph_size(data: SyntheticPipelineData) -> Dict[str, int]:
+    return {'nodes': data.graph.number_of_nodes(), 'edges': data.graph.number_of_edges()}
+
+
+@app.command()
+def run(
+        scales: List[float] = typer.Option([10, 100, 1000], help="Dataset size multipliers"),
+        benchmarks: Optional[List[str]] = typer.Option(None, help="Benchmarks to run (default: all)"),
+        repeat: int = 3,
+        force: bool = typer.Option(False, help="Ignore the largest scale of every benchmark"),
+        output_path: Path = BENCHMARKS_DIR / 'results.yaml',
+        save_baseline: bool = typer.Option(False, help="Also store the results as the comparison baseline"),
+        seed: int = 42,
+):
+    """Run the benchmark suite on synthetic datasets and write machine-readable results"""
+    from src import figure_cache
+
+    # outputs of repeated runs are identical, make sure every run renders instead of hitting the cache
+    figure_cache.FORCE_RENDER = True
+    selected = benchmarks or list(BENCHMARKS)
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        raise typer.BadParameter(f"Unknown benchmarks: {sorted(unknown)}")
+
+    results = {'benchmarks': {}}
+    for scale in scales:
+        with tempfile.TemporaryDirectory() as workdir:
+            data = SyntheticPipelineData(scale, Path(workdir), seed=seed)
+            for name in selected:
+                setup, max_scale = BENCHMARKS[name]
+                if scale > max_scale and not force:
+                    logger.info(f"Skipping {name} at {scale}x (largest scale: {max_scale}x)")
+                    continue
+                logger.info(f"Benchmarking {name} at {scale}x")
+                entry = measure(setup(data), repeat=repeat)
+                entry.update(_graph_size(data))
+                results['benchmarks'].setdefault(name, {})[f'{scale:g}x'] = entry
+                logger.info(f"{name} at {scale}x: {entry['time_s']:.3f}s, {entry['peak_memory_mb']:.1f} MB")
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w') as f:
+        yaml.safe_dump(results, f, sort_keys=False)
+    if save_baseline:
+        BENCHMARKS_DIR.mkdir(parents=True, exist_ok=True)
+        with open(BENCHMARKS_DIR / 'baseline.yaml', 'w') as f:
+            yaml.safe_dump(results, f, sort_keys=False)
+    logger.success(f"Benchmark results saved to {output_path}")
+
+
+@app.command()
+def compare(
+        current_path: Path = BENCHMARKS_DIR / 'results.yaml',
+        baseline_path: Path = BENCHMARKS_DIR / 'baseline.yaml',
+        time_tolerance: float = typer.Option(0.2, help="Allowed relative slowdown before flagging a regression"),
+        memory_tolerance: float = typer.Option(0.2, help="Allowed relative memory growth"),
+):
+    """Compare benchmark results with the stored baseline and exit with an error on regressions"""
+    with open(current_path, 'r') as f:
+        current = yaml.safe_load(f)['benchmarks']
+    with open(baseline_path, 'r') as f:
+        baseline = yaml.safe_load(f)['benchmarks']
+
+    rows = []
+    for name, per_scale in current.items():
+        for scale, entry in per_scale.items():
+            reference = baseline.get(name, {}).get(scale)
+            if reference is None:
+                continue
+            time_ratio = entry['time_s'] / reference['time_s'] if reference['time_s'] else np.nan
+            memory_ratio = (
+                entry['peak_memory_mb'] / reference['peak_memory_mb'] if reference['peak_memory_mb'] else np.nan
+            )
+            rows.append({
+                'benchmark': name,
+                'scale': scale,
+                'baseline_s': reference['time_s'],
+                'current_s': entry['time_s'],
+                'time_ratio': round(time_ratio, 3),
+                'memory_ratio': round(memory_ratio, 3),
+                'regression': bool(time_ratio > 1 + time_tolerance or memory_ratio > 1 + memory_tolerance),
+            })
+
+    comparison = pd.DataFrame(rows)
+    if comparison.empty:
+        logger.warning("No benchmarks in common with the baseline")
+        return
+    print(comparison.to_markdown(index=False))
+
+    regressions = comparison[comparison['regression']]
+    if not regressions.empty:
+        logger.error(f"{len(regressions)} regression(s): {', '.join(regressions['benchmark'] + '@' + regressions['scale'])}")
+        raise typer.Exit(code=1)
+    logger.success("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    app()
@@ -1,16 +1,21 @@
 from collections import Counter
 from pathlib import Path
-from typing import Union
+from typing import (
+    List,
+    Sequence,
+    Union,
+)
 from loguru import logger
 
 import numpy as np
 import networkx as nx
 import pandas as pd
-from cdlib import algorithms
-import matplotlib.pyplot as plt
 
+from src import community_engine, layout, partition_quality
 from src.config import FIGURES_DIR
+from src.graph_arrays import graph_arrays
 from src.my_utils import save_table_to_markdown
+from src.profiling import profiled
 
 
 class CommunityDetectionAlgorithm:
@@ -22,6 +27,7 @@ class CommunityDetectionAlgorithm:
 
     Attributes:
         graph (networkx.Graph): The input graph to be analyzed
+        weight (str): Edge attribute holding the edge weight (None for unweighted)
         communities (list): List of sets, where each set contains nodes belonging to a community
         node_to_index (dict): Mapping of node labels to numeric indices
         index_to_node (dict): Mapping of numeric indices to node labels
@@ -29,15 +35,18 @@ class CommunityDetectionAlgorithm:
     Methods:
         plot_communities(pos=None): Visualizes the communities with different colors
         calculate_modularity(): Returns the modularity score of the detected communities
+        community_statistics(): Returns size, cut, conductance and densities of every community
         print_communities(): Prints the communities in a human-readable format
     """
 
-    def __init__(self, graph: nx.Graph):
+    def __init__(self, graph: nx.Graph, weight: str = None):
         """
         Initialize community detection algorithm with input graph.
         :param graph: NetworkX graph object to analyze
+        :param weight: Edge attribute that contains the edge weight (optional)
         """
         self.graph = graph
+        self.weight = weight
         self.communities = None
         self.node_to_index = {node: i for i, node in enumerate(self.graph.nodes())}
         self.index_to_node = {i: node for node, i in self.node_to_index.items()}
@@ -45,15 +54,17 @@ class CommunityDetectionAlgorithm:
     def plot_communities(self, pos=None):
         """
         Visualize detected communities with different colors.
-        :param pos: Dictionary of node positions for visualization (optional)
+        :param pos: Dictionary of node positions for visualization (default: warm-started ForceAtlas2 layout)
         :return: None
         :raises ValueError: If communities haven't been detected yet
         """
+        import matplotlib.pyplot as plt
+
         if self.communities is None:
             raise ValueError("Run the algorithm first using run() method")
 
         if pos is None:
-            pos = nx.spring_layout(self.graph)
+            pos = layout.graph_layout(self.graph, weight=self.weight)
 
         # Create color mapping for nodes
         community_map = {node: -1 for node in self.graph.nodes()}
@@ -109,7 +120,24 @@ class CommunityDetectionAlgorithm:
         """
         if self.communities is None:
             raise ValueError("Run the algorithm first using run() method")
-        return nx.community.modularity(self.graph, self.communities)
+        return partition_quality.graph_modularity(self.graph, self.communities, weight=self.weight)
+
+    def community_statistics(self, resolution: float = 1.0) -> pd.DataFrame:
+        """
+        Calculate quality statistics of every detected community at once.
+        :param resolution: Resolution parameter of the per-community modularity contribution
+        :return: DataFrame with size, internal/cut weight, volume, conductance, intra/inter-density and
+            modularity contribution of each community
+        :raises ValueError: If communities haven't been detected yet
+        :raises NotAPartition: If the communities overlap or do not cover every node
+        """
+        if self.communities is None:
+            raise ValueError("Run the algorithm first using run() method")
+        arrays = graph_arrays(self.graph, weight=self.weight)
+        labels = partition_quality.labels_from_communities(self.graph, self.communities, arrays.node_index)
+        return partition_quality.community_statistics(
+            labels, arrays.src, arrays.dst, arrays.weights, resolution=resolution
+        )
 
     def print_communities(self):
         """
@@ -158,20 +186,57 @@ class KCliquePercolation(CommunityDetectionAlgorithm):
 
 
 class FastCommunityUnfolding(CommunityDetectionAlgorithm):
-    def run(self, resolution=1.0, seed: int = 42):
-        """Run Louvain community detection"""
-        self.communities = nx.community.louvain_communities(self.graph, resolution=resolution, seed=seed)
+    def run(self, resolution=1.0, seed: int = 42, initial_partition: List[set] = None):
+        """
+        Run weighted Louvain community detection over the CSR adjacency of the graph.
+        :param resolution: If less than 1, the algorithm favors larger communities
+        :param seed: Random seed for reproducibility
+        :param initial_partition: Communities to start from, e.g. a previous result (optional)
+        :return: list of node sets, largest community first
+        """
+        self.communities = _run_engine(self, community_engine.louvain, resolution, seed, initial_partition)
         return self.communities
 
 
+class WeightedLeiden(CommunityDetectionAlgorithm):
+    def run(self, resolution=1.0, seed: int = 42, initial_partition: List[set] = None):
+        """
+        Run weighted Leiden community detection (Louvain with a refinement step that keeps communities connected).
+        :param resolution: If less than 1, the algorithm favors larger communities
+        :param seed: Random seed for reproducibility
+        :param initial_partition: Communities to start from, e.g. a previous result (optional)
+        :return: list of node sets, largest community first
+        """
+        self.communities = _run_engine(self, community_engine.leiden, resolution, seed, initial_partition)
+        return self.communities
+
+
+def _run_engine(
+        algorithm: CommunityDetectionAlgorithm, method, resolution: float, seed: int, initial_partition: List[set]
+) -> List[set]:
+    """Run a `community_engine` method on the (weighted) adjacency of the algorithm's graph"""
+    arrays = graph_arrays(algorithm.graph, weight=algorithm.weight)
+    initial = None
+    if initial_partition is not None:
+        # nodes missing from the initial partition start as singletons
+        initial = np.arange(arrays.n) + len(initial_partition)
+        for label, community in enumerate(initial_partition):
+            initial[arrays.indices_of(list(community))] = label
+    labels = method(arrays.adjacency, resolution=resolution, seed=seed, initial=initial)
+    return community_engine.labels_to_communities(arrays.nodes, labels)
+
+
 class Walktrap(CommunityDetectionAlgorithm):
     def run(self):
         """Run Walktrap community detection"""
+        from cdlib import algorithms
+
         walktrap_communities = algorithms.walktrap(self.graph)
         self.communities = walktrap_communities.communities
         return self.communities
 
 
+@profiled
 def get_clique_size_distribution(
         graph: nx.Graph, filename: Union[Path, str] = FIGURES_DIR / 'table_clique_size_distribution.md'
 ) -> pd.DataFrame:
@@ -199,6 +264,7 @@ def get_clique_size_distribution(
     return df
 
 
+@profiled
 def find_top_n_cliques(graph: nx.Graph, n: int = 5):
     """
     Find the largest maximal cliques in the graph and print their details.
@@ -220,7 +286,7 @@ def find_top_n_cliques(graph: nx.Graph, n: int = 5):
 class LPACommunityDetection(CommunityDetectionAlgorithm):
     """
     Implementation of Label Propagation Algorithm (LPA) for community detection
-    using NetworkX's asynchronous label propagation method.
+    using deterministic semi-synchronous weighted label propagation over the CSR adjacency.
     :param graph: NetworkX graph object to analyze
     :param seed: Random seed for reproducibility (optional)
     :param weight: Edge attribute that contains the edge weight (optional)
@@ -233,28 +299,44 @@ class LPACommunityDetection(CommunityDetectionAlgorithm):
         :param graph: NetworkX graph object to analyze
         :param seed: Random seed for reproducibility
         :param weight: Edge attribute that contains the edge weight
-        :param max_iter: Maximum number of iterations
+        :param max_iter: Maximum number of iterations (at least 1)
+        :raises ValueError: If `max_iter` is smaller than 1
         """
-        super().__init__(graph)
+        if max_iter < 1:
+            raise ValueError(f"max_iter must be at least 1, got {max_iter}")
+        super().__init__(graph, weight=weight)
         self.seed = seed
-        self.weight = weight
         self.max_iter = max_iter
+        self.convergence_history = None
+        self.seed_scores = None
 
-    def run(self):
+    def run(self, seeds: Sequence[int] = None):
         """
         Execute the Label Propagation Algorithm to detect communities.
+        Several seeds run side by side; the partition with the highest modularity is kept.
+        :param seeds: Random seeds to run with (default: `self.seed` only)
         :return: self for method chaining
         :raises Exception: If algorithm execution fails
         """
+        seeds = [self.seed] if seeds is None else list(seeds)
         try:
-            community_generator = nx.community.asyn_lpa_communities(
-                self.graph,
-                weight=self.weight,
-                seed=self.seed,
+            arrays = graph_arrays(self.graph, weight=self.weight)
+            labels, history = community_engine.label_propagation(
+                arrays.adjacency, seeds=seeds, max_iter=self.max_iter
             )
-
-            self.communities = list(community_generator)
-
+            # a seed has converged after its first iteration without relabelled nodes
+            stable = history == 0
+            iterations = np.where(stable.any(axis=0), stable.argmax(axis=0) + 1, len(history))
+            self.seed_scores = partition_quality.score_partitions(
+                labels, arrays.src, arrays.dst, arrays.weights
+            ).assign(seed=seeds, iterations=iterations)
+            best = int(self.seed_scores['modularity_1'].to_numpy().argmax())
+            self.convergence_history = history[:iterations[best], best].tolist()
+
+            self.communities = community_engine.labels_to_communities(arrays.nodes, labels[best])
+
+            if history[-1, best]:
+                logger.warning(f"LPA did not converge within {self.max_iter} iterations (seed {seeds[best]})")
             logger.info(f"Successfully detected {len(self.communities)} communities using LPA")
             return self
 
@@ -0,0 +1,453 @@
+from __future__ import annotations
+
+from typing import (
+    TYPE_CHECKING,
+    Hashable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from scipy import sparse
+
+# Smallest modularity improvement of a local-move sweep that is worth another sweep
+MODULARITY_TOLERANCE = 1e-7
+
+
+def prepare_adjacency(adjacency: sparse.csr_matrix) -> sparse.csr_matrix:
+    """
+    Convert a symmetric weighted adjacency (self-loops stored once, as in networkx) into the form used by the
+    engine: float64 CSR with sorted indices and self-loop weights doubled, so that row sums are the node
+    strengths and the matrix sum is twice the total edge weight (as `P.T @ A @ P` keeps it on aggregation).
+    :param adjacency: symmetric sparse adjacency matrix
+    :return: CSR adjacency with doubled diagonal
+    """
+    from scipy import sparse
+
+    adjacency = sparse.csr_matrix(adjacency, dtype=np.float64, copy=True)
+    adjacency.setdiag(2 * adjacency.diagonal())
+    adjacency.eliminate_zeros()
+    adjacency.sort_indices()
+    return adjacency
+
+
+def color_classes(adjacency: sparse.csr_matrix, seed: Optional[int] = None) -> List[np.ndarray]:
+    """
+    Partition the nodes into independent sets with vectorized Jones-Plassmann coloring (largest degree first,
+    random tie-breaking); every node takes the smallest color not used by its already colored neighbors.
+    :param adjacency: CSR adjacency matrix
+    :param seed: random seed for the tie-breaking priorities
+    :return: list of node index arrays, one per color; nodes of the same color are pairwise non-adjacent
+    """
+    n = adjacency.shape[0]
+    rng = np.random.default_rng(seed)
+    src = np.repeat(np.arange(n), np.diff(adjacency.indptr))
+    dst = adjacency.indices
+    no_loops = src != dst
+    src, dst = src[no_loops], dst[no_loops]
+
+    priority = np.bincount(src, minlength=n) + rng.random(n)
+    color = np.full(n, -1, dtype=np.int64)
+    # edges pointing to a higher-priority neighbor: their source waits until the neighbor is colored
+    waits = priority[dst] > priority[src]
+    pending_src, pending_dst = src[waits], dst[waits]
+
+    while (color < 0).any():
+        uncolored = color < 0
+        blocked = np.zeros(n, dtype=bool)
+        blocked[pending_src[uncolored[pending_dst]]] = True
+        chosen = uncolored & ~blocked
+
+        # smallest color missing among the colored neighbors of every chosen node
+        src, dst = src[uncolored[src]], dst[uncolored[src]]
+        mask = chosen[src] & (color[dst] >= 0)
+        new_colors = np.zeros(n, dtype=np.int64)
+        if mask.any():
+            n_colors = color.max() + 1
+            keys = np.unique(src[mask] * n_colors + color[dst[mask]])
+            nodes, used = keys // n_colors, keys % n_colors
+            starts = _group_starts(nodes)
+            sizes = np.diff(np.append(starts, len(nodes)))
+            rank = np.arange(len(nodes)) - np.repeat(starts, sizes)
+            first_gap = np.minimum.reduceat(np.where(used != rank, rank, np.repeat(sizes, sizes)), starts)
+            new_colors[nodes[starts]] = first_gap
+        color[chosen] = new_colors[chosen]
+
+        keep = color[pending_src] < 0
+        pending_src, pending_dst = pending_src[keep], pending_dst[keep]
+
+    order = np.argsort(color, kind='stable')
+    bounds = np.flatnonzero(np.r_[True, np.diff(color[order]) != 0, True])
+    return [order[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+
+
+def modularity_from_labels(adjacency: sparse.csr_matrix, labels: np.ndarray, resolution: float = 1.0) -> float:
+    """
+    Modularity of a partition on an adjacency prepared with `prepare_adjacency`.
+    :param adjacency: CSR adjacency with doubled diagonal
+    :param labels: community label of every node (0..k-1)
+    :param resolution: resolution parameter (gamma)
+    :return: modularity value
+    """
+    two_m = adjacency.data.sum()
+    if two_m == 0:
+        return 0.0
+    rows = np.repeat(np.arange(adjacency.shape[0]), np.diff(adjacency.indptr))
+    internal = adjacency.data[labels[rows] == labels[adjacency.indices]].sum()
+    totals = np.bincount(labels, weights=np.asarray(adjacency.sum(axis=1)).ravel())
+    return float(internal / two_m - resolution * np.sum(totals ** 2) / two_m ** 2)
+
+
+def _neighbor_community_weights(
+        adjacency: sparse.csr_matrix, nodes: np.ndarray, labels: np.ndarray, mask_labels: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Total edge weight from every node of `nodes` to each neighboring community (self-loops excluded).
+    :param adjacency: CSR adjacency
+    :param nodes: node indices (pairwise non-adjacent)
+    :param labels: community label of every node
+    :param mask_labels: if given, only neighbors with the same mask label as the node are considered
+    :return: tuple (position of the node in `nodes`, community, weight), sorted by position then community
+    """
+    starts = adjacency.indptr[nodes]
+    counts = adjacency.indptr[nodes + 1] - starts
+    owner = np.repeat(np.arange(len(nodes)), counts)
+    offsets = np.cumsum(counts) - counts
+    entries = np.repeat(starts - offsets, counts) + np.arange(offsets[-1] + counts[-1] if len(counts) else 0)
+    neighbors = adjacency.indices[entries]
+    keep = neighbors != nodes[owner]
+    if mask_labels is not None:
+        keep &= mask_labels[neighbors] == mask_labels[nodes[owner]]
+    owner, neighbors, weights = owner[keep], neighbors[keep], adjacency.data[entries[keep]]
+
+    n_labels = labels.max() + 1
+    keys, inverse = np.unique(owner * n_labels + labels[neighbors], return_inverse=True)
+    return keys // n_labels, keys % n_labels, np.bincount(inverse, weights=weights, minlength=len(keys))
+
+
+def _group_starts(sorted_keys: np.ndarray) -> np.ndarray:
+    """Start positions of the runs of equal values in a sorted array"""
+    is_start = np.empty(len(sorted_keys), dtype=bool)
+    is_start[:1] = True
+    np.not_equal(sorted_keys[1:], sorted_keys[:-1], out=is_start[1:])
+    return np.flatnonzero(is_start)
+
+
+def _best_moves(
+        owner: np.ndarray, candidate: np.ndarray, gain: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Best candidate community (lowest label on ties) and its gain for every owner with candidates"""
+    starts = _group_starts(owner)
+    best_gain = np.maximum.reduceat(gain, starts)
+    best = np.flatnonzero(gain == np.repeat(best_gain, np.diff(np.append(starts, len(owner)))))
+    # first best entry of every owner (entries are sorted by community)
+    first = best[_group_starts(owner[best])]
+    return owner[first], candidate[first], gain[first]
+
+
+def local_moves(
+        adjacency: sparse.csr_matrix,
+        labels: np.ndarray,
+        classes: List[np.ndarray],
+        resolution: float = 1.0,
+        max_sweeps: int = 32,
+) -> np.ndarray:
+    """
+    Louvain local-moving phase: every node moves to the neighboring community with the largest modularity gain.
+    Nodes of a color class are moved simultaneously (they share no edges, so their gains do not interact
+    except through community totals); sweeps over all classes repeat until modularity stops improving.
+    :param adjacency: CSR adjacency with doubled diagonal
+    :param labels: initial community label of every node (0..n-1)
+    :param classes: color classes as returned by `color_classes`
+    :param resolution: resolution parameter (gamma)
+    :param max_sweeps: maximum number of sweeps over all classes
+    :return: community label of every node
+    """
+    labels = labels.copy()
+    n = adjacency.shape[0]
+    strength = np.asarray(adjacency.sum(axis=1)).ravel()
+    two_m = strength.sum()
+    totals = np.bincount(labels, weights=strength, minlength=n)
+    quality = modularity_from_labels(adjacency, labels, resolution)
+
+    for _ in range(max_sweeps):
+        moved = 0
+        for nodes in classes:
+            owner, candidate, weight = _neighbor_community_weights(adjacency, nodes, labels)
+            if len(owner) == 0:
+                continue
+            node_strength = strength[nodes]
+            own = labels[nodes]
+            # strength of the communities without the moving node
+            candidate_totals = totals[candidate] - np.where(candidate == own[owner], node_strength[owner], 0)
+            gain = weight - resolution * node_strength[owner] * candidate_totals / two_m
+
+            own_weight = np.zeros(len(nodes))
+            own_entries = candidate == own[owner]
+            own_weight[owner[own_entries]] = weight[own_entries]
+            stay_gain = own_weight - resolution * node_strength * (totals[own] - node_strength) / two_m
+
+            movers, targets, best_gain = _best_moves(owner, candidate, gain)
+            improves = (targets != own[movers]) & (best_gain > stay_gain[movers] + 1e-12)
+            movers, targets = movers[improves], targets[improves]
+            if len(movers) == 0:
+                continue
+
+            moving = nodes[movers]
+            np.subtract.at(totals, labels[moving], strength[moving])
+            np.add.at(totals, targets, strength[moving])
+            labels[moving] = targets
+            moved += len(moving)
+
+        new_quality = modularity_from_labels(adjacency, labels, resolution)
+        if moved == 0 or new_quality - quality < MODULARITY_TOLERANCE:
+            break
+        quality = new_quality
+    return labels
+
+
+def refine(
+        adjacency: sparse.csr_matrix,
+        labels: np.ndarray,
+        classes: List[np.ndarray],
+        resolution: float = 1.0,
+) -> np.ndarray:
+    """
+    Leiden refinement: inside every community, singleton nodes that are well connected to their community merge
+    into the neighboring sub-community of the same community with the largest (positive) modularity gain.
+    Sub-communities are therefore connected and may split badly connected communities of the local-moving phase.
+    :param adjacency: CSR adjacency with doubled diagonal
+    :param labels: community label of every node after local moving
+    :param classes: color classes as returned by `color_classes`
+    :param resolution: resolution parameter (gamma)
+    :return: sub-community label of every node (refines `labels`)
+    """
+    n = adjacency.shape[0]
+    strength = np.asarray(adjacency.sum(axis=1)).ravel()
+    two_m = strength.sum()
+    community_totals = np.bincount(labels, weights=strength, minlength=n)
+
+    # a node is well connected if E(v, C - v) >= gamma * k_v * (K_C - k_v) / 2m
+    rows = np.repeat(np.arange(n), np.diff(adjacency.indptr))
+    inside = (labels[rows] == labels[adjacency.indices]) & (rows != adjacency.indices)
+    internal_weight = np.bincount(rows[inside], weights=adjacency.data[inside], minlength=n)
+    well_connected = internal_weight >= resolution * strength * (community_totals[labels] - strength) / two_m
+
+    refined = np.arange(n)
+    totals = strength.copy()
+    sizes = np.ones(n, dtype=np.int64)
+    for nodes in classes:
+        nodes = nodes[well_connected[nodes] & (sizes[refined[nodes]] == 1)]
+        if len(nodes) == 0:
+            continue
+        owner, candidate, weight = _neighbor_community_weights(adjacency, nodes, refined, mask_labels=labels)
+        if len(owner) == 0:
+            continue
+        gain = weight - resolution * strength[nodes][owner] * totals[candidate] / two_m
+        movers, targets, best_gain = _best_moves(owner, candidate, gain)
+        improves = best_gain > 1e-12
+        moving, targets = nodes[movers[improves]], targets[improves]
+        if len(moving) == 0:
+            continue
+
+        np.add.at(totals, targets, strength[moving])
+        np.add.at(sizes, targets, 1)
+        totals[refined[moving]] = 0
+        sizes[refined[moving]] = 0
+        refined[moving] = targets
+    return refined
+
+
+def aggregate(adjacency: sparse.csr_matrix, labels: np.ndarray) -> sparse.csr_matrix:
+    """
+    Aggregate the graph by communities: the adjacency of the community graph is `P.T @ A @ P`.
+    :param adjacency: CSR adjacency with doubled diagonal
+    :param labels: community label of every node (0..k-1)
+    :return: CSR adjacency of the aggregated graph (diagonal stays doubled)
+    """
+    from scipy import sparse
+
+    n = adjacency.shape[0]
+    membership = sparse.csr_matrix((np.ones(n), (np.arange(n), labels)), shape=(n, labels.max() + 1))
+    aggregated = (membership.T @ adjacency @ membership).tocsr()
+    aggregated.sort_indices()
+    return aggregated
+
+
+def _compact(labels: np.ndarray) -> np.ndarray:
+    return np.unique(labels, return_inverse=True)[1].astype(np.int64)
+
+
+def cluster(
+        adjacency: sparse.csr_matrix,
+        resolution: float = 1.0,
+        seed: Optional[int] = None,
+        initial: Optional[np.ndarray] = None,
+        refinement: bool = True,
+        max_levels: int = 32,
+) -> np.ndarray:
+    """
+    Weighted Louvain (refinement=False) or Leiden (refinement=True) community detection over a CSR adjacency.
+    :param adjacency: symmetric weighted adjacency matrix (self-loops stored once, as in networkx)
+    :param resolution: resolution parameter (gamma); below 1 favours larger communities
+    :param seed: random seed of the coloring (the only source of randomness)
+    :param initial: initial community label of every node (optional, e.g. a previous partition)
+    :param refinement: run the Leiden refinement step before every aggregation
+    :param max_levels: maximum number of aggregation levels
+    :return: community label of every node, communities numbered by decreasing size
+    """
+    adjacency = prepare_adjacency(adjacency)
+    n = adjacency.shape[0]
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    membership = np.arange(n)  # aggregated node of every original node
+    labels = _compact(initial) if initial is not None else np.arange(n)
+    for level in range(max_levels):
+        classes = color_classes(adjacency, seed=None if seed is None else seed + level)
+        labels = _compact(local_moves(adjacency, labels, classes, resolution))
+        n_communities = labels.max() + 1
+        if n_communities == adjacency.shape[0]:
+            break
+
+        refined = _compact(refine(adjacency, labels, classes, resolution)) if refinement else labels
+        if refined.max() + 1 == adjacency.shape[0]:
+            # no sub-community was formed, aggregate by the communities themselves
+            refined = labels
+        adjacency = aggregate(adjacency, refined)
+        membership = refined[membership]
+        # the aggregated nodes start from the communities found at this level
+        next_labels = np.empty(refined.max() + 1, dtype=np.int64)
+        next_labels[refined] = labels
+        labels = _compact(next_labels)
+
+    return order_by_size(labels[membership])
+
+
+def order_by_size(labels: np.ndarray) -> np.ndarray:
+    """
+    Renumber community labels by decreasing community size, ties by the first node of the community.
+    :param labels: community label of every node
+    :return: community label of every node (0..k-1), community 0 is the largest
+    """
+    labels = _compact(labels)
+    sizes = np.bincount(labels)
+    first_node = np.full(len(sizes), len(labels))
+    np.minimum.at(first_node, labels, np.arange(len(labels)))
+    order = np.lexsort((first_node, -sizes))
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return rank[labels]
+
+
+def louvain(adjacency: sparse.csr_matrix, resolution: float = 1.0, seed: Optional[int] = None,
+            initial: Optional[np.ndarray] = None) -> np.ndarray:
+    """Weighted Louvain community labels over a CSR adjacency (see `cluster`)"""
+    return cluster(adjacency, resolution=resolution, seed=seed, initial=initial, refinement=False)
+
+
+def leiden(adjacency: sparse.csr_matrix, resolution: float = 1.0, seed: Optional[int] = None,
+           initial: Optional[np.ndarray] = None) -> np.ndarray:
+    """Weighted Leiden community labels over a CSR adjacency (see `cluster`)"""
+    return cluster(adjacency, resolution=resolution, seed=seed, initial=initial, refinement=True)
+
+
+def _majority_labels(
+        adjacency: sparse.csr_matrix, nodes: np.ndarray, labels: np.ndarray, priority: np.ndarray
+) -> np.ndarray:
+    """
+    Weighted majority label among the neighbors of every node of `nodes`. A node keeps its label whenever that
+    label is among the heaviest ones; other ties go to the label with the lowest (seeded) priority.
+    :param adjacency: CSR adjacency
+    :param nodes: node indices (pairwise non-adjacent)
+    :param labels: label of every node
+    :param priority: tie-breaking priority of every label
+    :return: new label of every node of `nodes`
+    """
+    new_labels = labels[nodes].copy()
+    owner, candidate, weight = _neighbor_community_weights(adjacency, nodes, labels)
+    if len(owner) == 0:
+        return new_labels
+    starts = _group_starts(owner)
+    best_weight = np.repeat(np.maximum.reduceat(weight, starts), np.diff(np.append(starts, len(owner))))
+    is_best = weight >= best_weight * (1 - 1e-12)
+
+    keeps = np.zeros(len(nodes), dtype=bool)
+    keeps[owner[is_best & (candidate == new_labels[owner])]] = True
+    best = np.flatnonzero(is_best & ~keeps[owner])
+    best = best[np.lexsort((priority[candidate[best]], owner[best]))]
+    first = best[_group_starts(owner[best])]
+    new_labels[owner[first]] = candidate[first]
+    return new_labels
+
+
+def label_propagation(
+        adjacency: sparse.csr_matrix,
+        seeds: Sequence[int] = (42,),
+        max_iter: int = 100,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Deterministic semi-synchronous weighted label propagation (Cordasco and Gargano) over a CSR adjacency.
+    Every node starts in its own community; in each iteration the color classes are updated one after another
+    and all nodes of a class take the heaviest label among their neighbors at once. Because a node keeps its
+    label on ties, the process converges to a stable labelling instead of oscillating.
+    Runs for several seeds are stacked into one block-diagonal graph, so they progress in the same array
+    operations; each seed only drives its copy's coloring and tie-breaking.
+    :param adjacency: symmetric weighted adjacency matrix (self-loops are ignored)
+    :param seeds: random seeds, one run per seed
+    :param max_iter: maximum number of iterations (sweeps over all color classes)
+    :return: tuple (label matrix of shape (n_seeds, n) with communities numbered by decreasing size,
+        convergence history of shape (n_iterations, n_seeds) with the number of nodes relabelled per iteration)
+    :raises ValueError: If `max_iter` is smaller than 1
+    """
+    from scipy import sparse
+
+    if max_iter < 1:
+        raise ValueError(f"max_iter must be at least 1, got {max_iter}")
+    n, k = adjacency.shape[0], len(seeds)
+    if n == 0:
+        return np.zeros((k, 0), dtype=np.int64), np.zeros((0, k), dtype=np.int64)
+
+    adjacency = sparse.csr_matrix(adjacency, dtype=np.float64)
+    stacked = sparse.block_diag([adjacency] * k, format='csr')
+    stacked.sort_indices()
+    # per-seed coloring and tie-breaking priorities, shifted into the copy's node range
+    classes, priority = [], np.empty(n * k)
+    for copy, seed in enumerate(seeds):
+        offset = copy * n
+        classes.extend(nodes + offset for nodes in color_classes(adjacency, seed=seed))
+        priority[offset:offset + n] = np.random.default_rng(seed).permutation(n)
+
+    labels = np.arange(n * k)
+    copy_of = np.repeat(np.arange(k), n)
+    history = []
+    for _ in range(max_iter):
+        changed = np.zeros(k, dtype=np.int64)
+        for nodes in classes:
+            new_labels = _majority_labels(stacked, nodes, labels, priority)
+            moved = new_labels != labels[nodes]
+            changed += np.bincount(copy_of[nodes[moved]], minlength=k)
+            labels[nodes] = new_labels
+        history.append(changed)
+        if not changed.any():
+            break
+
+    labels = labels.reshape(k, n) - (np.arange(k) * n)[:, None]
+    return np.array([order_by_size(row) for row in labels]), np.array(history)
+
+
+def labels_to_communities(nodes: List[Hashable], labels: np.ndarray) -> List[set]:
+    """
+    Convert community labels into the list-of-sets representation used by networkx.
+    :param nodes: node labels, position is the node index
+    :param labels: community label of every node (0..k-1)
+    :return: list of node sets, ordered by community label
+    """
+    communities = [set() for _ in range(labels.max() + 1 if len(labels) else 0)]
+    for node, label in zip(nodes, labels.tolist()):
+        communities[label].add(node)
+    return communities
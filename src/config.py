@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -21,6 +22,12 @@ PARAMS = PROJ_ROOT / "params.yaml"
 REPORTS_DIR = PROJ_ROOT / "reports"
 FIGURES_DIR = REPORTS_DIR / "figures"
 
+# Re-render every figure and table even if the plotted data did not change
+FORCE_RENDER = os.getenv("FORCE_RENDER", "0").lower() in ("1", "true", "yes")
+
+# Profile every pipeline stage with "cprofile" or "pyinstrument" (empty to only record timings)
+PROFILER = os.getenv("PROFILER", "").lower()
+
 try:
     from tqdm import tqdm
 
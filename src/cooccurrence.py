@@ -0,0 +1,384 @@
+import os
+import re
+import csv
+import json
+import typer
+import tempfile
+from collections import (
+    Counter,
+    deque,
+)
+from concurrent.futures import (
+    Future,
+    ProcessPoolExecutor,
+)
+from pathlib import Path
+from loguru import logger
+from typing import (
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from src.config import (
+    RAW_DATA_DIR,
+    EXTERNAL_DATA_DIR,
+)
+from src.dataset import clean_name
+
+app = typer.Typer()
+
+# Columns of malazan_network_data.csv, read by `dataset.get_edges_data`
+CSV_COLUMNS = ['name1', 'name2', 'book', 'chapter']
+# Two mentions at most this many words apart co-occur
+DEFAULT_WINDOW = 15
+# Single-word aliases shorter than this are too ambiguous to match on their own
+MIN_TOKEN_ALIAS_LENGTH = 4
+# Words of the text: letters, digits and inner apostrophes/hyphens, as `clean_name` leaves them in names
+WORD_PATTERN = re.compile(r"[^\W_]+(?:['’-][^\W_]+)*")
+# Possessive ending, stripped so that "Rake's" is a mention of Rake
+POSSESSIVE_PATTERN = re.compile(r"['’]s$")
+# Terminal marker of the alias trie
+_END = ''
+
+
+def _words(text: str) -> List[str]:
+    """Lowercase words of a piece of text, without possessive endings"""
+    return [POSSESSIVE_PATTERN.sub('', word) for word in WORD_PATTERN.findall(text.lower())]
+
+
+class AliasAutomaton:
+    """
+    Word-level trie of character aliases, matched leftmost-longest over a stream of words.
+
+    Every character is reachable through its cleaned name (`dataset.clean_name`), through the extra aliases
+    given for it and, optionally, through every single word of its name that no other character shares
+    ("Paran" for "Ganoes Paran"). Aliases claimed by several characters are dropped.
+
+    Attributes:
+        names (list): Character names, in the order they were given
+        trie (dict): Nested dictionaries word -> subtrie; the key '' of a node holds the index of the character
+            whose alias ends there
+        max_alias_words (int): Length of the longest alias in words
+    """
+
+    def __init__(
+            self,
+            names: Iterable[str],
+            aliases: Optional[Dict[str, List[str]]] = None,
+            token_aliases: bool = True,
+    ):
+        """
+        Compile the automaton.
+        :param names: character names (Dramatis Personae)
+        :param aliases: extra aliases per character name
+        :param token_aliases: also match unique single words of the names
+        """
+        self.names = list(dict.fromkeys(name for name in names if isinstance(name, str) and name.strip()))
+        owners: Dict[Tuple[str, ...], set] = {}
+
+        def claim(alias: str, index: int):
+            words = tuple(_words(clean_name(alias)))
+            if words:
+                owners.setdefault(words, set()).add(index)
+
+        for index, name in enumerate(self.names):
+            claim(name, index)
+            for alias in (aliases or {}).get(name, []):
+                claim(alias, index)
+        full_names = set(owners)
+        if token_aliases:
+            for index, name in enumerate(self.names):
+                for word in _words(clean_name(name)):
+                    if len(word) >= MIN_TOKEN_ALIAS_LENGTH and (word,) not in full_names:
+                        owners.setdefault((word,), set()).add(index)
+
+        self.trie: Dict = {}
+        self.max_alias_words = 0
+        ambiguous = 0
+        for words, indices in owners.items():
+            if len(indices) > 1:
+                ambiguous += 1
+                continue
+            node = self.trie
+            for word in words:
+                node = node.setdefault(word, {})
+            node[_END] = next(iter(indices))
+            self.max_alias_words = max(self.max_alias_words, len(words))
+        if ambiguous:
+            logger.debug(f"{ambiguous} aliases shared by several characters are not matched")
+
+    def mentions(self, words: Iterable[str]) -> Iterator[Tuple[int, int]]:
+        """
+        Find the character mentions in a stream of words; only `max_alias_words` words are buffered.
+        :param words: lowercase words in text order
+        :return: iterator of (word position, character index), the position being that of the alias' first word
+        """
+        buffer: Deque[str] = deque()
+        position = 0
+        words = iter(words)
+        exhausted = False
+        while True:
+            while not exhausted and len(buffer) < self.max_alias_words:
+                word = next(words, None)
+                if word is None:
+                    exhausted = True
+                else:
+                    buffer.append(word)
+            if not buffer:
+                return
+
+            node, match, length = self.trie, None, 0
+            for offset, word in enumerate(buffer):
+                node = node.get(word)
+                if node is None:
+                    break
+                if _END in node:
+                    match, length = node[_END], offset + 1
+            if match is None:
+                length = 1
+            else:
+                yield position, match
+            for _ in range(length):
+                buffer.popleft()
+            position += length
+
+
+def stream_words(path: Path) -> Iterator[str]:
+    """
+    Read the words of a text file line by line.
+    :param path: UTF-8 text file
+    :return: iterator of lowercase words
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield from _words(line)
+
+
+def cooccurrences(mentions: Iterable[Tuple[int, int]], window: int = DEFAULT_WINDOW) -> Counter:
+    """
+    Count windowed co-occurrences: every mention co-occurs once with each other character mentioned at most
+    `window` words before it. Only the mentions inside the window are kept.
+    :param mentions: (word position, character index) pairs in text order
+    :param window: maximum distance between two co-occurring mentions, in words
+    :return: Counter of (character index, character index) pairs, smaller index first
+    """
+    counts = Counter()
+    recent: Deque[Tuple[int, int]] = deque()
+    for position, character in mentions:
+        while recent and position - recent[0][0] > window:
+            recent.popleft()
+        for other in {other for _, other in recent if other != character}:
+            counts[(min(character, other), max(character, other))] += 1
+        recent.append((position, character))
+    return counts
+
+
+def _label(prefix: str, name: str) -> str:
+    """
+    Book or chapter label of a directory or file name. Numeric names become `<prefix>_<number>` (as in the
+    existing data), so pandas reads the columns as strings and `book + chapter` in `get_edges_data` stays unique.
+    """
+    return f'{prefix}_{int(name):02d}' if name.isdigit() else name
+
+
+def chapter_files(texts_dir: Path, books: Optional[List[str]] = None) -> List[Tuple[str, str, Path]]:
+    """
+    List the chapter texts, laid out as `<texts_dir>/<book>/<chapter>.txt`.
+    :param texts_dir: directory with one subdirectory per book
+    :param books: only these books, by directory name or label (all by default)
+    :return: list of (book label, chapter label, path), sorted by book and chapter
+    """
+    return [
+        (_label('book', path.parent.name), _label('chapter', path.stem), path)
+        for path in sorted(texts_dir.glob('*/*.txt'))
+        if books is None or path.parent.name in books or _label('book', path.parent.name) in books
+    ]
+
+
+# Automaton and window of a worker process, set once by `_init_worker` instead of being pickled with every task
+_AUTOMATON: Optional[AliasAutomaton] = None
+_WINDOW = DEFAULT_WINDOW
+
+
+def _init_worker(automaton: AliasAutomaton, window: int):
+    global _AUTOMATON, _WINDOW
+    _AUTOMATON, _WINDOW = automaton, window
+
+
+def _chapter_cooccurrences(path: Path) -> Counter:
+    """Co-occurrence counts of one chapter (runs in a worker process)"""
+    return cooccurrences(_AUTOMATON.mentions(stream_words(path)), window=_WINDOW)
+
+
+def _chapter_rows(names: List[str], book: str, chapter: str, counts: Counter) -> Iterator[List[str]]:
+    """One CSV row per co-occurrence, names ordered alphabetically so every pair has a single orientation"""
+    for (first, second), count in sorted(counts.items()):
+        name1, name2 = sorted((names[first], names[second]))
+        for _ in range(count):
+            yield [name1, name2, book, chapter]
+
+
+def extract(
+        texts_dir: Path,
+        output_path: Path,
+        automaton: AliasAutomaton,
+        window: int = DEFAULT_WINDOW,
+        books: Optional[List[str]] = None,
+        append: bool = False,
+        n_jobs: Optional[int] = None,
+) -> int:
+    """
+    Extract the co-occurrences of all chapter texts into a CSV with the schema of `malazan_network_data.csv`.
+    Chapters are spread over a process pool; at most two chapters per worker are in flight and their rows are
+    written as soon as they arrive, in book and chapter order, so memory does not grow with the corpus.
+    :param texts_dir: directory of the chapter texts (`<book>/<chapter>.txt`)
+    :param output_path: CSV to write
+    :param automaton: compiled alias automaton
+    :param window: maximum distance between two co-occurring mentions, in words
+    :param books: only these books (all by default)
+    :param append: append to an existing CSV (e.g. a new book) instead of overwriting it
+    :param n_jobs: number of worker processes (default: number of CPUs; 1 runs in-process)
+    :return: number of rows written
+    """
+    chapters = chapter_files(texts_dir, books)
+    if not chapters:
+        logger.warning(f"No chapter texts found in {texts_dir}")
+    n_jobs = min(n_jobs or os.cpu_count() or 1, max(len(chapters), 1))
+
+    write_header = not (append and output_path.exists())
+    n_rows = 0
+    with open(output_path, 'a' if append else 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(CSV_COLUMNS)
+
+        def write(book: str, chapter: str, counts: Counter):
+            nonlocal n_rows
+            rows = list(_chapter_rows(automaton.names, book, chapter, counts))
+            writer.writerows(rows)
+            n_rows += len(rows)
+
+        if n_jobs == 1:
+            _init_worker(automaton, window)
+            for book, chapter, path in chapters:
+                write(book, chapter, _chapter_cooccurrences(path))
+        else:
+            with ProcessPoolExecutor(
+                    max_workers=n_jobs, initializer=_init_worker, initargs=(automaton, window)
+            ) as executor:
+                pending: Deque[Tuple[str, str, Future]] = deque()
+                for book, chapter, path in chapters:
+                    pending.append((book, chapter, executor.submit(_chapter_cooccurrences, path)))
+                    if len(pending) >= 2 * n_jobs:
+                        book_done, chapter_done, future = pending.popleft()
+                        write(book_done, chapter_done, future.result())
+                while pending:
+                    book_done, chapter_done, future = pending.popleft()
+                    write(book_done, chapter_done, future.result())
+
+    logger.info(f"{n_rows} co-occurrences of {len(chapters)} chapters written to {output_path}")
+    return n_rows
+
+
+def load_names(names_path: Optional[Path]) -> List[str]:
+    """
+    Character names: the `name` column of a CSV (or one name per line of a text file), the Dramatis Personae
+    of the Malazan Wiki if no file is given.
+    :param names_path: CSV with a `name` column or text file, or None
+    :return: list of names
+    :raises RuntimeError: If the Dramatis Personae page cannot be fetched
+    """
+    if names_path is None:
+        from src.dataset import get_malazan_characters
+
+        characters = get_malazan_characters()
+        if characters is None:
+            raise RuntimeError("Could not fetch the Dramatis Personae; pass a names file instead")
+        return characters['name'].tolist()
+    if names_path.suffix == '.csv':
+        import pandas as pd
+
+        return pd.read_csv(names_path)['name'].dropna().tolist()
+    with open(names_path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+# Synthetic chapters of `verify`: (book directory, chapter file, text) and the rows they must produce
+_FIXTURE_NAMES = ['Ganoes Paran', 'Tavore Paran', 'Whiskeyjack', 'Anomander Rake', 'Tattersail']
+_FIXTURE_CHAPTERS = [
+    ('1', '2', "Ganoes Paran rode with Whiskeyjack. Paran was silent."),
+    ('2', '1', "Whiskeyjack met Ganoes Paran at the gate."),
+    ('1', '12', "Tattersail's hands shook. Anomander Rake drew Rake's sword."),
+    ('gotm', '01', "Tattersail spoke to Whiskeyjack."),
+]
+_FIXTURE_ROWS = [
+    ['Ganoes Paran', 'Whiskeyjack', 'book_01', 'chapter_02'],
+    ['Anomander Rake', 'Tattersail', 'book_01', 'chapter_12'],
+    ['Anomander Rake', 'Tattersail', 'book_01', 'chapter_12'],
+    ['Ganoes Paran', 'Whiskeyjack', 'book_02', 'chapter_01'],
+    ['Tattersail', 'Whiskeyjack', 'gotm', 'chapter_01'],
+]
+
+
+@app.command()
+def verify(n_jobs: int = 2):
+    """Check the extractor on synthetic chapter texts, and that get_edges_data reads its output"""
+    import pandas as pd
+
+    from src.dataset import get_edges_data
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for book, chapter, text in _FIXTURE_CHAPTERS:
+            (tmp / 'texts' / book).mkdir(parents=True, exist_ok=True)
+            (tmp / 'texts' / book / f'{chapter}.txt').write_text(text, encoding='utf-8')
+
+        mismatches = []
+        for jobs in sorted({1, n_jobs}):
+            extract(tmp / 'texts', tmp / 'malazan_network_data.csv', AliasAutomaton(_FIXTURE_NAMES), n_jobs=jobs)
+            with open(tmp / 'malazan_network_data.csv', 'r', newline='', encoding='utf-8') as f:
+                rows = list(csv.reader(f))
+            if rows[0] != CSV_COLUMNS or sorted(rows[1:]) != sorted(_FIXTURE_ROWS):
+                mismatches.append(f"rows extracted with n_jobs={jobs}")
+
+        get_edges_data(raw_folder=tmp, processed_folder=tmp)
+        edges = pd.read_csv(tmp / 'edges_data.csv').set_index(['name1', 'name2'])
+        # book 1 chapter 2 and book 2 chapter 1 are distinct chapters
+        if edges.loc[('Ganoes Paran', 'Whiskeyjack'), 'co_occurance_chapters_cnt'] != 2:
+            mismatches.append("chapter counts of get_edges_data")
+
+    if mismatches:
+        logger.error(f"Co-occurrence extraction differs from the expected output: {', '.join(mismatches)}")
+        raise typer.Exit(code=1)
+    logger.success("Co-occurrence extraction matches the synthetic fixtures")
+
+
+@app.command()
+def main(
+        texts_dir: Path = EXTERNAL_DATA_DIR / 'texts',
+        output_path: Path = RAW_DATA_DIR / 'malazan_network_data.csv',
+        names_path: Optional[Path] = None,
+        aliases_path: Optional[Path] = None,
+        window: int = DEFAULT_WINDOW,
+        token_aliases: bool = True,
+        books: Optional[List[str]] = typer.Option(None, '--book'),
+        append: bool = False,
+        n_jobs: Optional[int] = None,
+):
+    """Extract character co-occurrences from chapter texts into malazan_network_data.csv"""
+    aliases = None
+    if aliases_path is not None:
+        with open(aliases_path, 'r', encoding='utf-8') as f:
+            aliases = json.load(f)
+    automaton = AliasAutomaton(load_names(names_path), aliases=aliases, token_aliases=token_aliases)
+    logger.info(f"Alias automaton of {len(automaton.names)} characters compiled")
+    extract(texts_dir, output_path, automaton, window=window, books=books, append=append, n_jobs=n_jobs)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+import pandas as pd
+import networkx as nx
+
+from src.config import FIGURES_DIR
+from src.graph_arrays import (
+    GraphArrays,
+    graph_arrays,
+)
+from src.profiling import profiled
+
+if TYPE_CHECKING:
+    from scipy import sparse
+
+
+def _simple_adjacency(arrays: GraphArrays, weighted: bool) -> sparse.csr_matrix:
+    """Symmetric CSR adjacency without self-loops, with unit weights unless `weighted`"""
+    from scipy import sparse
+
+    keep = arrays.src != arrays.dst
+    src, dst = arrays.src[keep], arrays.dst[keep]
+    data = arrays.weights[keep] if weighted else np.ones(len(src))
+    adjacency = sparse.csr_matrix(
+        (np.concatenate([data, data]), (np.concatenate([src, dst]), np.concatenate([dst, src]))),
+        shape=(arrays.n, arrays.n),
+    )
+    adjacency.sum_duplicates()
+    return adjacency
+
+
+def _bin_sort_cores(indptr: np.ndarray, indices: np.ndarray, degree: np.ndarray) -> np.ndarray:
+    """
+    Core numbers by the bin-sort peel of Batagelj and Zaversnik, O(n + m): nodes are kept in an array sorted by
+    remaining degree with the start offset of every degree bin; removing a node moves each of its higher-degree
+    neighbors down one bin by swapping it with the first node of its bin.
+    """
+    n = len(degree)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    order = np.argsort(degree, kind='stable')
+    bin_start = np.zeros(int(degree.max()) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(degree)[:-1], out=bin_start[1:])
+    position = np.empty(n, dtype=np.int64)
+    position[order] = np.arange(n)
+
+    # plain lists: single-element access is much faster than on numpy arrays in the peeling loop
+    vert, pos, deg, bins = order.tolist(), position.tolist(), degree.tolist(), bin_start.tolist()
+    indptr, indices = indptr.tolist(), indices.tolist()
+    for i in range(n):
+        v = vert[i]
+        deg_v = deg[v]
+        for u in indices[indptr[v]:indptr[v + 1]]:
+            deg_u = deg[u]
+            if deg_u > deg_v:
+                first = bins[deg_u]
+                w = vert[first]
+                if u != w:
+                    pos_u = pos[u]
+                    vert[pos_u], vert[first] = w, u
+                    pos[w], pos[u] = pos_u, first
+                bins[deg_u] = first + 1
+                deg[u] = deg_u - 1
+    return np.array(deg, dtype=np.int64)
+
+
+def _heap_strength_cores(
+        indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, strength: np.ndarray
+) -> np.ndarray:
+    """
+    s-core numbers by peeling the node of smallest remaining strength from a heap, O(m log n): real-valued
+    strengths have no bins, so every strength decrease pushes a new entry and outdated entries are skipped.
+    """
+    import heapq
+
+    n = len(strength)
+    indptr, indices, data, strength = indptr.tolist(), indices.tolist(), data.tolist(), strength.tolist()
+    core = [0.0] * n
+    removed = [False] * n
+    heap = [(value, v) for v, value in enumerate(strength)]
+    heapq.heapify(heap)
+    level = -np.inf
+    while heap:
+        value, v = heapq.heappop(heap)
+        if removed[v] or value != strength[v]:
+            continue
+        removed[v] = True
+        level = max(level, value)
+        core[v] = level
+        for entry in range(indptr[v], indptr[v + 1]):
+            u = indices[entry]
+            if not removed[u]:
+                strength[u] -= data[entry]
+                heapq.heappush(heap, (strength[u], u))
+    return np.array(core, dtype=np.float64)
+
+
+@profiled
+def core_numbers(arrays: GraphArrays, weighted: bool = False) -> np.ndarray:
+    """
+    Core number of every node by peeling: nodes are removed in order of their remaining degree, and every
+    removal lowers its neighbors' degrees. Unweighted, the nodes are kept bin-sorted by degree (Batagelj and
+    Zaversnik), so each edge is handled once in O(1) and the whole peel is O(n + m). Self-loops are ignored.
+    With `weighted=True` this is the s-core decomposition (Eidsaa and Almaas), peeling by node strength from a
+    heap (O(m log n)): the s-core number of a node is the largest s such that it belongs to a subgraph whose
+    strengths are all >= s.
+    :param arrays: array representation of the graph (see `graph_arrays`)
+    :param weighted: peel by strength (sum of edge weights) instead of degree
+    :return: core number (s-core number if weighted) of every node, in `arrays.nodes` order
+    """
+    adjacency = _simple_adjacency(arrays, weighted)
+    if weighted:
+        strength = np.asarray(adjacency.sum(axis=1)).ravel()
+        return _heap_strength_cores(adjacency.indptr, adjacency.indices, adjacency.data, strength)
+    return _bin_sort_cores(adjacency.indptr, adjacency.indices, np.diff(adjacency.indptr))
+
+
+def _pair_counts(left: sparse.csr_matrix, right: sparse.csr_matrix, src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """Entries (src, dst) of the sparse product left @ right, i.e. the number of common neighbors"""
+    return np.asarray((left @ right)[src, dst]).ravel()
+
+
+@profiled
+def truss_numbers(arrays: GraphArrays) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Truss number of every edge and node by peeling edges in rounds. The support of an edge is the number of
+    triangles it closes; all edges with support at most k - 2 are removed at once, and the support lost by
+    the remaining edges is the count of triangles through removed edges, (R A + A R + R R) restricted to the
+    remaining adjacency A, where R holds the edges removed in the round. Self-loops are ignored.
+    :param arrays: array representation of the graph (see `graph_arrays`)
+    :return: tuple (truss number of every non-loop edge, in `arrays.src`/`arrays.dst` order with 0 for self-loops;
+        truss number of every node, the largest k such that it belongs to the k-truss, 0 for isolated nodes)
+    """
+    from scipy import sparse
+
+    def symmetric(mask: np.ndarray) -> sparse.csr_matrix:
+        ones = np.ones(2 * mask.sum())
+        rows = np.concatenate([src[mask], dst[mask]])
+        cols = np.concatenate([dst[mask], src[mask]])
+        return sparse.csr_matrix((ones, (rows, cols)), shape=(arrays.n, arrays.n))
+
+    loops = arrays.src == arrays.dst
+    src, dst = arrays.src[~loops], arrays.dst[~loops]
+    alive = np.ones(len(src), dtype=bool)
+    remaining = symmetric(alive)
+    support = _pair_counts(remaining, remaining, src, dst)
+    truss = np.zeros(len(src), dtype=np.int64)
+    k = 2
+
+    while alive.any():
+        frontier = alive & (support <= k - 2)
+        if not frontier.any():
+            k = int(support[alive].min()) + 2
+            continue
+        truss[frontier] = k
+        alive &= ~frontier
+        if not alive.any():
+            break
+        removed, remaining = symmetric(frontier), symmetric(alive)
+        s, d = src[alive], dst[alive]
+        lost = (
+            _pair_counts(removed, remaining, s, d)
+            + _pair_counts(remaining, removed, s, d)
+            + _pair_counts(removed, removed, s, d)
+        )
+        support[alive] -= lost.astype(np.int64)
+
+    edge_truss = np.zeros(arrays.m, dtype=np.int64)
+    edge_truss[~loops] = truss
+    node_truss = np.zeros(arrays.n, dtype=np.int64)
+    np.maximum.at(node_truss, src, truss)
+    np.maximum.at(node_truss, dst, truss)
+    return edge_truss, node_truss
+
+
+def decompose(graph: nx.Graph, weight: Optional[str] = None) -> pd.DataFrame:
+    """
+    Core, s-core and truss numbers of every node of a graph.
+    :param graph: NetworkX graph object
+    :param weight: edge attribute used for the s-core decomposition (None: the s-core equals the k-core)
+    :return: DataFrame indexed by node with the columns `core_number`, `s_core_number` and `truss_number`
+    """
+    arrays = graph_arrays(graph, weight=weight)
+    return pd.DataFrame(
+        {
+            'core_number': core_numbers(arrays),
+            's_core_number': core_numbers(arrays, weighted=True),
+            'truss_number': truss_numbers(arrays)[1],
+        },
+        index=pd.Index(arrays.nodes, name='id'),
+    )
+
+
+@profiled
+def shell_summary(
+        graph: nx.Graph,
+        shells: np.ndarray,
+        attributes: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
+    """
+    Summary of the nested shells of a decomposition (k-core or k-truss): for every level k the number of nodes in
+    the shell (level exactly k) and in the core (level >= k), the edge count and density of the core, and the
+    most common value of every attribute column in the core.
+    :param graph: NetworkX graph object
+    :param shells: level of every node, in `graph_arrays(graph).nodes` order (e.g. `core_numbers`)
+    :param attributes: node attributes indexed by node, e.g. affiliation or race (optional)
+    :return: DataFrame with one row per level present in the graph, innermost last
+    """
+    arrays = graph_arrays(graph)
+    levels = np.unique(shells)
+    position = np.searchsorted(levels, shells)
+
+    shell_sizes = np.bincount(position, minlength=len(levels))
+    core_sizes = np.cumsum(shell_sizes[::-1])[::-1]
+    # an edge belongs to every core containing both endpoints
+    edge_levels = np.minimum(position[arrays.src], position[arrays.dst])
+    core_edges = np.cumsum(np.bincount(edge_levels, minlength=len(levels))[::-1])[::-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        density = np.where(core_sizes > 1, 2 * core_edges / (core_sizes * (core_sizes - 1)), np.nan)
+
+    summary = pd.DataFrame({
+        'k': levels,
+        'shell_nodes': shell_sizes,
+        'core_nodes': core_sizes,
+        'core_edges': core_edges,
+        'core_density': density.round(4),
+    })
+    if attributes is not None:
+        aligned = attributes.reindex(arrays.nodes)
+        for column in aligned.columns:
+            dominant = []
+            for k in levels:
+                counts = aligned.loc[shells >= k, column].value_counts()
+                dominant.append(f"{counts.index[0]} ({counts.iloc[0] / counts.sum():.0%})" if len(counts) else '')
+            summary[f'dominant_{column}'] = dominant
+    return summary
+
+
+def save_shell_tables(
+        graph: nx.Graph,
+        nodes_data: pd.DataFrame,
+        attribute_columns: List[str] = ('affiliation_first', 'race_first'),
+        figures_dir: Union[Path, str] = FIGURES_DIR,
+):
+    """
+    Save the k-core and k-truss shell summaries as markdown tables for the analysis report.
+    :param graph: NetworkX graph object
+    :param nodes_data: processed nodes data with `id`, `core_number` and `truss_number` columns
+    :param attribute_columns: node attribute columns to report the dominant value of
+    :param figures_dir: directory of the markdown tables
+    :return: None
+    """
+    from src.my_utils import save_table_to_markdown
+
+    arrays = graph_arrays(graph)
+    nodes = nodes_data.set_index('id').reindex(arrays.nodes)
+    attributes = nodes[list(attribute_columns)]
+    for column, name, title in (
+            ('core_number', 'k_core_shells', 'K-Core Shells'),
+            ('truss_number', 'k_truss_shells', 'K-Truss Shells'),
+    ):
+        summary = shell_summary(graph, nodes[column].fillna(0).to_numpy(dtype=np.int64), attributes)
+        save_table_to_markdown(summary, filename=Path(figures_dir) / f'table_{name}.md', table_title=title)
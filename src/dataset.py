@@ -1,21 +1,26 @@
+from __future__ import annotations
+
+import os
 import re
 import json
-import time
 import typer
-import requests
 import numpy as np
 import pandas as pd
 from tqdm import tqdm
 from pathlib import Path
 from loguru import logger
-from bs4 import BeautifulSoup
 from typing import (
+    TYPE_CHECKING,
+    Dict,
     List,
     Optional,
     Union,
 )
 from urllib.parse import urljoin
 
+if TYPE_CHECKING:
+    import asyncio
+
 from src.config import (
     PROCESSED_DATA_DIR,
     RAW_DATA_DIR,
@@ -51,6 +56,9 @@ def get_malazan_characters(
         - name: Character name
         - info: Character description and book references
     """
+    import requests
+    from bs4 import BeautifulSoup
+
     try:
         # Get the webpage
         response = requests.get(url)
@@ -130,14 +138,53 @@ def find_match(text: str, search_list: List) -> str | None:
     return None
 
 
-def get_character_info(url: str) -> dict:
+def _has_class(class_name: str) -> str:
+    """XPath predicate matching elements having `class_name` among their classes (as bs4 `class_=` does)"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+def _parse_character_info_lxml(html: Union[str, bytes]) -> dict:
+    """lxml/XPath version of `parse_character_info` reading only the page title and the infobox fields"""
+    import lxml.html
+
+    tree = lxml.html.fromstring(html)
+
+    character_info = {'name': tree.xpath(f"//h1[{_has_class('page-header__title')}]")[0].text_content().strip()}
+
+    def extract_list_data(data_source: str) -> List[str]:
+        data_divs = tree.xpath('//div[@data-source=$data_source]', data_source=data_source)
+        if data_divs:
+            data_values = data_divs[0].xpath(f".//div[{_has_class('pi-data-value')}]")
+            if data_values:
+                links = data_values[0].xpath('.//a')
+                if links:
+                    return [link.text_content().strip() for link in links]
+                else:
+                    return [data_values[0].text_content().strip()]
+        return []
+
+    character_info['affiliation'] = extract_list_data('affiliation')
+    character_info['race'] = extract_list_data('race')
+    character_info['gender'] = extract_list_data('gender')
+    character_info['warrens'] = extract_list_data('warren')
+
+    return character_info
+
+
+def parse_character_info(html: Union[str, bytes], targeted: bool = True) -> dict:
     """
-    Takes url-address from Malazan wiki and returns dictionary with a character parameters.
-    :param url: character web-page from malazan-wiki. For example, `https://malazan.fandom.com/wiki/Anomander_Rake`.
+    Extract the character parameters from the html of a Malazan wiki character page.
+    :param html: page content
+    :param targeted: read only the page title and the infobox fields with lxml; False builds the full
+        BeautifulSoup tree of the page
     :return: dictionary with the following keys: `name`, `affiliation`, `race`, `gender`, `warrens`.
     """
-    response = requests.get(url)
-    soup = BeautifulSoup(response.content, 'html.parser')
+    if targeted:
+        return _parse_character_info_lxml(html)
+
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
 
     # Extract character name
     character_info = {'name': soup.find('h1', class_='page-header__title').text.strip()}
@@ -164,11 +211,178 @@ def get_character_info(url: str) -> dict:
     return character_info
 
 
+def get_character_info(url: str) -> dict:
+    """
+    Takes url-address from Malazan wiki and returns dictionary with a character parameters.
+    :param url: character web-page from malazan-wiki. For example, `https://malazan.fandom.com/wiki/Anomander_Rake`.
+    :return: dictionary with the following keys: `name`, `affiliation`, `race`, `gender`, `warrens`.
+    """
+    import requests
+
+    response = requests.get(url)
+    return parse_character_info(response.content)
+
+
+async def _fetch_pages(
+        urls: List[str],
+        queue: asyncio.Queue,
+        concurrency: int,
+        delay: float,
+        pages_dir: Optional[Path] = None,
+):
+    """Download pages in threads (at most `concurrency` at once) and put (position, html) into the bounded queue"""
+    import asyncio
+    import requests
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(position: int, url: str):
+        async with semaphore:
+            response = await asyncio.to_thread(requests.get, url)
+            if pages_dir is not None:
+                (pages_dir / f"{url.rstrip('/').rsplit('/', 1)[-1]}.html").write_bytes(response.content)
+            # waits while the parsers are behind, so fetched pages do not pile up in memory
+            await queue.put((position, response.content))
+            # be polite to the wiki
+            await asyncio.sleep(delay)
+
+    await asyncio.gather(*(fetch(position, url) for position, url in enumerate(urls)))
+
+
+async def _parse_pages(queue: asyncio.Queue, results: List, executor, progress):
+    """Parse the queued pages in the process pool until the end-of-work marker (None) is received"""
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    while (item := await queue.get()) is not None:
+        position, html = item
+        results[position] = await loop.run_in_executor(executor, parse_character_info, html)
+        progress.update()
+
+
+async def _fetch_characters_info(
+        urls: List[str], concurrency: int, delay: float, n_jobs: Optional[int], pages_dir: Optional[Path]
+) -> List[dict]:
+    import asyncio
+    from concurrent.futures import ProcessPoolExecutor
+
+    results = [None] * len(urls)
+    n_parsers = n_jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=n_parsers) as executor, tqdm(total=len(urls)) as progress:
+        queue = asyncio.Queue(maxsize=2 * n_parsers)
+
+        async def fetch():
+            await _fetch_pages(urls, queue, concurrency, delay, pages_dir)
+            for _ in range(n_parsers):
+                await queue.put(None)
+
+        # fetchers and parsers are awaited together: if a parser fails, nothing would drain the queue any more,
+        # so the error is raised at once and the remaining tasks are cancelled
+        tasks = [asyncio.create_task(fetch())] + [
+            asyncio.create_task(_parse_pages(queue, results, executor, progress)) for _ in range(n_parsers)
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+    return results
+
+
+def get_characters_info(
+        urls: List[str],
+        concurrency: int = 4,
+        delay: float = 1.0,
+        n_jobs: Optional[int] = None,
+        pages_dir: Optional[Path] = None,
+) -> List[dict]:
+    """
+    Fetch and parse Malazan wiki character pages: pages are downloaded concurrently and handed over through
+    a bounded queue to a process pool that parses them, so fetching and parsing overlap.
+    :param urls: character pages urls
+    :param concurrency: maximum number of simultaneous requests
+    :param delay: pause (seconds) of every fetcher after a request
+    :param n_jobs: number of parsing processes (default: number of CPUs)
+    :param pages_dir: directory to save the downloaded pages to (optional, used by `verify_parsers`)
+    :return: list of dictionaries as returned by `get_character_info`, in the order of `urls`
+    """
+    import asyncio
+
+    if pages_dir is not None:
+        pages_dir.mkdir(parents=True, exist_ok=True)
+    return asyncio.run(_fetch_characters_info(urls, concurrency, delay, n_jobs, pages_dir))
+
+
 def normalize_name(name):
     # Remove special characters and convert to lowercase
     return re.sub(r'\W+', '', name).lower()
 
 
+class NameIndex:
+    """
+    Index of normalized character names answering exact and substring-containment queries.
+
+    A query is contained if it is a substring of at least one normalized name (the same answer as
+    `any(query in name for name in names)`). Queries shorter than three characters are looked up in the set of
+    all short substrings; longer ones are checked only against the names sharing all of their trigrams
+    (trigram inverted index). Answers are memoized, link texts repeat a lot across category pages.
+
+    :param character_names: character names (raw, they are normalized with `normalize_name`)
+    """
+
+    def __init__(self, character_names: List[str]):
+        self.names = [normalize_name(name) for name in character_names]
+        self.exact = set(self.names)
+
+        # every substring of length 1 and 2
+        self.short_substrings = {
+            name[i:i + length] for name in self.exact for length in (1, 2) for i in range(len(name) - length + 1)
+        }
+        # trigram -> positions (in `_unique_names`) of the names containing it
+        self._unique_names = list(self.exact)
+        self.trigrams: Dict[str, set] = {}
+        for position, name in enumerate(self._unique_names):
+            for i in range(len(name) - 2):
+                self.trigrams.setdefault(name[i:i + 3], set()).add(position)
+        self._cache: Dict[str, bool] = {}
+
+    def __contains__(self, normalized_text: str) -> bool:
+        return self.contains_substring(normalized_text)
+
+    def is_name(self, normalized_text: str) -> bool:
+        """Whether the query equals one of the normalized names"""
+        return normalized_text in self.exact
+
+    def contains_substring(self, normalized_text: str) -> bool:
+        """Whether the query is a substring of one of the normalized names"""
+        cached = self._cache.get(normalized_text)
+        if cached is not None:
+            return cached
+
+        if not normalized_text:
+            found = bool(self.names)
+        elif normalized_text in self.exact:
+            found = True
+        elif len(normalized_text) < 3:
+            found = normalized_text in self.short_substrings
+        else:
+            postings = []
+            for i in range(len(normalized_text) - 2):
+                posting = self.trigrams.get(normalized_text[i:i + 3])
+                if posting is None:
+                    postings = None
+                    break
+                postings.append(posting)
+            if postings is None:
+                found = False
+            else:
+                candidates = set.intersection(*sorted(postings, key=len))
+                found = any(normalized_text in self._unique_names[position] for position in candidates)
+
+        self._cache[normalized_text] = found
+        return found
+
+
 def clean_name(name):
     if pd.isna(name):  # Handle NaN values
         return name
@@ -190,45 +404,65 @@ def clean_name(name):
     return name
 
 
-def get_malazan_characters_url(character_names, html_page_url):
-    """Given the link to the malazan wiki page parse the links to the pages about the characters"""
-    # Fetch the HTML content of the page
-    response = requests.get(html_page_url)
-    response.raise_for_status()  # Ensure we notice bad responses
-    soup = BeautifulSoup(response.text, 'html.parser')
+def extract_characters_urls(
+        html: Union[str, bytes], character_names: Union[List[str], NameIndex], targeted: bool = True
+) -> List[str]:
+    """
+    Extract links to the character pages from the html of a Malazan wiki page.
+    :param html: page content
+    :param character_names: names of the characters to look for (or a prebuilt NameIndex of them)
+    :param targeted: read only the links with lxml; False builds the full BeautifulSoup tree of the page
+    :return: list of character pages urls
+    """
+    # Extract all links from the page as (href, text) pairs
+    if targeted:
+        import lxml.html
+
+        links = [(link.get('href'), link.text_content()) for link in lxml.html.fromstring(html).xpath('//a[@href]')]
+    else:
+        from bs4 import BeautifulSoup
 
-    # Extract all links from the page
-    links = soup.find_all('a', href=True)
+        soup = BeautifulSoup(html, 'html.parser')
+        links = [(link['href'], link.get_text()) for link in soup.find_all('a', href=True)]
 
-    # Normalize character names
-    normalized_character_names = [normalize_name(name) for name in character_names]
+    # Index of the normalized character names
+    name_index = character_names if isinstance(character_names, NameIndex) else NameIndex(character_names)
 
     # Dictionary to store the matched URLs
     matched_urls = []
 
     # Iterate over all links and check for matches
-    for link in links:
-        href = link['href']
-        text = link.get_text()
+    for href, text in links:
         normalized_text = normalize_name(text)
 
         # Check if the link is a relative URL and points to a character page
         if href.startswith('/wiki/') and not any(
                 sub in href for sub in ['Special:', 'Category:', 'File:', 'Help:', 'Template:', 'User:', 'Talk:']):
             # Check if the normalized link text matches any of the normalized character names
-            if any(normalized_text in normalized_name for normalized_name in normalized_character_names):
+            if normalized_text in name_index:
                 full_url = f"https://malazan.fandom.com{href}"
                 matched_urls.append(full_url)
 
     return matched_urls
 
 
+def get_malazan_characters_url(character_names, html_page_url):
+    """Given the link to the malazan wiki page parse the links to the pages about the characters"""
+    import requests
+
+    # Fetch the HTML content of the page
+    response = requests.get(html_page_url)
+    response.raise_for_status()  # Ensure we notice bad responses
+    return extract_characters_urls(response.text, character_names)
+
+
 @app.command()
 def get_raw_data(raw_folder: Path = RAW_DATA_DIR):
     """Fetching raw data to enrich existing data"""
     logger.info("Getting Malazan Dramatis Personae List")
     characters_info = get_malazan_characters()
     character_names = characters_info['name'].tolist()
+    name_index = NameIndex(character_names)
 
     try:
         with open(raw_folder / "characters_urls.txt", "r") as file:
@@ -240,7 +474,7 @@ def get_raw_data(raw_folder: Path = RAW_DATA_DIR):
         characters_urls = []
         for category_link in tqdm(category_links):
             category_characters_links = get_malazan_characters_url(
-                character_names,
+                name_index,
                 html_page_url=category_link
             )
             characters_urls.extend(category_characters_links)
@@ -254,10 +488,9 @@ def get_raw_data(raw_folder: Path = RAW_DATA_DIR):
                 file.write(f"{item}\n")
 
     logger.info("Get Characters Data")
-    character_page_wiki_info = []
-    for character_url in tqdm(characters_urls):
-        character_page_wiki_info.append(get_character_info(str(character_url).strip()))
-        time.sleep(1)
+    character_page_wiki_info = get_characters_info(
+        [str(character_url).strip() for character_url in characters_urls], pages_dir=raw_folder / 'character_pages'
+    )
 
     # save character info
     with open(raw_folder / "characters_wiki_info.txt", "w") as file:
@@ -386,6 +619,31 @@ def get_nodes_data(
     logger.info(f"Saved Nodes Data to {processed_folder} folder", index=False)
 
 
+@app.command()
+def verify_parsers(pages_dir: Path = RAW_DATA_DIR / 'character_pages'):
+    """Check that the targeted parsers extract the same data as full-tree parsing on the saved pages"""
+    pages = sorted(pages_dir.glob('*.html'))
+    if not pages:
+        logger.warning(f"No saved pages found in {pages_dir}")
+        return
+
+    character_names = NameIndex([page.stem.replace('_', ' ') for page in pages])
+    mismatches = []
+    for page in tqdm(pages):
+        html = page.read_bytes()
+        if parse_character_info(html) != parse_character_info(html, targeted=False):
+            mismatches.append(f"{page.name} (character info)")
+        if extract_characters_urls(html, character_names) != extract_characters_urls(
+                html, character_names, targeted=False
+        ):
+            mismatches.append(f"{page.name} (character urls)")
+
+    if mismatches:
+        logger.error(f"Targeted parsing differs on {len(mismatches)} page(s): {', '.join(mismatches)}")
+        raise typer.Exit(code=1)
+    logger.success(f"Targeted parsing matches full-tree parsing on {len(pages)} pages")
+
+
 @app.command()
 def main(
         raw_folder: Path = RAW_DATA_DIR,
@@ -1,8 +1,6 @@
 import yaml
 import typer
 import pickle
-import pandas as pd
-import networkx as nx
 from loguru import logger
 from pathlib import Path
 
@@ -12,18 +10,30 @@ from src.config import (
     INTERIM_DATA_DIR,
     PARAMS,
 )
-from src import my_utils
+from src import profiling
 
 app = typer.Typer()
 
 
 @app.command()
+@profiling.stage('data_process')
 def main(
         input_edges_path: Path = INTERIM_DATA_DIR / 'edges_data.csv',
         input_nodes_path: Path = INTERIM_DATA_DIR / 'nodes_data.csv',
         output_dir: Path = PROCESSED_DATA_DIR,
         params_path: Path = PARAMS,
 ):
+    import pandas as pd
+    import networkx as nx
+
+    from src import (
+        my_utils,
+        cores,
+        layout,
+        node_attributes,
+        community_detection,
+    )
+
     logger.info("Transforming edges and nodes data")
 
     with open(params_path, 'r') as f:
@@ -50,11 +60,8 @@ def main(
         edge_attr='total_co_occurance',
     )
 
-    # Create node attributes for the Graph
-    for column in nodes_data.columns:
-        if column != 'id':  # Skip the name column since it's the node identifier
-            attr_dict = nodes_data.set_index('id')[column].to_dict()
-            nx.set_node_attributes(G, attr_dict, column)
+    # Attach node attributes as one columnar table; node attribute dicts are lazy views on it
+    node_attributes.attach(G, nodes_data, id_column='id')
 
     # Remove self-loops if there are any
     G.remove_edges_from(nx.selfloop_edges(G))
@@ -77,7 +84,8 @@ def main(
             right_on='index'
         )
         .drop(columns=['index_x', 'index_y'])
-        .assign(core_number=lambda df: df['id'].map(nx.core_number(G)).fillna(0))
+        .merge(cores.decompose(G, weight='total_co_occurance').reset_index(), how='left', on='id')
+        .fillna({'core_number': 0, 's_core_number': 0, 'truss_number': 0})
         .assign(k_clique_percolation=lambda df: df['id'].map(
             {node: i for i, comm in
              enumerate(nx.community.k_clique_communities(largest_cc_subgraph, params['k_clique_percolation_base'])) for
@@ -86,26 +94,40 @@ def main(
         )
         .assign(louvain_community=lambda df: df['id'].map(
             {node: i for i, comm in enumerate(
-                nx.community.louvain_communities(largest_cc_subgraph,
-                                                 resolution=params['louvain_communities_resolution'])
+                community_detection.FastCommunityUnfolding(largest_cc_subgraph, weight='total_co_occurance')
+                .run(resolution=params['louvain_communities_resolution'])
                 ) for node in comm}
             ).fillna(-1)
         )
-        .assign(asyn_lpa_community=lambda df: df['id'].map(
+        .assign(leiden_community=lambda df: df['id'].map(
             {node: i for i, comm in enumerate(
-                nx.community.asyn_lpa_communities(
-                    largest_cc_subgraph,
-                    weight='total_co_occurance'
-                    )
+                community_detection.WeightedLeiden(largest_cc_subgraph, weight='total_co_occurance')
+                .run(resolution=params['louvain_communities_resolution'])
                 ) for node in comm}
             ).fillna(-1)
         )
-        .astype({"core_number": "int", "k_clique_percolation": "int", "louvain_community": "int"})
+        .assign(asyn_lpa_community=lambda df: df['id'].map(
+            community_detection.LPACommunityDetection(
+                largest_cc_subgraph,
+                weight='total_co_occurance',
+                seed=params['lpa_seed'],
+                max_iter=params['lpa_max_iter'],
+            )
+            .run(seeds=range(params['lpa_seed'], params['lpa_seed'] + params['lpa_n_seeds']))
+            .get_node_community_mapping()
+            ).fillna(-1)
+        )
+        .astype({
+            "core_number": "int", "truss_number": "int", "k_clique_percolation": "int", "louvain_community": "int",
+            "leiden_community": "int", "asyn_lpa_community": "int",
+        })
         # .rename(columns={"id": "Id", "norm_name": "Label"})
     )
 
     with open(output_dir / "graph.pkl", "wb") as f:
         pickle.dump(G, f)
+    # warm-started from the previous run's positions, so small data changes converge in a few iterations
+    layout.graph_layout(G, weight='total_co_occurance', path=output_dir / "graph_layout.csv", save=True)
     nodes_data_processed.to_csv(output_dir / "nodes_data_processed.csv", index=False)
     edges_data_processed.to_csv(output_dir / "edges_data_processed.csv", index=False)
 
@@ -0,0 +1,135 @@
+import hashlib
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    Union,
+)
+
+import yaml
+import numpy as np
+import pandas as pd
+import networkx as nx
+from loguru import logger
+
+from src.config import FORCE_RENDER
+
+MANIFEST_NAME = 'figures_manifest.yaml'
+
+
+def _update_digest(digest, item: Any):
+    """
+    Feed a (possibly nested) python object into a hashlib digest in a type-aware, order-stable way.
+    :param digest: hashlib digest object to update
+    :param item: object to hash; numpy arrays, pandas objects, graphs, mappings and sequences are supported
+    :return: None
+    """
+    if isinstance(item, np.ndarray):
+        digest.update(f'ndarray:{item.dtype.str}:{item.shape}'.encode())
+        if item.dtype.hasobject:
+            digest.update(repr(item.tolist()).encode())
+        else:
+            digest.update(np.ascontiguousarray(item).tobytes())
+    elif isinstance(item, (pd.DataFrame, pd.Series)):
+        digest.update(f'{type(item).__name__}:{item.shape}'.encode())
+        digest.update(repr(list(item.columns if isinstance(item, pd.DataFrame) else [item.name])).encode())
+        try:
+            digest.update(pd.util.hash_pandas_object(item, index=True).to_numpy().tobytes())
+        except TypeError:  # unhashable cells (e.g. lists)
+            digest.update(item.to_json(default_handler=repr).encode())
+    elif isinstance(item, nx.Graph):
+        digest.update(f'graph:{type(item).__name__}'.encode())
+        _update_digest(digest, sorted(((repr(n), sorted(d.items())) for n, d in item.nodes(data=True)), key=repr))
+        _update_digest(
+            digest,
+            sorted(((sorted((repr(u), repr(v))), sorted(d.items())) for u, v, d in item.edges(data=True)), key=repr)
+        )
+    elif isinstance(item, dict):
+        digest.update(b'dict')
+        for key in sorted(item, key=repr):
+            _update_digest(digest, key)
+            _update_digest(digest, item[key])
+    elif isinstance(item, (list, tuple, set, frozenset)):
+        values = sorted(item, key=repr) if isinstance(item, (set, frozenset)) else item
+        digest.update(f'{type(item).__name__}:{len(values)}'.encode())
+        for value in values:
+            _update_digest(digest, value)
+    elif isinstance(item, np.generic):
+        _update_digest(digest, item.item())
+    else:
+        digest.update(f'{type(item).__name__}:{item!r}'.encode())
+
+
+def data_hash(*data, **params) -> str:
+    """
+    Hash the data a figure (or table) is built from together with its plot parameters.
+    :param data: plotted data (arrays, DataFrames, graphs, dicts, lists or scalars)
+    :param params: plot parameters that affect the rendered output (titles, bins, figsize, ...)
+    :return: hex digest identifying the rendered output
+    """
+    digest = hashlib.sha256()
+    for item in data:
+        _update_digest(digest, item)
+    _update_digest(digest, params)
+    return digest.hexdigest()
+
+
+def _manifest_path(filename: Union[Path, str]) -> Path:
+    return Path(filename).parent / MANIFEST_NAME
+
+
+def read_manifest(directory: Union[Path, str]) -> Dict[str, str]:
+    """
+    Read the mapping of output file names to the hash of the data they were rendered from.
+    :param directory: directory containing the rendered outputs
+    :return: dictionary file name -> data hash (empty if there is no manifest yet)
+    """
+    manifest_path = Path(directory) / MANIFEST_NAME
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path, 'r') as f:
+        return yaml.safe_load(f) or {}
+
+
+def is_cached(filename: Union[Path, str], key: str) -> bool:
+    """
+    Check whether an output with the same data hash has already been rendered.
+    :param filename: path of the figure or table
+    :param key: data hash as returned by `data_hash`
+    :return: True if the file exists and the manifest records the same hash
+    """
+    filename = Path(filename)
+    if FORCE_RENDER or not filename.exists():
+        return False
+    if read_manifest(filename.parent).get(filename.name) == key:
+        logger.debug(f"Skipping {filename.name}: plotted data unchanged")
+        return True
+    return False
+
+
+def record(filename: Union[Path, str], key: str):
+    """
+    Store the data hash of a freshly rendered output in the manifest next to it.
+    :param filename: path of the figure or table
+    :param key: data hash as returned by `data_hash`
+    :return: None
+    """
+    filename = Path(filename)
+    manifest = read_manifest(filename.parent)
+    manifest[filename.name] = key
+    with open(_manifest_path(filename), 'w') as f:
+        yaml.safe_dump(dict(sorted(manifest.items())), f)
+
+
+def save_figure(filename: Union[Path, str], key: str, **savefig_kwargs):
+    """
+    Save the current matplotlib figure and record its data hash in the manifest.
+    :param filename: destination path of the figure
+    :param key: data hash as returned by `data_hash`
+    :param savefig_kwargs: keyword arguments passed to `plt.savefig` (dpi, bbox_inches, ...)
+    :return: None
+    """
+    import matplotlib.pyplot as plt
+
+    plt.savefig(filename, **savefig_kwargs)
+    record(filename, key)
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import weakref
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+)
+
+import numpy as np
+import networkx as nx
+
+if TYPE_CHECKING:
+    from scipy import sparse
+
+
+class GraphArrays:
+    """
+    Integer-indexed array representation of an undirected networkx graph.
+
+    Nodes are numbered in `graph.nodes()` order; every undirected edge is stored once in the `src`/`dst`
+    index arrays together with its weight, and a symmetric CSR adjacency is built lazily from them.
+
+    Attributes:
+        nodes (list): Node labels in graph order, position is the integer node index
+        node_index (dict): Mapping of node labels to integer indices
+        src (np.ndarray): Source node index of each edge
+        dst (np.ndarray): Target node index of each edge
+        weights (np.ndarray): Edge weights (ones for unweighted graphs)
+        weight (str): Edge attribute the weights were read from (None for unweighted)
+    """
+
+    def __init__(self, graph: nx.Graph, weight: Optional[str] = None):
+        """
+        Build the edge index arrays of a graph.
+        :param graph: NetworkX graph object
+        :param weight: edge attribute holding the weight; edges without it get weight 1 (None for unweighted)
+        """
+        self.weight = weight
+        self.nodes: List[Hashable] = list(graph.nodes())
+        self.node_index: Dict[Hashable, int] = {node: i for i, node in enumerate(self.nodes)}
+
+        m = graph.number_of_edges()
+        if weight is None:
+            edges = np.array([(self.node_index[u], self.node_index[v]) for u, v in graph.edges()], dtype=np.int64)
+            self.weights = np.ones(m, dtype=np.float64)
+        else:
+            edge_data = [(self.node_index[u], self.node_index[v], w) for u, v, w in graph.edges(data=weight, default=1)]
+            edges = np.array([(u, v) for u, v, _ in edge_data], dtype=np.int64)
+            self.weights = np.array([w for _, _, w in edge_data], dtype=np.float64)
+
+        edges = edges.reshape(-1, 2)
+        self.src = edges[:, 0]
+        self.dst = edges[:, 1]
+        self._adjacency = None
+
+    @property
+    def n(self) -> int:
+        """Number of nodes"""
+        return len(self.nodes)
+
+    @property
+    def m(self) -> int:
+        """Number of (undirected) edges"""
+        return len(self.src)
+
+    @property
+    def adjacency(self) -> sparse.csr_matrix:
+        """Symmetric weighted adjacency matrix in CSR format (self-loops stored once, as in networkx)"""
+        from scipy import sparse
+
+        if self._adjacency is None:
+            loops = self.src == self.dst
+            rows = np.concatenate([self.src, self.dst[~loops]])
+            cols = np.concatenate([self.dst, self.src[~loops]])
+            data = np.concatenate([self.weights, self.weights[~loops]])
+            self._adjacency = sparse.csr_matrix((data, (rows, cols)), shape=(self.n, self.n))
+            self._adjacency.sum_duplicates()
+        return self._adjacency
+
+    def block(self, rows: np.ndarray, cols: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Dense block of the adjacency matrix between two node subsets, sliced straight from the CSR rows, so its
+        cost depends on the subset sizes and their degrees rather than on the graph size.
+        :param rows: integer node indices of the block rows
+        :param cols: integer node indices of the block columns (default: `rows`)
+        :return: dense len(rows) x len(cols) array of edge weights (0 for missing edges)
+        """
+        cols = rows if cols is None else cols
+        return self.adjacency[rows][:, cols].toarray()
+
+    def indices_of(self, nodes: List[Hashable]) -> np.ndarray:
+        """
+        Translate node labels into integer node indices.
+        :param nodes: list of node labels
+        :return: integer index array
+        :raises ValueError: If some of the nodes are not in the graph
+        """
+        try:
+            return np.array([self.node_index[node] for node in nodes], dtype=np.int64)
+        except KeyError as e:
+            raise ValueError(f"Node {e.args[0]!r} does not exist in the graph") from None
+
+
+# Arrays are cached per graph object and invalidated when the graph's size changes
+_CACHE: 'weakref.WeakKeyDictionary[nx.Graph, Dict]' = weakref.WeakKeyDictionary()
+
+
+def graph_arrays(graph: nx.Graph, weight: Optional[str] = None) -> GraphArrays:
+    """
+    Return the (cached) array representation of a graph.
+    :param graph: NetworkX graph object
+    :param weight: edge attribute holding the weight (None for unweighted)
+    :return: GraphArrays instance shared by every caller asking for the same graph and weight
+    """
+    signature = (graph.number_of_nodes(), graph.number_of_edges())
+    per_graph = _CACHE.setdefault(graph, {})
+    cached = per_graph.get(weight)
+    if cached is None or cached[0] != signature:
+        cached = (signature, GraphArrays(graph, weight=weight))
+        per_graph[weight] = cached
+    return cached[1]
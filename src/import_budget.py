@@ -0,0 +1,71 @@
+import re
+import sys
+import subprocess
+from typing import Dict
+
+import typer
+from loguru import logger
+
+from src.config import PROJ_ROOT
+
+app = typer.Typer()
+
+# Import-time budget (seconds) of every CLI entry point: importing the module must stay cheap,
+# heavy dependencies are only loaded inside the commands that use them
+BUDGETS: Dict[str, float] = {
+    'src.dataset': 1.0,
+    'src.cooccurrence': 1.0,
+    'src.dataset_process': 0.5,
+    'src.plots': 0.5,
+    'src.update_report': 0.5,
+    'src.benchmarks': 1.0,
+    'src.query_server': 0.5,
+    'src.import_budget': 0.5,
+}
+
+# Modules that must not be imported just by loading an entry point
+HEAVY_MODULES = ['matplotlib', 'seaborn', 'scipy', 'cdlib', 'bs4', 'requests']
+
+
+def import_time(module: str) -> Dict[str, float]:
+    """
+    Measure the cumulative import time of a module and its dependencies in a fresh interpreter.
+    :param module: dotted module name
+    :return: dictionary mapping every imported top-level module (at any depth) to its cumulative import time in seconds
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=PROJ_ROOT, capture_output=True, text=True, check=True,
+    )
+    # lines look like "import time:   self [us] | cumulative | imported package" (nesting by indentation)
+    times = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \| +(\S+)', line)
+        if match:
+            times[match.group(2)] = int(match.group(1)) / 1e6
+    return times
+
+
+@app.command()
+def main(repeat: int = typer.Option(3, help="Number of measurements, the fastest one is compared")):
+    """Check the import time of every entry point against its budget and exit with an error if one is exceeded"""
+    failures = []
+    for module, budget in BUDGETS.items():
+        measurements = [import_time(module) for _ in range(repeat)]
+        elapsed = min(times[module] for times in measurements)
+        heavy = sorted({name.split('.')[0] for name in set().union(*measurements)} & set(HEAVY_MODULES))
+        status = 'ok' if elapsed <= budget and not heavy else 'FAIL'
+        logger.info(f"{module}: {elapsed:.3f}s (budget {budget:.2f}s) {status}")
+        if heavy:
+            logger.error(f"{module} imports heavy modules at startup: {', '.join(heavy)}")
+        if status == 'FAIL':
+            failures.append(module)
+
+    if failures:
+        logger.error(f"Import-time budget exceeded: {', '.join(failures)}")
+        raise typer.Exit(code=1)
+    logger.success("All entry points are within their import-time budget")
+
+
+if __name__ == '__main__':
+    app()
@@ -0,0 +1,383 @@
+from __future__ import annotations
+
+import weakref
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Hashable,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+import networkx as nx
+from loguru import logger
+
+from src.config import (
+    FIGURES_DIR,
+    PROCESSED_DATA_DIR,
+)
+from src import figure_cache
+from src.graph_arrays import graph_arrays
+from src.profiling import profiled
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from scipy import sparse
+
+# Node positions of the processed graph, written next to graph.pkl by dataset_process
+LAYOUT_PATH = PROCESSED_DATA_DIR / 'graph_layout.csv'
+
+# Exact O(n^2) repulsion below this many nodes, Barnes-Hut above
+BARNES_HUT_THRESHOLD = 1000
+# Average number of nodes per cell of the finest Barnes-Hut grid
+LEAF_SIZE = 4
+# Rows of the pairwise distance matrix computed at once by the exact repulsion
+EXACT_BLOCK = 512
+
+
+def _pairwise_repulsion(
+        pos: np.ndarray, mass: np.ndarray, i: np.ndarray, j_pos: np.ndarray, j_mass: np.ndarray, scaling: float
+) -> np.ndarray:
+    """ForceAtlas2 repulsion k_r * m_i * m_j / d on the nodes `i` from the bodies at `j_pos` (one per row)"""
+    delta = pos[i] - j_pos
+    dist2 = np.maximum(np.einsum('ij,ij->i', delta, delta), 1e-12)
+    return delta * (scaling * mass[i] * j_mass / dist2)[:, None]
+
+
+def _accumulate(forces: np.ndarray, i: np.ndarray, values: np.ndarray):
+    """Add the force rows `values` to the nodes `i` (repeated indices are summed)"""
+    n = len(forces)
+    forces[:, 0] += np.bincount(i, weights=values[:, 0], minlength=n)
+    forces[:, 1] += np.bincount(i, weights=values[:, 1], minlength=n)
+
+
+def _repulsion_exact(pos: np.ndarray, mass: np.ndarray, scaling: float) -> np.ndarray:
+    """Repulsion between all node pairs, computed in row blocks to bound memory"""
+    n = len(pos)
+    forces = np.zeros_like(pos)
+    for start in range(0, n, EXACT_BLOCK):
+        rows = slice(start, min(start + EXACT_BLOCK, n))
+        delta = pos[rows, None, :] - pos[None, :, :]
+        dist2 = np.einsum('ijk,ijk->ij', delta, delta)
+        dist2[np.arange(dist2.shape[0]), np.arange(start, rows.stop)] = np.inf
+        factor = scaling * mass[rows, None] * mass[None, :] / np.maximum(dist2, 1e-12)
+        forces[rows] = np.einsum('ijk,ij->ik', delta, factor)
+    return forces
+
+
+def _repulsion_barnes_hut(pos: np.ndarray, mass: np.ndarray, scaling: float) -> np.ndarray:
+    """
+    Barnes-Hut repulsion over a quadtree stored as one regular grid per level. At every level a node interacts
+    with the centers of mass of the cells that are children of its parent cell's neighbors but not neighbors of
+    its own cell (well separated, as in the interaction lists of fast multipole methods); the nodes of the
+    neighboring cells of the finest level are summed exactly. Every node pair is accounted for exactly once.
+    """
+    n = len(pos)
+    levels = max(2, int(np.ceil(np.log(max(n / LEAF_SIZE, 1)) / np.log(4))))
+    low = pos.min(axis=0)
+    unit = (pos - low) / max((pos.max(axis=0) - low).max(), 1e-12)
+    forces = np.zeros_like(pos)
+    nodes = np.arange(n)
+
+    for level in range(2, levels + 1):
+        size = 2 ** level
+        cx, cy = np.minimum((unit * size).astype(np.int64), size - 1).T
+        cell_id = cx * size + cy
+        cell_mass = np.bincount(cell_id, weights=mass, minlength=size * size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            center = np.stack([
+                np.bincount(cell_id, weights=mass * pos[:, 0], minlength=size * size),
+                np.bincount(cell_id, weights=mass * pos[:, 1], minlength=size * size),
+            ], axis=1) / cell_mass[:, None]
+
+        px, py = cx // 2 * 2, cy // 2 * 2
+        for dx in range(-2, 4):
+            ox = px + dx
+            valid_x = (ox >= 0) & (ox < size)
+            near_x = np.abs(ox - cx) <= 1
+            for dy in range(-2, 4):
+                oy = py + dy
+                valid = valid_x & (oy >= 0) & (oy < size) & ~(near_x & (np.abs(oy - cy) <= 1))
+                i = nodes[valid]
+                other_id = ox[i] * size + oy[i]
+                occupied = cell_mass[other_id] > 0
+                i, other_id = i[occupied], other_id[occupied]
+                _accumulate(forces, i, _pairwise_repulsion(pos, mass, i, center[other_id], cell_mass[other_id], scaling))
+
+    # exact near field: nodes in the same or an adjacent cell of the finest level
+    size = 2 ** levels
+    cx, cy = np.minimum((unit * size).astype(np.int64), size - 1).T
+    order = np.argsort(cx * size + cy, kind='stable')
+    bounds = np.searchsorted((cx * size + cy)[order], np.arange(size * size + 1))
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            ox, oy = cx + dx, cy + dy
+            i = nodes[(ox >= 0) & (ox < size) & (oy >= 0) & (oy < size)]
+            other_id = ox[i] * size + oy[i]
+            starts, ends = bounds[other_id], bounds[other_id + 1]
+            counts = ends - starts
+            offsets = np.cumsum(counts) - counts
+            j = order[np.repeat(starts - offsets, counts) + np.arange(counts.sum())]
+            i = np.repeat(i, counts)
+            i, j = i[i != j], j[i != j]
+            _accumulate(forces, i, _pairwise_repulsion(pos, mass, i, pos[j], mass[j], scaling))
+    return forces
+
+
+def forceatlas2(
+        adjacency: sparse.csr_matrix,
+        positions: Optional[np.ndarray] = None,
+        iterations: int = 1000,
+        seed: int = 42,
+        scaling_ratio: float = 2.0,
+        gravity: float = 1.0,
+        edge_weight_influence: float = 1.0,
+        jitter_tolerance: float = 1.0,
+        barnes_hut: Optional[bool] = None,
+        tolerance: float = 1e-3,
+) -> Tuple[np.ndarray, int]:
+    """
+    ForceAtlas2 layout (Jacomy et al., 2014) over a sparse adjacency: linear attraction along edges, repulsion
+    k_r * (deg_i + 1) * (deg_j + 1) / d between all node pairs, gravity towards the origin and the adaptive
+    global/local speed of the Gephi implementation.
+    :param adjacency: symmetric weighted adjacency matrix (self-loops are ignored)
+    :param positions: initial positions (n x 2) to warm-start from (default: seeded random positions)
+    :param iterations: maximum number of iterations
+    :param seed: random seed of the initial positions
+    :param scaling_ratio: repulsion strength (k_r); larger values spread the layout
+    :param gravity: strength of the attraction towards the origin (k_g)
+    :param edge_weight_influence: exponent applied to the edge weights (0 ignores the weights)
+    :param jitter_tolerance: tolerated oscillation; larger values converge faster but less precisely
+    :param barnes_hut: approximate the repulsion with Barnes-Hut (default: above BARNES_HUT_THRESHOLD nodes)
+    :param tolerance: stop when the mean node displacement falls below this fraction of the layout extent
+    :return: tuple (positions (n x 2), number of iterations run)
+    """
+    from scipy import sparse
+
+    n = adjacency.shape[0]
+    if positions is None:
+        positions = np.random.default_rng(seed).uniform(-1, 1, size=(n, 2)) * np.sqrt(max(n, 1))
+    pos = np.array(positions, dtype=np.float64)
+    if n < 2:
+        return pos, 0
+
+    adjacency = sparse.triu(adjacency, k=1, format='coo')
+    src, dst = adjacency.row, adjacency.col
+    weights = adjacency.data.astype(np.float64) ** edge_weight_influence
+    mass = np.bincount(np.concatenate([src, dst]), minlength=n) + 1.0
+    repulsion = _repulsion_barnes_hut if (n > BARNES_HUT_THRESHOLD if barnes_hut is None else barnes_hut) \
+        else _repulsion_exact
+
+    speed, speed_efficiency = 1.0, 1.0
+    old_forces = np.zeros_like(pos)
+    iteration = 0
+    for iteration in range(1, iterations + 1):
+        forces = repulsion(pos, mass, scaling_ratio)
+        # linear attraction along the edges
+        pull = (pos[dst] - pos[src]) * weights[:, None]
+        _accumulate(forces, src, pull)
+        _accumulate(forces, dst, -pull)
+        # gravity: constant pull of strength k_g * mass towards the origin
+        norm = np.maximum(np.linalg.norm(pos, axis=1), 1e-12)
+        forces -= pos * (gravity * mass / norm)[:, None]
+
+        # adaptive speed (Gephi ForceAtlas2 implementation)
+        swinging = mass * np.linalg.norm(forces - old_forces, axis=1)
+        traction = mass * np.linalg.norm(forces + old_forces, axis=1) / 2
+        total_swing, total_traction = swinging.sum(), traction.sum()
+        estimated_jitter = 0.05 * np.sqrt(n)
+        jitter = jitter_tolerance * max(
+            np.sqrt(estimated_jitter), min(10.0, estimated_jitter * total_traction / n ** 2)
+        )
+        if total_swing / max(total_traction, 1e-12) > 2.0:
+            if speed_efficiency > 0.05:
+                speed_efficiency *= 0.5
+            jitter = max(jitter, jitter_tolerance)
+        target_speed = jitter * speed_efficiency * total_traction / max(total_swing, 1e-12)
+        if total_swing > jitter * total_traction:
+            if speed_efficiency > 0.05:
+                speed_efficiency *= 0.7
+        elif speed < 1000:
+            speed_efficiency *= 1.3
+        speed += min(target_speed - speed, 0.5 * speed)
+
+        step = forces * (speed / (1 + np.sqrt(speed * swinging)))[:, None]
+        pos += step
+        old_forces = forces
+
+        extent = np.ptp(pos, axis=0).max()
+        if np.linalg.norm(step, axis=1).mean() < tolerance * max(extent, 1e-12):
+            break
+    return pos, iteration
+
+
+def read_layout(path: Union[Path, str] = LAYOUT_PATH) -> Dict[Hashable, np.ndarray]:
+    """
+    Read persisted node positions.
+    :param path: CSV file with the columns id, x, y
+    :return: dictionary of node -> position (empty if the file does not exist)
+    """
+    import pandas as pd
+
+    path = Path(path)
+    if not path.exists():
+        return {}
+    layout = pd.read_csv(path)
+    return dict(zip(layout['id'], layout[['x', 'y']].to_numpy()))
+
+
+def write_layout(positions: Dict[Hashable, np.ndarray], path: Union[Path, str] = LAYOUT_PATH):
+    """
+    Persist node positions.
+    :param positions: dictionary of node -> position
+    :param path: destination CSV file (columns id, x, y)
+    :return: None
+    """
+    import pandas as pd
+
+    coordinates = np.array(list(positions.values())).reshape(-1, 2)
+    pd.DataFrame({'id': list(positions), 'x': coordinates[:, 0], 'y': coordinates[:, 1]}).to_csv(path, index=False)
+    logger.info(f"Layout of {len(positions)} nodes saved to {path}")
+
+
+def _initial_positions(
+        graph: nx.Graph, nodes: list, cached: Dict[Hashable, np.ndarray], seed: int
+) -> Optional[np.ndarray]:
+    """Warm-start positions: cached nodes keep theirs, new nodes start next to their cached neighbors"""
+    if not any(node in cached for node in nodes):
+        return None
+    rng = np.random.default_rng(seed)
+    known = np.array([cached[node] for node in nodes if node in cached])
+    spread = max(np.ptp(known, axis=0).max(), 1.0) if len(known) > 1 else 1.0
+    positions = np.empty((len(nodes), 2))
+    for i, node in enumerate(nodes):
+        if node in cached:
+            positions[i] = cached[node]
+            continue
+        neighbors = [cached[neighbor] for neighbor in graph.neighbors(node) if neighbor in cached]
+        anchor = np.mean(neighbors, axis=0) if neighbors else known.mean(axis=0)
+        positions[i] = anchor + rng.normal(scale=0.01 * spread if neighbors else 0.5 * spread, size=2)
+    return positions
+
+
+# Layouts are cached per graph object and recomputed when the graph's size changes
+_CACHE: 'weakref.WeakKeyDictionary[nx.Graph, Dict]' = weakref.WeakKeyDictionary()
+
+
+@profiled
+def graph_layout(
+        graph: nx.Graph,
+        weight: Optional[str] = None,
+        path: Optional[Union[Path, str]] = LAYOUT_PATH,
+        save: bool = False,
+        seed: int = 42,
+        iterations: int = 1000,
+        **kwargs,
+) -> Dict[Hashable, np.ndarray]:
+    """
+    Deterministic ForceAtlas2 positions of a graph in the `pos` format of networkx drawing functions.
+    Positions persisted at `path` (e.g. the layout of the full graph written by dataset_process) are used as the
+    starting point, so a subgraph or a slightly changed graph converges in a few iterations; results are also
+    cached per graph object for the other plots of the same run.
+    :param graph: NetworkX graph object
+    :param weight: edge attribute used as attraction weight (None for unweighted)
+    :param path: CSV file of persisted positions to warm-start from (None for a cold start)
+    :param save: write the computed positions back to `path`
+    :param seed: random seed of the initial positions of nodes without a persisted position
+    :param iterations: maximum number of iterations
+    :param kwargs: further ForceAtlas2 parameters (see `forceatlas2`)
+    :return: dictionary of node -> position
+    """
+    signature = (graph.number_of_nodes(), graph.number_of_edges(), weight, seed, str(path))
+    cached = _CACHE.get(graph)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    arrays = graph_arrays(graph, weight=weight)
+    initial = _initial_positions(graph, arrays.nodes, read_layout(path) if path is not None else {}, seed)
+    positions, n_iterations = forceatlas2(
+        arrays.adjacency, positions=initial, iterations=iterations, seed=seed, **kwargs
+    )
+    start = 'warm' if initial is not None else 'cold'
+    logger.info(f"ForceAtlas2 layout of {arrays.n} nodes: {n_iterations} iterations ({start} start)")
+
+    layout = dict(zip(arrays.nodes, positions))
+    _CACHE[graph] = (signature, layout)
+    if save and path is not None:
+        write_layout(layout, path)
+    return layout
+
+
+@profiled
+def plot_graph_layout(
+        graph: nx.Graph,
+        positions: Dict[Hashable, np.ndarray],
+        node_values: pd.Series,
+        title: str,
+        filename: Union[Path, str],
+        categorical: bool = True,
+        figsize: Tuple[int, int] = (14, 14),
+):
+    """
+    Draw a graph on precomputed positions with nodes colored and sized by their values, in the style of the
+    Gephi figures (nodes sized by degree, thin translucent edges).
+    :param graph: NetworkX graph object
+    :param positions: dictionary of node -> position (e.g. from `graph_layout`)
+    :param node_values: value of every node used for coloring, indexed by node (e.g. core number, community)
+    :param title: figure title
+    :param filename: destination of the figure
+    :param categorical: color by category (communities) instead of a continuous color scale
+    :param figsize: figure size
+    :return: None
+    """
+    import matplotlib.pyplot as plt
+
+    nodes = list(graph.nodes())
+    values = node_values.reindex(nodes)
+    key = figure_cache.data_hash(graph, {node: positions[node] for node in nodes}, values, title=title,
+                                 categorical=categorical, figsize=figsize)
+    if figure_cache.is_cached(filename, key):
+        return
+
+    degrees = np.array([degree for _, degree in graph.degree(nodes)])
+    colors = values.astype('category').cat.codes if categorical else values.fillna(values.min())
+    plt.figure(figsize=figsize)
+    nx.draw_networkx_edges(graph, positions, alpha=0.1, width=0.5)
+    nx.draw_networkx_nodes(
+        graph, positions, nodelist=nodes, node_color=colors, cmap=plt.cm.tab20 if categorical else plt.cm.viridis,
+        node_size=20 + 10 * degrees, edgecolors='white', linewidths=0.5,
+    )
+    plt.title(title)
+    plt.axis('off')
+    figure_cache.save_figure(filename, key, dpi=150, bbox_inches='tight')
+    plt.show()
+
+
+def plot_layout_figures(
+        graph: nx.Graph,
+        nodes_data: pd.DataFrame,
+        path: Union[Path, str] = LAYOUT_PATH,
+        figures_dir: Union[Path, str] = FIGURES_DIR,
+):
+    """
+    Render the layout figures of the report from the persisted co-occurrence-weighted positions: core numbers
+    and k-clique percolation communities.
+    :param graph: NetworkX graph object
+    :param nodes_data: processed nodes data with `id`, `core_number` and `k_clique_percolation` columns
+    :param path: CSV file of persisted positions
+    :param figures_dir: directory of the figures
+    :return: None
+    """
+    positions = graph_layout(graph, weight='total_co_occurance', path=path)
+    values = nodes_data.set_index('id')
+    for column, title, categorical in (
+            ('core_number', 'K-Core Numbers', False),
+            ('k_clique_percolation', 'K-Clique Percolation Communities', True),
+    ):
+        plot_graph_layout(
+            graph, positions, values[column], title=title, categorical=categorical,
+            filename=Path(figures_dir) / f'graph_layout_{column}.png',
+        )
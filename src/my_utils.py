@@ -1,14 +1,17 @@
-import yaml
 import numpy as np
 import pandas as pd
 import networkx as nx
-from scipy import stats
-import seaborn as sns
-import matplotlib.pyplot as plt
-from itertools import combinations
+from functools import (
+    lru_cache,
+    partial,
+)
+from concurrent.futures import ProcessPoolExecutor
 from typing import (
+    Any,
     Dict,
     List,
+    Literal,
+    Optional,
     Union,
 )
 from pathlib import Path
@@ -18,36 +21,30 @@ from src.config import (
     REPORTS_DIR,
     FIGURES_DIR,
 )
+from src import (
+    figure_cache,
+    results_store,
+)
+from src.triangles import triangle_statistics
+from src.graph_arrays import graph_arrays
+from src.path_metrics import (
+    distance_distribution,
+    estimated_distance_distribution,
+    path_statistics,
+)
+from src.profiling import profiled
 
 
 def update_yaml(new_data: dict[str, float], yaml_path: Union[Path, str] = REPORTS_DIR / 'results.yaml'):
     """
-    Update or create a YAML file with new data, converting numpy values to native Python types.
+    Record results in the results store (see `results_store`) next to the YAML file, from which the YAML file is
+    re-exported. Inside a `results_store.run` on that store the results are written in one batch when the stage
+    ends.
     :param new_data: dictionary containing keys and values to update/add in the YAML file
     :param yaml_path: path to the YAML file (defaults to 'results.yaml' in REPORTS_DIR)
     :return: None
     """
-    # Convert numpy values to native Python types
-    cleaned_data = {}
-    for key, value in new_data.items():
-        if isinstance(value, np.generic):  # if value is a numpy type
-            cleaned_data[key] = value.item()  # convert to native Python type
-        else:
-            cleaned_data[key] = value
-
-    # Read existing data if file exists
-    if Path(yaml_path).exists():
-        with open(yaml_path, 'r') as f:
-            existing_data = yaml.safe_load(f) or {}
-    else:
-        existing_data = {}
-
-    # Update existing data with new values
-    existing_data.update(cleaned_data)
-
-    # Write back to file
-    with open(yaml_path, 'w') as f:
-        yaml.dump(existing_data, f, sort_keys=False)
+    results_store.record(new_data, yaml_path=yaml_path)
 
 
 def save_table_to_markdown(df: pd.DataFrame, filename: Union[Path, str], table_title=None):
@@ -69,34 +66,58 @@ def save_table_to_markdown(df: pd.DataFrame, filename: Union[Path, str], table_t
     content = f"## {table_title}\n\n" if table_title else ""
     content += markdown_table + "\n\n"
 
+    # Skip rewriting the table if it was already written from the same data
+    key = figure_cache.data_hash(content)
+    if figure_cache.is_cached(filename, key):
+        return
+
     # Write to file
     with open(filename, 'w', encoding='utf-8') as f:
         f.write(content)
+    figure_cache.record(filename, key)
 
     # logger.info(f"Table successfully saved to {filename}")
 
 
+@profiled
 def get_graph_overview(
-        graph: nx.Graph, save_to_yaml: bool = True, print_plots: bool = True
+        graph: nx.Graph,
+        save_to_yaml: bool = True,
+        print_plots: bool = True,
+        weight: Optional[str] = 'total_co_occurance',
+        path_options: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Union[float, int, List]]:
     """
     This function calculates the overview graph metrics and prints them
     :param graph: NetworkX graph object to analyze
     :param save_to_yaml: Whether to save statistics to yaml file
     :param print_plots: True if plots should be printed
+    :param weight: edge attribute of the weighted (Onnela and Barrat) average clustering
+    :param path_options: keyword arguments of `path_metrics.path_statistics` (mode, n_samples, max_bfs, log2m);
+        exact path metrics by default
     :return: dictionary with statistics
     """
     largest_cc = max(nx.connected_components(graph), key=lambda cc: len(cc))
-    largest_cc_subgraph = graph.subgraph(largest_cc)
+    # triangles are counted once and shared with the clustering histogram
+    triangles = triangle_statistics(graph, weight=weight)
+    paths = path_statistics(graph, **(path_options or {}))
 
     results = {
         'connected_components_number': len(list(nx.connected_components(graph))),
-        'network_radius': nx.radius(largest_cc_subgraph), 'network_diameter': nx.diameter(largest_cc_subgraph),
-        'avg_clustering': np.round(nx.average_clustering(graph), 3),
-        'global_clustering': np.round(nx.transitivity(graph), 3),
-        'avg_shortest_path_length': np.round(nx.average_shortest_path_length(largest_cc_subgraph), 3),
-        'greatest_connected_component_size_ratio': np.round(len(largest_cc) / graph.number_of_nodes(), 3)
+        'network_radius': paths['radius'], 'network_diameter': paths['diameter'],
+        'avg_clustering': np.round(triangles.average_clustering, 3),
+        'global_clustering': np.round(triangles.transitivity, 3),
+        'avg_shortest_path_length': np.round(paths['avg_path_length'], 3),
+        'greatest_connected_component_size_ratio': np.round(len(largest_cc) / graph.number_of_nodes(), 3),
+        # approximation error of the path metrics (zero-width bounds and interval in exact mode)
+        'path_metrics_mode': paths['mode'],
+        'network_radius_bounds': paths['radius_bounds'],
+        'network_diameter_bounds': paths['diameter_bounds'],
+        'avg_shortest_path_length_ci': [float(np.round(value, 3)) for value in paths['avg_path_length_ci']],
     }
+    if weight is not None:
+        results['avg_clustering_onnela'] = np.round(triangles.onnela.mean(), 3)
+        results['avg_clustering_barrat'] = np.round(triangles.barrat.mean(), 3)
 
     if save_to_yaml:
         update_yaml(results)
@@ -108,24 +129,42 @@ def get_graph_overview(
     print(f"Avg. Shortest Path Length (largest CC): {results['avg_shortest_path_length']}")
 
     if print_plots:
-        plot_clustering_coefficient_histogram(graph)
-        plot_shortest_paths_distribution(graph)
+        plot_clustering_coefficient_histogram(graph, weight=weight)
+        # the histogram covers every connected pair of the graph, the path metrics only the largest component
+        if len(largest_cc) == graph.number_of_nodes():
+            distribution = paths['distance_distribution']
+        elif paths['mode'] == 'exact':
+            distribution = None
+        else:
+            options = path_options or {}
+            distribution = estimated_distance_distribution(
+                graph_arrays(graph).adjacency, log2m=options.get('log2m', 7), seed=options.get('seed', 42)
+            )
+        plot_shortest_paths_distribution(graph, distribution=distribution)
 
     return results
 
 
+@profiled
 def plot_clustering_coefficient_histogram(
-        graph: nx.Graph, filename: Union[Path, str] = FIGURES_DIR / 'clustering_histogram.png'
+        graph: nx.Graph,
+        filename: Union[Path, str] = FIGURES_DIR / 'clustering_histogram.png',
+        weight: Optional[str] = None,
 ):
     """
     Create and save a histogram visualization of local clustering coefficients for nodes in the graph.
     :param graph: NetworkX graph object to analyze
     :param filename: Path where the generated histogram figure should be saved
+    :param weight: weight of the cached triangle statistics to reuse (the histogram itself is unweighted)
     :return: None, saves figure to specified path and displays plot
     """
+    import matplotlib.pyplot as plt
+
+    cc_values = triangle_statistics(graph, weight=weight).clustering.tolist()
 
-    local_cc_dict = nx.clustering(graph)
-    cc_values = list(local_cc_dict.values())
+    key = figure_cache.data_hash(cc_values, bins=20)
+    if figure_cache.is_cached(filename, key):
+        return
 
     plt.figure(figsize=(10, 6))
     plt.hist(cc_values, bins=20, edgecolor='black')
@@ -134,10 +173,11 @@ def plot_clustering_coefficient_histogram(
     plt.title('Histogram of Local Clustering Coefficients')
     plt.grid(True, alpha=0.3)
 
-    plt.savefig(filename, dpi=300, bbox_inches='tight')
+    figure_cache.save_figure(filename, key, dpi=300, bbox_inches='tight')
     plt.show()
 
 
+@profiled
 def centralities(graph: nx.Graph) -> pd.DataFrame:
     """
     Calculate degree, closeness, betweenness, and eigenvector centralities of the graph.
@@ -171,6 +211,7 @@ def empirical_cdf(graph: nx.Graph) -> np.array:
     return np.array(degrees_distribution)
 
 
+@profiled
 def plot_power_degree_histogram(
         graph: nx.Graph,
         filename: Union[Path, str] = FIGURES_DIR / 'power_degree_histogram.png'
@@ -181,16 +222,25 @@ def plot_power_degree_histogram(
     :param filename: path where the plot will be saved
     :return: None
     """
-    sns.histplot(nx.degree_histogram(graph))
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    degree_histogram = nx.degree_histogram(graph)
+    key = figure_cache.data_hash(degree_histogram, xlim=40)
+    if figure_cache.is_cached(filename, key):
+        return
+
+    sns.histplot(degree_histogram)
     plt.xlabel('degree')
     plt.ylabel('probability')
     plt.title('Power Degree Histogram (limited by 40)')
     plt.xlim(left=0, right=40)
 
-    plt.savefig(filename, dpi=300, bbox_inches='tight')
+    figure_cache.save_figure(filename, key, dpi=300, bbox_inches='tight')
     plt.show()
 
 
+@profiled
 def plot_power_degree_distribution(
         graph: nx.Graph, filename: Union[Path, str] = FIGURES_DIR / 'power_degree_ecdf.png'
 ):
@@ -200,49 +250,57 @@ def plot_power_degree_distribution(
     :param filename: Path or string specifying where to save the plot (default: 'figures/power_degree_ecdf.png')
     :return: None
     """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     ecdf = empirical_cdf(graph)
+    key = figure_cache.data_hash(ecdf)
+    if figure_cache.is_cached(filename, key):
+        return
+
     sns.lineplot(ecdf)
     plt.xlabel('degree')
     plt.ylabel('probability')
     plt.title('Power Degree Empirical CDF')
 
-    plt.savefig(filename, dpi=300, bbox_inches='tight')
+    figure_cache.save_figure(filename, key, dpi=300, bbox_inches='tight')
     plt.show()
 
 
+@profiled
 def plot_shortest_paths_distribution(
-        graph, filename: Union[Path, str] = FIGURES_DIR / 'shortest_paths_histogram.png'
+        graph,
+        filename: Union[Path, str] = FIGURES_DIR / 'shortest_paths_histogram.png',
+        distribution: Optional[pd.Series] = None,
 ):
     """
     Plot and save the distribution of shortest paths in the graph.
     :param graph: NetworkX graph object containing the network to analyze
     :param filename: Path or string specifying where to save the plot (default: 'figures/shortest_paths_histogram.png')
+    :param distribution: number of connected node pairs of the whole graph per path length, e.g. estimated by
+        `path_metrics.estimated_distance_distribution` (default: exact counts, from one BFS per node)
     :return: None
     """
-    shortest_paths_lengths = []
-    node_pairs = list(combinations(graph.nodes(), 2))
-
-    # Calculate shortest paths for all pairs
-    for source, target in node_pairs:
-        try:
-            # Get the shortest path as a list of nodes
-            path = nx.shortest_path(graph, source, target, weight='weight')
-            # Calculate the path length (number of edges)
-            path_length = len(path) - 1
-            shortest_paths_lengths.append(path_length)
-        except nx.NetworkXNoPath:
-            continue
+    import matplotlib.pyplot as plt
+
+    if distribution is None:
+        distribution = distance_distribution(graph_arrays(graph).adjacency)
+    lengths, counts = distribution.index.to_numpy(), distribution.to_numpy(dtype=np.float64)
+
+    key = figure_cache.data_hash(lengths, counts)
+    if figure_cache.is_cached(filename, key):
+        return
 
     plt.figure(figsize=(10, 6))
-    plt.hist(shortest_paths_lengths, bins='auto', edgecolor='black')
+    plt.bar(lengths, counts, width=1.0, edgecolor='black')
     plt.title('Distribution of Shortest Paths Lengths\n(Number of edges in path)', fontsize=14)
     plt.xlabel('Path Length (edges)', fontsize=12)
     plt.ylabel('Frequency', fontsize=12)
     plt.grid(True, alpha=0.3)
 
     # Add some statistics as text
-    mean_path = np.mean(shortest_paths_lengths)
-    median_path = np.median(shortest_paths_lengths)
+    mean_path = np.average(lengths, weights=counts)
+    median_path = lengths[np.searchsorted(np.cumsum(counts), counts.sum() / 2)]
     stats_text = f'Mean: {mean_path:.2f}\nMedian: {median_path:.2f}'
     plt.text(0.95, 0.95, stats_text,
              transform=plt.gca().transAxes,
@@ -251,10 +309,177 @@ def plot_shortest_paths_distribution(
              bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
 
     plt.tight_layout()
-    plt.savefig(filename, dpi=300, bbox_inches='tight')
+    figure_cache.save_figure(filename, key, dpi=300, bbox_inches='tight')
     plt.show()
 
 
+def _fit_power_law_sorted(degrees: np.ndarray, max_block_size: int = 2_000_000) -> Dict[str, float]:
+    """
+    Fit a continuous power law to the tail of an ascending sorted degree array for every integer x_min candidate
+    at once: MLE alphas come from suffix sums of log-degrees and KS distances from one masked (candidates x n)
+    block per chunk of candidates, so the array is never re-filtered.
+    :param degrees: ascending sorted degree array
+    :param max_block_size: maximum number of cells of a (candidates x n) block evaluated at once
+    :return: dictionary with `alpha`, `x_min`, `ks_statistic` and `n_tail` of the candidate with the smallest KS distance
+    """
+    n = len(degrees)
+    fit = {'alpha': float('-inf'), 'x_min': float('-inf'), 'ks_statistic': float('inf'), 'n_tail': 0}
+    if n == 0:
+        return fit
+
+    # x_min = 0 never yields a finite alpha, so only positive candidates are evaluated
+    candidates = np.arange(max(int(degrees[0]), 1), int(degrees[-1]))
+    if len(candidates) == 0:
+        return fit
+
+    starts = np.searchsorted(degrees, candidates, side='left')
+    n_tail = n - starts
+    log_degrees = np.log(np.where(degrees > 0, degrees, 1))
+    suffix_log_sums = np.append(np.cumsum(log_degrees[::-1])[::-1], 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        alphas = 1 + n_tail / (suffix_log_sums[starts] - n_tail * np.log(candidates))
+
+    ks_values = np.empty(len(candidates))
+    positions = np.arange(n)
+    chunk = max(1, max_block_size // n)
+    for lo in range(0, len(candidates), chunk):
+        hi = min(lo + chunk, len(candidates))
+        x_min = candidates[lo:hi, None]
+        alpha = alphas[lo:hi, None]
+        tail_size = n_tail[lo:hi, None]
+        rank = positions[None, :] - starts[lo:hi, None]  # position within the tail, negative outside it
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            cdf = 1 - (x_min / degrees[None, :]) ** (alpha - 1)
+            d_plus = np.where(rank >= 0, (rank + 1) / tail_size - cdf, -np.inf)
+            d_minus = np.where(rank >= 0, cdf - rank / tail_size, -np.inf)
+        ks_values[lo:hi] = np.maximum(d_plus.max(axis=1), d_minus.max(axis=1))
+
+    ks_values[~np.isfinite(alphas)] = np.nan
+    if np.all(np.isnan(ks_values)):
+        return fit
+    best = int(np.nanargmin(ks_values))
+    return {
+        'alpha': float(alphas[best]),
+        'x_min': int(candidates[best]),
+        'ks_statistic': float(ks_values[best]),
+        'n_tail': int(n_tail[best]),
+    }
+
+
+@lru_cache(maxsize=64)
+def _fit_power_law_cached(sorted_degrees: bytes) -> Dict[str, float]:
+    return _fit_power_law_sorted(np.frombuffer(sorted_degrees, dtype=np.float64))
+
+
+def fit_power_law(degree_sequence) -> Dict[str, float]:
+    """
+    Estimate power law parameters (alpha, x_min) of a degree sequence by maximum likelihood, choosing x_min
+    by the smallest Kolmogorov-Smirnov distance. Results are cached by degree sequence, so every caller
+    analysing the same graph shares one fit.
+    :param degree_sequence: node degrees
+    :return: dictionary with `alpha`, `x_min`, `ks_statistic` and `n_tail` (number of degrees >= x_min)
+    """
+    degrees = np.sort(np.asarray(degree_sequence, dtype=np.float64))
+    return dict(_fit_power_law_cached(degrees.tobytes()))
+
+
+def _bootstrap_ks_statistic(
+        seed: int, alpha: float, x_min: float, n: int, n_tail: int, below_x_min: np.ndarray
+) -> float:
+    """KS distance of the power law refitted to one synthetic dataset drawn from the fitted model"""
+    rng = np.random.default_rng(seed)
+    synthetic_tail_size = rng.binomial(n, n_tail / n) if len(below_x_min) else n
+    tail = x_min * (1 - rng.random(synthetic_tail_size)) ** (-1 / (alpha - 1))
+    body = rng.choice(below_x_min, n - synthetic_tail_size) if len(below_x_min) else np.empty(0)
+    return _fit_power_law_sorted(np.sort(np.concatenate([body, tail])))['ks_statistic']
+
+
+@profiled
+def power_law_goodness_of_fit(
+        degree_sequence, n_bootstrap: int = 200, n_jobs: Optional[int] = None, seed: int = 42
+) -> float:
+    """
+    Semi-parametric bootstrap p-value of the power law fit (Clauset, Shalizi & Newman, 2009): synthetic datasets
+    follow the fitted power law above x_min and are resampled from the data below it; p is the share of
+    synthetic fits with a KS distance at least as large as the observed one.
+    :param degree_sequence: node degrees
+    :param n_bootstrap: number of synthetic datasets
+    :param n_jobs: number of worker processes (default: number of CPUs; 1 runs in-process)
+    :param seed: random seed for reproducibility
+    :return: goodness-of-fit p-value (power law is plausible for p > 0.1)
+    """
+    degrees = np.sort(np.asarray(degree_sequence, dtype=np.float64))
+    fit = fit_power_law(degrees)
+    worker = partial(
+        _bootstrap_ks_statistic,
+        alpha=fit['alpha'],
+        x_min=fit['x_min'],
+        n=len(degrees),
+        n_tail=fit['n_tail'],
+        below_x_min=degrees[degrees < fit['x_min']],
+    )
+    seeds = range(seed, seed + n_bootstrap)
+    if n_jobs == 1:
+        ks_values = np.fromiter(map(worker, seeds), dtype=float)
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            ks_values = np.fromiter(
+                executor.map(worker, seeds, chunksize=max(1, n_bootstrap // (4 * (n_jobs or 4)))), dtype=float
+            )
+    return float(np.mean(ks_values >= fit['ks_statistic']))
+
+
+def power_law_likelihood_ratio(
+        degree_sequence, alternative: Literal['lognormal', 'exponential'] = 'lognormal'
+) -> Dict[str, float]:
+    """
+    Vuong's likelihood ratio test of the fitted power law against an alternative distribution, both truncated
+    at the fitted x_min.
+    :param degree_sequence: node degrees
+    :param alternative: alternative distribution ('lognormal' or 'exponential')
+    :return: dictionary with the log-likelihood ratio `R` (positive favours the power law) and its `p_value`
+        (both NaN if every tail degree equals x_min or no power law could be fitted)
+    """
+    from scipy import optimize, special, stats
+
+    assert alternative in ['lognormal', 'exponential'], "provided alternative isn't implemented"
+    fit = fit_power_law(degree_sequence)
+    alpha, x_min = fit['alpha'], fit['x_min']
+    tail = np.asarray(degree_sequence, dtype=np.float64)
+    tail = tail[tail >= x_min]
+    if not np.isfinite(x_min) or np.all(tail == x_min):
+        # no spread above x_min (or no fit): the exponential rate is undefined, no distribution can be told apart
+        logger.warning(f"The degree tail (x_min={x_min}) has no spread; the likelihood ratio test is undefined")
+        return {'R': np.nan, 'p_value': np.nan}
+
+    log_likelihood_pl = np.log((alpha - 1) / x_min) - alpha * np.log(tail / x_min)
+    if alternative == 'exponential':
+        rate = 1 / (tail.mean() - x_min)
+        log_likelihood_alt = np.log(rate) - rate * (tail - x_min)
+    else:
+        def lognormal_log_likelihood(params):
+            mu, sigma = params[0], abs(params[1])
+            z = (np.log(tail) - mu) / sigma
+            return (
+                -np.log(tail * sigma * np.sqrt(2 * np.pi)) - z ** 2 / 2
+                - stats.norm.logsf((np.log(x_min) - mu) / sigma)
+            )
+
+        log_tail = np.log(tail)
+        result = optimize.minimize(
+            lambda params: -lognormal_log_likelihood(params).sum(),
+            x0=[log_tail.mean(), max(log_tail.std(), 0.1)],
+            method='Nelder-Mead',
+        )
+        log_likelihood_alt = lognormal_log_likelihood(result.x)
+
+    differences = log_likelihood_pl - log_likelihood_alt
+    ratio = differences.sum()
+    sigma = differences.std()
+    p_value = special.erfc(abs(ratio) / (np.sqrt(2 * len(tail)) * sigma)) if sigma > 0 else np.nan
+    return {'R': float(ratio), 'p_value': float(p_value)}
+
+
 class PowerLawAnalysis:
     """
     Analyzes and visualizes the power law characteristics of a graph's degree distribution.
@@ -266,6 +491,8 @@ class PowerLawAnalysis:
         power_law_cdf(x, alpha, x_min): Calculates the cumulative distribution function for power law
         power_law_pdf(x, alpha, x_min): Calculates the probability density function for power law
         mle_power_law_params(): Estimates power law parameters using maximum likelihood estimation
+        fit(): Returns the shared power law fit (alpha, x_min, KS statistic, tail size)
+        summary(n_bootstrap): Fit parameters with bootstrap p-value and likelihood ratio tests
         plot_distribution(title): Plots the degree distribution with fitted power law curve
 
     Attributes:
@@ -287,20 +514,45 @@ class PowerLawAnalysis:
     def power_law_pdf(x, alpha, x_min):
         return (alpha - 1) / x_min * (x / x_min) ** -alpha
 
-    def mle_power_law_params(self):
-        alpha_best, x_min_best, ks_value_best = float("-inf"), float("-inf"), float("inf")
-
-        for x_min in range(int(self.degree_sequence.min()), int(self.degree_sequence.max())):
-            filtered_sequence = self.degree_sequence[self.degree_sequence >= x_min]
-            alpha = 1 + len(filtered_sequence) * (np.sum(np.log(filtered_sequence / x_min))) ** -1
-            ks_value = stats.kstest(filtered_sequence, self.power_law_cdf, args=(alpha, x_min)).statistic
+    def fit(self) -> Dict[str, float]:
+        return fit_power_law(self.degree_sequence)
 
-            if ks_value < ks_value_best:
-                alpha_best, x_min_best, ks_value_best = alpha, x_min, ks_value
+    def mle_power_law_params(self):
+        fit = self.fit()
+        return (fit['alpha'], fit['x_min'])
+
+    def summary(self, n_bootstrap: int = 200, n_jobs: Optional[int] = None) -> Dict[str, float]:
+        """
+        Power law fit together with its bootstrap goodness-of-fit p-value and likelihood ratio tests
+        against lognormal and exponential alternatives.
+        :param n_bootstrap: number of synthetic datasets for the goodness-of-fit test
+        :param n_jobs: number of worker processes for the bootstrap
+        :return: dictionary ready to be saved to the results yaml file
+        """
+        fit = self.fit()
+        vs_lognormal = power_law_likelihood_ratio(self.degree_sequence, 'lognormal')
+        vs_exponential = power_law_likelihood_ratio(self.degree_sequence, 'exponential')
+        return {
+            'power_law_alpha': round(fit['alpha'], 3),
+            'power_law_x_min': fit['x_min'],
+            'power_law_ks_statistic': round(fit['ks_statistic'], 3),
+            'power_law_p_value': round(
+                power_law_goodness_of_fit(self.degree_sequence, n_bootstrap=n_bootstrap, n_jobs=n_jobs), 3
+            ),
+            'power_law_vs_lognormal_R': round(vs_lognormal['R'], 3),
+            'power_law_vs_lognormal_p_value': round(vs_lognormal['p_value'], 3),
+            'power_law_vs_exponential_R': round(vs_exponential['R'], 3),
+            'power_law_vs_exponential_p_value': round(vs_exponential['p_value'], 3),
+        }
+
+    @profiled
+    def plot_distribution(self, title: str):
+        import matplotlib.pyplot as plt
 
-        return (alpha_best, x_min_best)
+        key = figure_cache.data_hash(self.degree_sequence, title=title, bins=1000)
+        if figure_cache.is_cached(self.filename, key):
+            return
 
-    def plot_distribution(self, title: str):
         hist, bin_edges = np.histogram(self.degree_sequence, bins=1000, density=True)
         bin_centers = (bin_edges[1:] + bin_edges[:-1]) / 2
 
@@ -322,5 +574,5 @@ class PowerLawAnalysis:
         plt.ylim(0.001, 0.5)
         plt.legend()
         plt.grid(True)
-        plt.savefig(self.filename, dpi=300, bbox_inches='tight')
+        figure_cache.save_figure(self.filename, key, dpi=300, bbox_inches='tight')
         plt.show()
@@ -0,0 +1,199 @@
+from collections.abc import MutableMapping
+from typing import (
+    Any,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+)
+
+import numpy as np
+import pandas as pd
+import networkx as nx
+
+# Key of the attached NodeAttributeTable in `graph.graph`
+TABLE_KEY = 'node_attributes'
+
+
+class NodeAttributeTable:
+    """
+    Columnar node attribute table aligned with the node order of a graph.
+
+    The attribute frame is re-indexed once by the graph's nodes (O(rows) for any number of columns) by taking
+    its rows, so the column dtypes are kept (no int -> float upcast); nodes of the graph without a row in the
+    source frame have no attributes at all, as with `nx.set_node_attributes`.
+
+    Attributes:
+        frame (pd.DataFrame): Attribute columns indexed by node, in graph order (the rows of nodes that are not
+            `present` are placeholders)
+        present (np.ndarray): Whether each node had a row in the source frame
+        row_of (dict): Mapping of node labels to row positions
+        dirty (set): Columns overwritten through a node's attribute view, whose table column is stale
+    """
+
+    def __init__(self, graph: nx.Graph, frame: pd.DataFrame, id_column: str = 'id'):
+        """
+        Align an attribute frame with the nodes of a graph.
+        :param graph: NetworkX graph object
+        :param frame: node attributes, one row per node
+        :param id_column: column holding the node labels
+        """
+        nodes = list(graph.nodes())
+        source = frame.drop_duplicates(id_column, keep='last').set_index(id_column)
+        positions = source.index.get_indexer(nodes)
+        self.present = positions >= 0
+        if len(source):
+            self.frame = source.iloc[np.where(self.present, positions, 0)].set_axis(pd.Index(nodes), axis=0)
+        else:
+            self.frame = source.reindex(nodes)
+        self.row_of: Dict[Hashable, int] = {node: i for i, node in enumerate(nodes)}
+        self.dirty: Set[str] = set()
+        self._columns = {column: self.frame[column].to_numpy() for column in self.frame.columns}
+
+    @property
+    def columns(self) -> List[str]:
+        """Attribute names"""
+        return list(self._columns)
+
+    def value(self, node: Hashable, column: str) -> Any:
+        """
+        Attribute value of a single node.
+        :param node: node label
+        :param column: attribute name
+        :return: attribute value
+        :raises KeyError: If the node has no row or the attribute does not exist
+        """
+        row = self.row_of[node]
+        if not self.present[row] or column not in self._columns:
+            raise KeyError(column)
+        value = self._columns[column][row]
+        return value.item() if isinstance(value, np.generic) else value
+
+    def column(self, column: str, nodes: Optional[List[Hashable]] = None) -> pd.Series:
+        """
+        Attribute column as a Series indexed by node.
+        :param column: attribute name
+        :param nodes: nodes to return the values of, e.g. the nodes of a subgraph (default: all nodes)
+        :return: attribute values (NaN for nodes without the attribute)
+        """
+        values = self.frame[column].astype(object).where(self.present, np.nan)
+        return values if nodes is None else values.reindex(nodes)
+
+
+class LazyNodeAttributes(MutableMapping):
+    """
+    Attribute dict of a single node that reads from a `NodeAttributeTable` on demand.
+
+    Values are looked up in the table only when accessed; writes and deletions go to a per-node overlay (deleted
+    table attributes are masked), so the table itself is never modified.
+    """
+
+    __slots__ = ('_table', '_row', '_node', '_overlay', '_deleted')
+
+    def __init__(self, table: NodeAttributeTable, node: Hashable, data: Optional[dict] = None):
+        self._table = table
+        self._node = node
+        self._row = table.row_of[node]
+        self._overlay = dict(data or {})
+        self._deleted: Set[str] = set()
+
+    def _table_keys(self) -> List[str]:
+        if not self._table.present[self._row]:
+            return []
+        return [column for column in self._table.columns if column not in self._deleted]
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._overlay:
+            return self._overlay[key]
+        if key in self._deleted:
+            raise KeyError(key)
+        return self._table.value(self._node, key)
+
+    def __setitem__(self, key: str, value: Any):
+        self._overlay[key] = value
+        self._table.dirty.add(key)
+
+    def __delitem__(self, key: str):
+        if key in self._overlay:
+            del self._overlay[key]
+        elif key in self._table_keys():
+            self._deleted.add(key)
+            self._table.dirty.add(key)
+        else:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from (key for key in self._table_keys() if key not in self._overlay)
+        yield from self._overlay
+
+    def __len__(self) -> int:
+        return len(set(self._table_keys()) | set(self._overlay))
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+    def copy(self) -> dict:
+        """Materialized copy, as `dict.copy` (used by `Graph.copy` and subgraph conversions)"""
+        return dict(self)
+
+    def __getstate__(self):
+        return self._table, self._node, self._overlay, self._deleted
+
+    def __setstate__(self, state):
+        self._table, self._node, self._overlay, self._deleted = state
+        self._row = self._table.row_of[self._node]
+
+
+def attach(graph: nx.Graph, frame: pd.DataFrame, id_column: str = 'id') -> NodeAttributeTable:
+    """
+    Attach node attributes to a graph as a columnar table (stored in `graph.graph`) and replace every node's
+    attribute dict by a lazy view on it, so networkx code still sees `graph.nodes[node][attribute]` while
+    columnar readers (see `attribute_values`) never touch the per-node dicts.
+    This writes the attribute dicts straight into `graph._node`, a networkx internal (any MutableMapping is
+    accepted there as of networkx 3.x); copies made with `graph.copy()` get plain dicts again and no longer use
+    the table.
+    :param graph: NetworkX graph object
+    :param frame: node attributes, one row per node
+    :param id_column: column holding the node labels
+    :return: the attached table
+    """
+    table = NodeAttributeTable(graph, frame, id_column=id_column)
+    graph.graph[TABLE_KEY] = table
+    # networkx keeps the node attribute dicts in `_node`; any MutableMapping works in their place
+    for node, data in graph._node.items():
+        graph._node[node] = LazyNodeAttributes(table, node, data)
+    return table
+
+
+def _uses_table(graph: nx.Graph, table: NodeAttributeTable, nodes: List[Hashable]) -> bool:
+    """
+    Whether the attribute dicts of the nodes are still views on the table. `graph.copy()` shallow-copies
+    `graph.graph`, so a copy carries the table while its nodes have plain (possibly edited) dicts.
+    """
+    return all(
+        isinstance(data, LazyNodeAttributes) and data._table is table for data in map(graph.nodes.__getitem__, nodes)
+    )
+
+
+def attribute_values(graph: nx.Graph, attribute: str, nodes: Optional[List[Hashable]] = None) -> pd.Series:
+    """
+    Values of a node attribute in the given node order, read column-wise from the attached table when there is
+    one (also for subgraph views, which share `graph.graph`) and its node dicts are views on it, and from the
+    node dicts otherwise.
+    :param graph: NetworkX graph object
+    :param attribute: attribute name
+    :param nodes: node order (default: `graph.nodes()`)
+    :return: object Series of the values (NaN where a node has no such attribute)
+    """
+    nodes = list(graph.nodes()) if nodes is None else nodes
+    table = graph.graph.get(TABLE_KEY)
+    if (
+            isinstance(table, NodeAttributeTable)
+            and attribute in table.columns
+            and attribute not in table.dirty
+            and _uses_table(graph, table, nodes)
+    ):
+        return table.column(attribute, nodes).reset_index(drop=True)
+    return pd.Series([graph.nodes[node].get(attribute, np.nan) for node in nodes], dtype=object)
@@ -0,0 +1,97 @@
+from typing import (
+    Optional,
+    Tuple,
+)
+
+import numpy as np
+import networkx as nx
+
+from src.graph_arrays import graph_arrays
+
+
+def double_edge_swap(
+        src: np.ndarray,
+        dst: np.ndarray,
+        n_nodes: int,
+        n_swaps: int,
+        max_tries: Optional[int] = None,
+        seed: Optional[int] = None,
+        batch_size: int = 4096,
+) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Degree-preserving randomization of a simple undirected graph by double edge swaps over edge index arrays.
+
+    A swap picks two edges (a, b) and (c, d) and rewires them into (a, d) and (c, b) (or (a, c) and (b, d)),
+    rejecting swaps that would create self-loops or multi-edges. Candidate swaps are drawn in vectorized
+    batches and duplicates are checked against a hash set of encoded edges, so no graph object is touched.
+
+    :param src: source node index of every edge
+    :param dst: target node index of every edge
+    :param n_nodes: number of nodes (used to encode edges as integers)
+    :param n_swaps: number of successful swaps to perform
+    :param max_tries: maximum number of attempted swaps (default: 100 * n_swaps)
+    :param seed: random seed for reproducibility
+    :param batch_size: number of candidate swaps drawn at once
+    :return: tuple (new src, new dst, number of successful swaps)
+    """
+    m = len(src)
+    if m < 2 or n_swaps <= 0:
+        return src.copy(), dst.copy(), 0
+    max_tries = 100 * n_swaps if max_tries is None else max_tries
+
+    rng = np.random.default_rng(seed)
+    # plain lists are much faster than numpy arrays for scalar reads/writes in the swap loop
+    us, vs = src.tolist(), dst.tolist()
+    edges = {min(u, v) * n_nodes + max(u, v) for u, v in zip(us, vs)}
+
+    swaps, tries = 0, 0
+    while swaps < n_swaps and tries < max_tries:
+        size = min(batch_size, max_tries - tries)
+        first = rng.integers(m, size=size).tolist()
+        second = rng.integers(m, size=size).tolist()
+        flips = (rng.random(size) < 0.5).tolist()
+
+        for e1, e2, flip in zip(first, second, flips):
+            tries += 1
+            if e1 == e2:
+                continue
+            a, b = us[e1], vs[e1]
+            c, d = (vs[e2], us[e2]) if flip else (us[e2], vs[e2])
+            # new edges are (a, d) and (c, b)
+            if a == d or c == b:
+                continue
+            new1 = min(a, d) * n_nodes + max(a, d)
+            new2 = min(c, b) * n_nodes + max(c, b)
+            if new1 == new2 or new1 in edges or new2 in edges:
+                continue
+
+            edges.discard(min(a, b) * n_nodes + max(a, b))
+            edges.discard(min(c, d) * n_nodes + max(c, d))
+            edges.add(new1)
+            edges.add(new2)
+            us[e1], vs[e1] = a, d
+            us[e2], vs[e2] = c, b
+
+            swaps += 1
+            if swaps == n_swaps:
+                break
+
+    return np.array(us, dtype=src.dtype), np.array(vs, dtype=dst.dtype), swaps
+
+
+def degree_preserving_graph(graph: nx.Graph, swaps_per_edge: float = 10, seed: Optional[int] = None) -> nx.Graph:
+    """
+    Returns a degree-preserving randomization of the graph (same nodes and degree sequence, random wiring).
+    :param graph: NetworkX simple graph
+    :param swaps_per_edge: number of successful swaps per edge
+    :param seed: random seed for reproducibility
+    :return: randomized NetworkX graph with the original node labels
+    """
+    arrays = graph_arrays(graph)
+    src, dst, _ = double_edge_swap(
+        arrays.src, arrays.dst, arrays.n, n_swaps=int(swaps_per_edge * arrays.m), seed=seed
+    )
+    G = nx.Graph()
+    G.add_nodes_from(arrays.nodes)
+    G.add_edges_from(zip((arrays.nodes[i] for i in src), (arrays.nodes[i] for i in dst)))
+    return G
@@ -0,0 +1,241 @@
+from typing import (
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Sequence,
+)
+
+import numpy as np
+import pandas as pd
+import networkx as nx
+from networkx.algorithms.community.quality import NotAPartition
+
+from src.graph_arrays import graph_arrays
+
+
+def labels_from_communities(
+        graph: nx.Graph, communities: Sequence[set], node_index: Optional[Dict[Hashable, int]] = None
+) -> np.ndarray:
+    """
+    Convert a list of node sets into a label array.
+    :param graph: NetworkX graph the communities belong to
+    :param communities: list of node sets
+    :param node_index: mapping of node labels to integer indices (default: `graph_arrays(graph).node_index`)
+    :return: community label of every node
+    :raises NotAPartition: If the communities overlap or do not cover every node
+    """
+    node_index = graph_arrays(graph).node_index if node_index is None else node_index
+    labels = np.full(len(node_index), -1, dtype=np.int64)
+    assigned = 0
+    for label, community in enumerate(communities):
+        indices = [node_index[node] for node in community]
+        labels[indices] = label
+        assigned += len(indices)
+    if assigned != len(labels) or (labels < 0).any():
+        raise NotAPartition(graph, communities)
+    return labels
+
+
+def _community_sums(
+        labels: np.ndarray, src: np.ndarray, dst: np.ndarray, weights: Optional[np.ndarray], n_labels: int
+) -> Dict[str, np.ndarray]:
+    """
+    Per-community aggregates of a partition with bincount over the edge index arrays.
+    :param labels: community label of every node (0..n_labels-1)
+    :param src: source node index of every edge
+    :param dst: target node index of every edge
+    :param weights: edge weights (None for unweighted)
+    :param n_labels: number of communities
+    :return: dictionary of arrays indexed by community: size, internal/cut weight and edge counts, volume
+    """
+    weights = np.ones(len(src)) if weights is None else weights
+    src_labels, dst_labels = labels[src], labels[dst]
+    internal = src_labels == dst_labels
+    cut = ~internal
+    return {
+        'size': np.bincount(labels, minlength=n_labels),
+        'internal_weight': np.bincount(src_labels[internal], weights=weights[internal], minlength=n_labels),
+        'internal_edges': np.bincount(src_labels[internal & (src != dst)], minlength=n_labels),
+        # every cut edge leaves both of its communities
+        'cut_weight': np.bincount(
+            np.concatenate([src_labels[cut], dst_labels[cut]]),
+            weights=np.concatenate([weights[cut], weights[cut]]),
+            minlength=n_labels,
+        ),
+        'cut_edges': np.bincount(np.concatenate([src_labels[cut], dst_labels[cut]]), minlength=n_labels),
+        # self-loops count twice in the degree, as in networkx
+        'volume': np.bincount(
+            np.concatenate([src_labels, dst_labels]), weights=np.concatenate([weights, weights]), minlength=n_labels
+        ),
+    }
+
+
+def modularity(
+        labels: np.ndarray,
+        src: np.ndarray,
+        dst: np.ndarray,
+        weights: Optional[np.ndarray] = None,
+        resolution: float = 1.0,
+) -> float:
+    """
+    Modularity of a partition given as a label array (same value as `nx.community.modularity`).
+    :param labels: community label of every node
+    :param src: source node index of every edge
+    :param dst: target node index of every edge
+    :param weights: edge weights (None for unweighted)
+    :param resolution: resolution parameter (gamma); below 1 favours larger communities
+    :return: modularity value
+    """
+    sums = _community_sums(labels, src, dst, weights, labels.max() + 1)
+    m = sums['volume'].sum() / 2
+    if m == 0:
+        return 0.0
+    return float(sums['internal_weight'].sum() / m - resolution * np.sum((sums['volume'] / (2 * m)) ** 2))
+
+
+def partition_quality(labels: np.ndarray, src: np.ndarray, dst: np.ndarray) -> Dict[str, float]:
+    """
+    Coverage and performance of a partition (same values as `nx.community.partition_quality`).
+    :param labels: community label of every node
+    :param src: source node index of every edge
+    :param dst: target node index of every edge
+    :return: dictionary with `coverage` (share of intra-community edges) and `performance` (share of node pairs
+        that are intra-community edges or inter-community non-edges)
+    """
+    n = len(labels)
+    sizes = np.bincount(labels)
+    intra_edges = int(np.count_nonzero(labels[src] == labels[dst]))
+    inter_edges = len(src) - intra_edges
+    possible_inter_edges = (n ** 2 - np.sum(sizes.astype(np.int64) ** 2)) // 2
+    total_pairs = n * (n - 1) // 2
+    return {
+        'coverage': intra_edges / len(src) if len(src) else np.nan,
+        'performance': float(intra_edges + possible_inter_edges - inter_edges) / total_pairs if total_pairs else np.nan,
+    }
+
+
+def community_statistics(
+        labels: np.ndarray,
+        src: np.ndarray,
+        dst: np.ndarray,
+        weights: Optional[np.ndarray] = None,
+        resolution: float = 1.0,
+) -> pd.DataFrame:
+    """
+    Quality statistics of every community of a partition at once.
+    :param labels: community label of every node
+    :param src: source node index of every edge
+    :param dst: target node index of every edge
+    :param weights: edge weights (None for unweighted)
+    :param resolution: resolution parameter of the modularity contribution
+    :return: DataFrame indexed by community with size, internal/cut weight, volume, conductance,
+        intra-density (internal edges / possible pairs), inter-density (cut edges / possible external pairs)
+        and the community's contribution to modularity
+    """
+    n = len(labels)
+    sums = _community_sums(labels, src, dst, weights, labels.max() + 1)
+    two_m = sums['volume'].sum()
+    size = sums['size'].astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        conductance = sums['cut_weight'] / np.minimum(sums['volume'], two_m - sums['volume'])
+        intra_density = sums['internal_edges'] / (size * (size - 1) / 2)
+        inter_density = sums['cut_edges'] / (size * (n - size))
+    return pd.DataFrame({
+        'size': sums['size'],
+        'internal_weight': sums['internal_weight'],
+        'cut_weight': sums['cut_weight'],
+        'volume': sums['volume'],
+        'conductance': conductance,
+        'intra_density': intra_density,
+        'inter_density': inter_density,
+        'modularity': (
+            2 * sums['internal_weight'] / two_m - resolution * (sums['volume'] / two_m) ** 2 if two_m else np.nan
+        ),
+    }).rename_axis('community')
+
+
+def score_partitions(
+        partitions: np.ndarray,
+        src: np.ndarray,
+        dst: np.ndarray,
+        weights: Optional[np.ndarray] = None,
+        resolutions: Sequence[float] = (1.0,),
+) -> pd.DataFrame:
+    """
+    Score many candidate partitions of the same graph at once (e.g. a resolution or seed sweep): all partitions
+    are offset into one label space, so every aggregate is a single bincount.
+    :param partitions: label matrix with one partition per row (shape: n_partitions x n_nodes)
+    :param src: source node index of every edge
+    :param dst: target node index of every edge
+    :param weights: edge weights (None for unweighted)
+    :param resolutions: resolution parameters to compute the modularity at
+    :return: DataFrame with one row per partition: number of communities, coverage, performance, mean
+        conductance and one `modularity_<resolution>` column per resolution
+    """
+    partitions = np.atleast_2d(np.asarray(partitions, dtype=np.int64))
+    n_partitions, n = partitions.shape
+    weights = np.ones(len(src)) if weights is None else np.asarray(weights, dtype=np.float64)
+
+    # relabel every row to 0..k-1 and shift rows into disjoint label ranges
+    compact = np.array([np.unique(row, return_inverse=True)[1] for row in partitions]).reshape(n_partitions, n)
+    n_communities = compact.max(axis=1) + 1
+    offsets = np.concatenate([[0], np.cumsum(n_communities)[:-1]])
+    flat_labels = compact + offsets[:, None]
+    owner = np.repeat(np.arange(n_partitions), n_communities)
+    n_labels = n_communities.sum()
+
+    src_labels, dst_labels = flat_labels[:, src].ravel(), flat_labels[:, dst].ravel()
+    tiled_weights = np.tile(weights, n_partitions)
+    internal = src_labels == dst_labels
+    internal_weight = np.bincount(src_labels[internal], weights=tiled_weights[internal], minlength=n_labels)
+    volume = np.bincount(
+        np.concatenate([src_labels, dst_labels]), weights=np.concatenate([tiled_weights, tiled_weights]),
+        minlength=n_labels,
+    )
+    cut_weight = np.bincount(
+        np.concatenate([src_labels[~internal], dst_labels[~internal]]),
+        weights=np.concatenate([tiled_weights[~internal], tiled_weights[~internal]]),
+        minlength=n_labels,
+    )
+    sizes = np.bincount(flat_labels.ravel(), minlength=n_labels)
+    two_m = 2 * weights.sum()
+
+    intra_edges = internal.reshape(n_partitions, -1).sum(axis=1)
+    possible_inter_edges = (n ** 2 - np.bincount(owner, weights=sizes.astype(np.float64) ** 2)) / 2
+    total_pairs = n * (n - 1) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        conductance = cut_weight / np.minimum(volume, two_m - volume)
+    conductance = np.where(np.isfinite(conductance), conductance, np.nan)
+    conductance_sum = np.bincount(owner, weights=np.nan_to_num(conductance))
+    conductance_count = np.bincount(owner, weights=np.isfinite(conductance).astype(np.float64))
+
+    scores = pd.DataFrame({
+        'n_communities': n_communities,
+        'coverage': intra_edges / len(src) if len(src) else np.nan,
+        'performance': (intra_edges + possible_inter_edges - (len(src) - intra_edges)) / total_pairs,
+        'mean_conductance': conductance_sum / np.maximum(conductance_count, 1),
+    })
+    internal_share = np.bincount(owner, weights=internal_weight) / (two_m / 2)
+    for resolution in resolutions:
+        scores[f'modularity_{resolution:g}'] = (
+            internal_share - resolution * np.bincount(owner, weights=(volume / two_m) ** 2)
+        )
+    return scores.rename_axis('partition')
+
+
+def graph_modularity(
+        graph: nx.Graph, communities: List[set], weight: Optional[str] = 'weight', resolution: float = 1.0
+) -> float:
+    """
+    Modularity of a list of communities of a networkx graph, computed over the cached edge index arrays.
+    :param graph: NetworkX graph object
+    :param communities: list of node sets partitioning the graph
+    :param weight: edge attribute holding the weight (None for unweighted)
+    :param resolution: resolution parameter (gamma)
+    :return: modularity value (same as `nx.community.modularity`)
+    :raises NotAPartition: If the communities overlap or do not cover every node
+    """
+    arrays = graph_arrays(graph, weight=weight)
+    labels = labels_from_communities(graph, communities, node_index=arrays.node_index)
+    return modularity(labels, arrays.src, arrays.dst, arrays.weights, resolution=resolution)
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Literal,
+    Optional,
+)
+
+import numpy as np
+import pandas as pd
+import networkx as nx
+
+from src.graph_arrays import graph_arrays
+from src.profiling import profiled
+
+if TYPE_CHECKING:
+    from scipy import sparse
+
+# Sources per multi-source BFS call, bounds the (sources x n) distance block in memory
+BFS_BLOCK_SIZE = 256
+
+
+def _component_adjacency(graph: nx.Graph) -> sparse.csr_matrix:
+    """Unweighted CSR adjacency of the largest connected component (self-loops do not change distances)"""
+    largest_cc = max(nx.connected_components(graph), key=len)
+    return graph_arrays(graph.subgraph(largest_cc)).adjacency
+
+
+def bfs_distances(adjacency: sparse.csr_matrix, sources: np.ndarray) -> np.ndarray:
+    """
+    Hop distances from several sources at once (C-level BFS of `scipy.sparse.csgraph`).
+    :param adjacency: CSR adjacency
+    :param sources: source node indices
+    :return: distance matrix (len(sources) x n) of integers, -1 for unreachable nodes
+    """
+    from scipy.sparse import csgraph
+
+    distances = csgraph.shortest_path(adjacency, method='D', unweighted=True, directed=False, indices=sources)
+    distances = np.atleast_2d(distances)
+    return np.where(np.isinf(distances), -1, distances).astype(np.int64)
+
+
+@profiled
+def bounding_diameters(adjacency: sparse.csr_matrix, max_bfs: Optional[int] = None) -> Dict[str, int]:
+    """
+    Diameter and radius of a connected graph by eccentricity bounding (Takes & Kosters, 2011; the
+    double-sweep lower bound of iFUB is its first two steps). Every BFS from a node v with eccentricity e tightens
+    the bounds of every other node w to max(e - d(v, w), d(v, w)) <= ecc(w) <= e + d(v, w); nodes whose bounds
+    can no longer change the diameter or radius are dropped, and the next source alternates between the
+    largest upper bound and the smallest lower bound. On real networks a handful of BFS usually makes both
+    bounds meet; with `max_bfs` the search stops early and the bounds are returned as they are.
+    :param adjacency: CSR adjacency of a connected graph
+    :param max_bfs: maximum number of BFS (None until the bounds meet)
+    :return: dictionary with `diameter_lower`, `diameter_upper`, `radius_lower`, `radius_upper` and `n_bfs`
+    """
+    n = adjacency.shape[0]
+    lower = np.zeros(n, dtype=np.int64)
+    upper = np.full(n, np.iinfo(np.int64).max)
+    candidates = np.ones(n, dtype=bool)
+    diameter_lower, diameter_upper = 0, np.iinfo(np.int64).max
+    radius_lower, radius_upper = 0, np.iinfo(np.int64).max
+    # start from a hub, whose eccentricity is usually close to the radius
+    source = int(np.argmax(np.diff(adjacency.indptr))) if n else 0
+    n_bfs, pick_upper = 0, True
+
+    while n and candidates.any() and (diameter_lower < diameter_upper or radius_lower < radius_upper):
+        if max_bfs is not None and n_bfs >= max_bfs:
+            break
+        distances = bfs_distances(adjacency, np.array([source]))[0]
+        eccentricity = int(distances.max())
+        n_bfs += 1
+        lower = np.maximum(lower, np.maximum(distances, eccentricity - distances))
+        upper = np.minimum(upper, eccentricity + distances)
+        lower[source] = upper[source] = eccentricity
+        candidates[source] = False
+
+        diameter_lower, radius_upper = max(diameter_lower, eccentricity), min(radius_upper, eccentricity)
+        # a node can still matter only if it may exceed the diameter lower bound or undercut the radius upper bound
+        candidates &= (upper > diameter_lower) | (lower < radius_upper)
+        candidates &= lower != upper
+        if not candidates.any():
+            diameter_upper, radius_lower = diameter_lower, radius_upper
+            break
+        diameter_upper = max(diameter_lower, int(upper[candidates].max()))
+        radius_lower = min(radius_upper, int(lower[candidates].min()))
+
+        remaining = np.flatnonzero(candidates)
+        source = int(remaining[np.argmax(upper[remaining])] if pick_upper else remaining[np.argmin(lower[remaining])])
+        pick_upper = not pick_upper
+
+    return {
+        'diameter_lower': int(diameter_lower),
+        'diameter_upper': int(diameter_upper),
+        'radius_lower': int(radius_lower),
+        'radius_upper': int(radius_upper),
+        'n_bfs': n_bfs,
+    }
+
+
+@profiled
+def sampled_average_path_length(
+        adjacency: sparse.csr_matrix,
+        n_samples: Optional[int] = None,
+        seed: int = 42,
+        confidence: float = 0.95,
+) -> Dict[str, float]:
+    """
+    Average shortest path length of a connected graph from BFS of a uniform sample of sources. Every source
+    reaches the same n - 1 targets, so the all-pairs average is the mean over sources of their mean distance
+    and the sample mean is unbiased; its Student-t interval uses the finite population correction (zero width
+    when every node is a source).
+    :param adjacency: CSR adjacency of a connected graph
+    :param n_samples: number of sources (None or >= n: every node, the exact value)
+    :param seed: random seed of the source sample
+    :param confidence: confidence level of the interval
+    :return: dictionary with `avg_path_length`, `ci_low`, `ci_high` and `n_sources`
+    """
+    from scipy import stats
+
+    n = adjacency.shape[0]
+    if n < 2:
+        return {'avg_path_length': 0.0, 'ci_low': 0.0, 'ci_high': 0.0, 'n_sources': n}
+    if n_samples is None or n_samples >= n:
+        sources = np.arange(n)
+    else:
+        sources = np.sort(np.random.default_rng(seed).choice(n, size=n_samples, replace=False))
+
+    means = np.concatenate([
+        bfs_distances(adjacency, sources[start:start + BFS_BLOCK_SIZE]).sum(axis=1) / (n - 1)
+        for start in range(0, len(sources), BFS_BLOCK_SIZE)
+    ])
+    k = len(sources)
+    mean = float(means.mean())
+    if k == n or k < 2:
+        half_width = 0.0
+    else:
+        standard_error = means.std(ddof=1) / np.sqrt(k) * np.sqrt((n - k) / (n - 1))
+        half_width = float(stats.t.ppf((1 + confidence) / 2, k - 1) * standard_error)
+    return {'avg_path_length': mean, 'ci_low': mean - half_width, 'ci_high': mean + half_width, 'n_sources': k}
+
+
+def _hll_alpha(m: int) -> float:
+    """Bias correction constant of HyperLogLog with m registers"""
+    return {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+
+
+def _hll_estimate(registers: np.ndarray) -> np.ndarray:
+    """HyperLogLog cardinality estimate of every row of registers, with the small-range (linear counting) correction"""
+    m = registers.shape[1]
+    raw = _hll_alpha(m) * m ** 2 / np.exp2(-registers.astype(np.float64)).sum(axis=1)
+    zeros = (registers == 0).sum(axis=1)
+    with np.errstate(divide='ignore'):
+        linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+
+@profiled
+def hyperanf(
+        adjacency: sparse.csr_matrix, log2m: int = 7, max_distance: Optional[int] = None, seed: int = 42
+) -> pd.DataFrame:
+    """
+    Neighborhood function of a graph by HyperANF (Boldi, Rosa & Vigna, 2011): every node keeps a HyperLogLog
+    counter of the nodes within distance t, and the counters of step t + 1 are the register-wise maxima over the
+    node's neighbors (one `np.maximum.reduceat` over the CSR rows). N(t), the number of ordered pairs within
+    distance t, is the sum of the counter estimates; each step costs O(m 2^log2m), independent of the number of
+    sources.
+    :param adjacency: CSR adjacency
+    :param log2m: log2 of the registers per counter (relative error of one counter about 1.04 / 2^(log2m / 2))
+    :param max_distance: stop after this many steps (None: until no counter changes)
+    :param seed: seed of the node hash
+    :return: DataFrame indexed by distance t >= 1 with `pairs_within` N(t) and `pairs_at` N(t) - N(t - 1)
+        (ordered pairs, each unordered pair counted twice)
+    """
+    n, m = adjacency.shape[0], 2 ** log2m
+    # splitmix64-style hash of the node indices
+    hashes = (np.arange(n, dtype=np.uint64) + np.uint64(seed)) * np.uint64(0x9E3779B97F4A7C15)
+    hashes ^= hashes >> np.uint64(31)
+    hashes *= np.uint64(0xBF58476D1CE4E5B9)
+    hashes ^= hashes >> np.uint64(29)
+    buckets = (hashes & np.uint64(m - 1)).astype(np.int64)
+    rest = hashes >> np.uint64(log2m)
+    # rank = position of the lowest set bit of the remaining 64 - log2m bits, 1-based
+    lowest_bit = rest & (~rest + np.uint64(1))
+    ranks = np.where(rest > 0, np.log2(lowest_bit.astype(np.float64)).astype(np.int64) + 1, 64 - log2m + 1)
+
+    registers = np.zeros((n, m), dtype=np.uint8)
+    registers[np.arange(n), buckets] = ranks
+    rows = np.flatnonzero(np.diff(adjacency.indptr) > 0)
+
+    pairs = [float(_hll_estimate(registers).sum())]
+    t = 0
+    while max_distance is None or t < max_distance:
+        t += 1
+        updated = registers.copy()
+        if len(rows):
+            neighbor_max = np.maximum.reduceat(registers[adjacency.indices], adjacency.indptr[rows], axis=0)
+            updated[rows] = np.maximum(updated[rows], neighbor_max)
+        if np.array_equal(updated, registers):
+            break
+        registers = updated
+        pairs.append(float(_hll_estimate(registers).sum()))
+
+    within = np.maximum.accumulate(np.array(pairs))
+    return pd.DataFrame(
+        {'pairs_within': within[1:], 'pairs_at': np.diff(within)},
+        index=pd.RangeIndex(1, len(within), name='distance'),
+    )
+
+
+def distance_distribution(adjacency: sparse.csr_matrix) -> pd.Series:
+    """
+    Exact number of unordered connected node pairs at every distance, from BFS of every node in blocks.
+    :param adjacency: CSR adjacency
+    :return: Series indexed by distance >= 1
+    """
+    n = adjacency.shape[0]
+    counts = np.zeros(1, dtype=np.int64)
+    for start in range(0, n, BFS_BLOCK_SIZE):
+        block = bfs_distances(adjacency, np.arange(start, min(start + BFS_BLOCK_SIZE, n)))
+        block_counts = np.bincount(block[block > 0])
+        if len(block_counts) > len(counts):
+            counts = np.pad(counts, (0, len(block_counts) - len(counts)))
+        counts[:len(block_counts)] += block_counts
+    return pd.Series(counts[1:] // 2, index=pd.RangeIndex(1, len(counts), name='distance'), name='pairs')
+
+
+def estimated_distance_distribution(adjacency: sparse.csr_matrix, log2m: int = 7, seed: int = 42) -> pd.Series:
+    """
+    Estimated number of unordered connected node pairs at every distance, by HyperANF.
+    :param adjacency: CSR adjacency
+    :param log2m: log2 of the HyperLogLog registers per counter
+    :param seed: seed of the node hash
+    :return: Series indexed by distance >= 1
+    """
+    return (hyperanf(adjacency, log2m=log2m, seed=seed)['pairs_at'] / 2).rename('pairs')
+
+
+def options_from_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Keyword arguments of `path_statistics` from the `path_metrics_*` entries of params.yaml (defaults if absent).
+    :param params: parsed params.yaml
+    :return: dictionary with `mode`, `n_samples`, `max_bfs` and `log2m`
+    """
+    return {
+        'mode': params.get('path_metrics_mode', 'exact'),
+        'n_samples': params.get('path_metrics_samples', 1000),
+        'max_bfs': params.get('path_metrics_max_bfs', 100),
+        'log2m': params.get('path_metrics_hyperanf_log2m', 7),
+    }
+
+
+@profiled
+def path_statistics(
+        graph: nx.Graph,
+        mode: Literal['exact', 'approximate'] = 'exact',
+        n_samples: int = 1000,
+        max_bfs: int = 100,
+        log2m: int = 7,
+        seed: int = 42,
+        confidence: float = 0.95,
+) -> Dict[str, Any]:
+    """
+    Diameter, radius and average shortest path length of the largest connected component.
+    'exact' runs the eccentricity bounding until diameter and radius are exact and BFS from every node for the
+    distance distribution, whose mean is the average path length.
+    'approximate' caps the bounding at `max_bfs` BFS, samples `n_samples` sources for the average path length and
+    estimates the distance distribution with HyperANF.
+    :param graph: NetworkX graph object
+    :param mode: 'exact' or 'approximate'
+    :param n_samples: BFS sources of the average path length in approximate mode
+    :param max_bfs: BFS budget of the diameter/radius bounding in approximate mode
+    :param log2m: HyperANF registers per counter (log2) in approximate mode
+    :param seed: random seed of the source sample and the HyperANF hash
+    :param confidence: confidence level of the average path length interval
+    :return: dictionary with `diameter` and `radius` (the attained eccentricities: diameter lower bound, radius
+        upper bound), their `*_bounds`, `avg_path_length` with its `avg_path_length_ci`, `n_bfs`,
+        `n_sources` and the `distance_distribution` (unordered pairs per distance; estimated in approximate mode)
+    :raises ValueError: If the mode is unknown
+    """
+    if mode not in ('exact', 'approximate'):
+        raise ValueError(f"Unknown path metrics mode '{mode}'; expected 'exact' or 'approximate'")
+    adjacency = _component_adjacency(graph)
+    exact = mode == 'exact'
+
+    bounds = bounding_diameters(adjacency, max_bfs=None if exact else max_bfs)
+    if exact:
+        # one BFS from every node gives the distribution, and the average path length follows from it
+        distribution = distance_distribution(adjacency)
+        mean = float((distribution.index * distribution).sum() / distribution.sum()) if distribution.sum() else 0.0
+        average = {'avg_path_length': mean, 'ci_low': mean, 'ci_high': mean, 'n_sources': adjacency.shape[0]}
+    else:
+        average = sampled_average_path_length(adjacency, n_samples=n_samples, seed=seed, confidence=confidence)
+        distribution = estimated_distance_distribution(adjacency, log2m=log2m, seed=seed)
+
+    return {
+        'mode': mode,
+        'diameter': bounds['diameter_lower'],
+        'diameter_bounds': [bounds['diameter_lower'], bounds['diameter_upper']],
+        'radius': bounds['radius_upper'],
+        'radius_bounds': [bounds['radius_lower'], bounds['radius_upper']],
+        'avg_path_length': average['avg_path_length'],
+        'avg_path_length_ci': [average['ci_low'], average['ci_high']],
+        'n_bfs': bounds['n_bfs'],
+        'n_sources': average['n_sources'],
+        'distance_distribution': distribution,
+    }
@@ -1,10 +1,6 @@
-# to suppress plots
-import matplotlib; matplotlib.use('Agg')
-
 import yaml
 import typer
 import pickle
-import pandas as pd
 from loguru import logger
 from pathlib import Path
 
@@ -14,21 +10,35 @@ from src.config import (
     PARAMS,
 )
 from src import (
-    my_utils,
-    community_detection,
-    structural_analysis,
+    profiling,
+    results_store,
 )
 
 app = typer.Typer()
 
 
 @app.command()
+@profiling.stage('plots')
+@results_store.run('plots')
 def main(
         input_path_graph: Path = PROCESSED_DATA_DIR / "graph.pkl",
         input_path_nodes: Path = PROCESSED_DATA_DIR / "nodes_data_processed.csv",
         figures_dir: Path = FIGURES_DIR,
         params: Path = PARAMS,
 ):
+    # analysis modules pull in matplotlib, seaborn, scipy and cdlib, so they are only imported when plotting
+    import matplotlib; matplotlib.use('Agg')  # to suppress plots
+    import pandas as pd
+
+    from src import (
+        my_utils,
+        cores,
+        layout,
+        community_detection,
+        path_metrics,
+        structural_analysis,
+    )
+
     logger.info("Generating plot from data...")
 
     with open(input_path_graph, "rb") as f:
@@ -38,36 +48,40 @@ def main(
         params = yaml.safe_load(f)
 
     nodes_data = pd.read_csv(input_path_nodes)
+    results_store.describe_run(params=params, graph=G)
 
 
     # Graph Overview
     logger.info("Graph Overview")
-    my_utils.get_graph_overview(G)
+    path_options = path_metrics.options_from_params(params)
+    my_utils.get_graph_overview(G, path_options=path_options)
     my_utils.plot_power_degree_histogram(G)
     my_utils.plot_power_degree_distribution(G)
     analysis = my_utils.PowerLawAnalysis(G)
     analysis.plot_distribution(title='Malazan Network Degree Distribution')
+    my_utils.update_yaml(analysis.summary(n_bootstrap=params['power_law_bootstrap']))
 
     # Structure Analysis
     logger.info("Structural Analysis")
-    structure_analyser = structural_analysis.NetworkStructuralAnalyser(G, ws_rewire_probe=params['ws_rewire_probe'])
+    structure_analyser = structural_analysis.NetworkStructuralAnalyser(
+        G, ws_rewire_probe=params['ws_rewire_probe'], path_options=path_options
+    )
     _ = structure_analyser.analyze_network_properties()
-    structure_analyser.plot_attribute_mixing(G, 'gender')
-    structure_analyser.plot_attribute_mixing(G, 'race_first')
-    structure_analyser.plot_attribute_mixing(G, 'affiliation_first')
-    structure_analyser.plot_attribute_mixing(G, 'affiliation_second')
+    _ = structure_analyser.analyze_network_ensemble(n_instances=params['null_model_instances'])
+    mixing_attributes = ['gender', 'race_first', 'affiliation_first', 'affiliation_second']
+    mixing = structural_analysis.AttributeMixing(G, mixing_attributes, weight='total_co_occurance')
+    for attribute in mixing_attributes:
+        structure_analyser.plot_attribute_mixing(G, attribute, mixing=mixing)
+    _ = structure_analyser.analyze_degree_preserving_null(
+        n_replicates=params['degree_preserving_replicates'], attributes=mixing_attributes
+    )
     structure_analyser.plot_node_similarity_matrix(
         G,
         top_nodes=nodes_data.nlargest(20, 'degree')['id'].tolist(),
         similarity_metric='jaccard'
     )
 
-    structural_analysis.get_centrality(nodes_data, column_name='total_words_count', centrality_name='pov')
-    structural_analysis.get_centrality(nodes_data, column_name='degree', centrality_name='degree')
-    structural_analysis.get_centrality(nodes_data, column_name='closeness', centrality_name='closeness')
-    structural_analysis.get_centrality(nodes_data, column_name='betweenness', centrality_name='betweenness')
-    structural_analysis.get_centrality(nodes_data, column_name='eigenvector', centrality_name='eigenvector')
-    structural_analysis.get_centrality(nodes_data, column_name='pagerank', centrality_name='pagerank')
+    structural_analysis.save_top_k_centralities(nodes_data, figures_dir=figures_dir)
     structural_analysis.plot_centralities_pairplot(nodes_data)
     structural_analysis.plot_centralities_corr_matrix(nodes_data)
     structural_analysis.get_weights_between_top_nodes(nodes_data, G)
@@ -76,6 +90,10 @@ def main(
     logger.info("Community Detection")
     community_detection.get_clique_size_distribution(G)
     community_detection.find_top_n_cliques(G, 3)
+    cores.save_shell_tables(G, nodes_data, figures_dir=figures_dir)
+    layout.plot_layout_figures(
+        G, nodes_data, path=input_path_graph.with_name('graph_layout.csv'), figures_dir=figures_dir
+    )
 
     logger.success("Plot generation complete.")
 
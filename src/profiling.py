@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import sys
+import time
+import functools
+import contextlib
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Optional,
+    Union,
+)
+
+import yaml
+from loguru import logger
+
+from src.config import (
+    FIGURES_DIR,
+    PROFILER,
+    REPORTS_DIR,
+)
+
+try:
+    import resource
+except ModuleNotFoundError:  # not available on Windows
+    resource = None
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import networkx as nx
+
+TIMINGS_PATH = REPORTS_DIR / 'timings.yaml'
+PROFILES_DIR = REPORTS_DIR / 'profiles'
+
+# Stage currently being profiled and per-stage aggregated records (function name -> statistics)
+_current_stage: Optional[str] = None
+_timings: Dict[str, Dict[str, Dict[str, float]]] = {}
+
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident set size of the current process so far.
+    :return: peak RSS in megabytes (NaN if the `resource` module is unavailable)
+    """
+    if resource is None:
+        return float('nan')
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    return max_rss / 2 ** 20 if sys.platform == 'darwin' else max_rss / 2 ** 10
+
+
+def _graph_size(args: tuple, kwargs: dict) -> Optional[nx.Graph]:
+    """Find the graph a function works on: a graph argument or the `graph` attribute of `self`"""
+    import networkx as nx
+
+    for value in (*args, *kwargs.values()):
+        if isinstance(value, nx.Graph):
+            return value
+    if args and isinstance(getattr(args[0], 'graph', None), nx.Graph):
+        return args[0].graph
+    return None
+
+
+def _record(name: str, wall: float, cpu: float, rss_before: float, graph: Optional[nx.Graph]):
+    """Aggregate one measured call into the statistics of the current stage"""
+    entry = _timings.setdefault(_current_stage, {}).setdefault(name, {
+        'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'peak_rss_mb': 0.0, 'rss_growth_mb': 0.0,
+    })
+    rss_after = peak_rss_mb()
+    entry['calls'] += 1
+    entry['wall_s'] = round(entry['wall_s'] + wall, 4)
+    entry['cpu_s'] = round(entry['cpu_s'] + cpu, 4)
+    entry['peak_rss_mb'] = round(max(entry['peak_rss_mb'], rss_after), 1)
+    entry['rss_growth_mb'] = round(max(entry['rss_growth_mb'], rss_after - rss_before), 1)
+    if graph is not None:
+        entry['nodes'] = graph.number_of_nodes()
+        entry['edges'] = graph.number_of_edges()
+
+
+@contextlib.contextmanager
+def measure(name: str, graph: Optional[nx.Graph] = None):
+    """
+    Context manager recording wall time, CPU time, peak RSS and graph size of the enclosed block.
+    Nothing is recorded outside of a `stage`.
+    :param name: name the block is reported under
+    :param graph: graph the block works on (optional)
+    """
+    if _current_stage is None:
+        yield
+        return
+    rss_before = peak_rss_mb()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        _record(name, time.perf_counter() - wall_start, time.process_time() - cpu_start, rss_before, graph)
+
+
+def profiled(func: Callable) -> Callable:
+    """
+    Decorator recording wall time, CPU time, peak RSS and graph size (n, m) of every call of a function.
+    The graph is taken from the first graph argument or from `self.graph`.
+    :param func: metric or plot function to instrument
+    :return: wrapped function
+    """
+    name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _current_stage is None:
+            return func(*args, **kwargs)
+        with measure(name, graph=_graph_size(args, kwargs)):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+@contextlib.contextmanager
+def _profiler(name: str):
+    """Run the profiler selected by the PROFILER environment variable and save its output"""
+    if PROFILER == 'cprofile':
+        import cProfile
+        import pstats
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            PROFILES_DIR.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(PROFILES_DIR / f'{name}.prof')
+            with open(PROFILES_DIR / f'{name}.txt', 'w') as f:
+                pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(50)
+            logger.info(f"cProfile output saved to {PROFILES_DIR / f'{name}.prof'}")
+    elif PROFILER == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ModuleNotFoundError:
+            logger.warning("pyinstrument is not installed; running without the sampling profiler")
+            yield
+            return
+
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            PROFILES_DIR.mkdir(parents=True, exist_ok=True)
+            with open(PROFILES_DIR / f'{name}.html', 'w') as f:
+                f.write(profiler.output_html())
+            logger.info(f"pyinstrument output saved to {PROFILES_DIR / f'{name}.html'}")
+    else:
+        if PROFILER:
+            logger.warning(f"Unknown PROFILER '{PROFILER}'; expected 'cprofile' or 'pyinstrument'")
+        yield
+
+
+@contextlib.contextmanager
+def stage(name: str, timings_path: Union[Path, str] = TIMINGS_PATH):
+    """
+    Profile a pipeline stage: every `profiled` function called inside is recorded under the stage, the whole stage
+    is run under the profiler selected by PROFILER (if any) and the summary is written to `timings_path`.
+    Also usable as a decorator of the stage entry point.
+    :param name: stage name (e.g. 'data_process', 'plots')
+    :param timings_path: YAML file keeping the timings of every stage
+    """
+    global _current_stage
+    previous_stage, _current_stage = _current_stage, name
+    _timings[name] = {}
+    try:
+        with _profiler(name), measure('total'):
+            yield
+    finally:
+        _current_stage = previous_stage
+        write_timings(name, timings_path)
+
+
+def write_timings(name: str, timings_path: Union[Path, str] = TIMINGS_PATH):
+    """
+    Write the timings of a stage into the YAML summary, keeping the other stages' timings.
+    :param name: stage name
+    :param timings_path: YAML file keeping the timings of every stage
+    :return: None
+    """
+    timings_path = Path(timings_path)
+    existing = {}
+    if timings_path.exists():
+        with open(timings_path, 'r') as f:
+            existing = yaml.safe_load(f) or {}
+    existing[name] = dict(sorted(_timings.get(name, {}).items(), key=lambda x: -x[1]['wall_s']))
+    with open(timings_path, 'w') as f:
+        yaml.safe_dump(existing, f, sort_keys=False)
+    logger.info(f"Timings of stage '{name}' saved to {timings_path}")
+
+
+def timings_table(timings_path: Union[Path, str] = TIMINGS_PATH) -> pd.DataFrame:
+    """
+    Flatten the timings summary into a table (one row per stage and function, slowest first).
+    :param timings_path: YAML file keeping the timings of every stage
+    :return: DataFrame with calls, wall/CPU time, peak RSS and graph size of every recorded function
+    """
+    import pandas as pd
+
+    with open(timings_path, 'r') as f:
+        timings = yaml.safe_load(f) or {}
+    rows = [
+        {'Stage': stage_name, 'Function': function, **record}
+        for stage_name, records in timings.items()
+        for function, record in records.items()
+    ]
+    return (
+        pd.DataFrame(rows)
+        .reindex(columns=['Stage', 'Function', 'calls', 'wall_s', 'cpu_s', 'peak_rss_mb', 'rss_growth_mb',
+                          'nodes', 'edges'])
+        .rename(columns={
+            'calls': 'Calls', 'wall_s': 'Wall (s)', 'cpu_s': 'CPU (s)', 'peak_rss_mb': 'Peak RSS (MB)',
+            'rss_growth_mb': 'RSS Growth (MB)', 'nodes': 'Nodes', 'edges': 'Edges',
+        })
+        .astype({'Nodes': 'Int64', 'Edges': 'Int64'})
+    )
+
+
+def save_timings_table(
+        timings_path: Union[Path, str] = TIMINGS_PATH,
+        filename: Union[Path, str] = FIGURES_DIR / 'table_pipeline_timings.md',
+):
+    """
+    Render the timings summary as a markdown table for the analysis report.
+    :param timings_path: YAML file keeping the timings of every stage
+    :param filename: destination of the markdown table
+    :return: None
+    """
+    from src.my_utils import save_table_to_markdown
+
+    save_table_to_markdown(timings_table(timings_path), filename=filename, table_title="Pipeline Timings")
@@ -0,0 +1,414 @@
+from __future__ import annotations
+
+import json
+import time
+import pickle
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from http import HTTPStatus
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    List,
+    Literal,
+    Optional,
+)
+
+import typer
+from loguru import logger
+
+from src.config import PROCESSED_DATA_DIR
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+app = typer.Typer()
+
+
+class UnknownNodeError(KeyError):
+    """Raised when a query names a character that is not in the graph"""
+
+
+class GraphIndex:
+    """
+    In-memory query index over the processed artifacts: the graph, the node table with its centralities and
+    community labels, and the sparse rows used for neighborhood similarity, so a top-k similarity query is a
+    single sparse row product.
+
+    Attributes:
+        graph (nx.Graph): Graph loaded from graph.pkl
+        nodes (pd.DataFrame): Processed node data indexed by id
+        arrays (GraphArrays): Array representation of the graph
+        loaded_at (float): Time the index was built
+        mtimes (dict): Modification times of the artifacts the index was built from
+    """
+
+    def __init__(self, graph_path: Path, nodes_path: Path, weight: Optional[str] = 'total_co_occurance'):
+        """
+        Load the artifacts and build the similarity index.
+        :param graph_path: pickled graph (graph.pkl)
+        :param nodes_path: processed nodes data (nodes_data_processed.csv)
+        :param weight: edge attribute holding the co-occurrence weight
+        """
+        import numpy as np
+        import pandas as pd
+        from scipy import sparse
+
+        from src.graph_arrays import graph_arrays
+
+        self.mtimes = artifact_mtimes([graph_path, nodes_path])
+        with open(graph_path, 'rb') as f:
+            self.graph: nx.Graph = pickle.load(f)
+        self.nodes = pd.read_csv(nodes_path).drop_duplicates('id', keep='last').set_index('id')
+        self.weight = weight
+        self.arrays = graph_arrays(self.graph, weight=weight)
+
+        adjacency = self.arrays.adjacency
+        self._binary = (adjacency != 0).astype(np.float64).tocsr()
+        self._sizes = np.asarray(self._binary.sum(axis=1)).ravel()
+        norms = np.sqrt(np.asarray(adjacency.multiply(adjacency).sum(axis=1)).ravel())
+        inverse = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+        self._normalized = (sparse.diags(inverse) @ adjacency).tocsr()
+        self.loaded_at = time.time()
+
+    def _check(self, node: str) -> int:
+        index = self.arrays.node_index.get(node)
+        if index is None:
+            raise UnknownNodeError(node)
+        return index
+
+    def node(self, node: str) -> Dict[str, Any]:
+        """
+        Attributes, centralities and community labels of a character.
+        :param node: character name
+        :return: dictionary of the node's row in the processed nodes data plus its number of neighbors
+        """
+        self._check(node)
+        row = self.nodes.loc[node] if node in self.nodes.index else None
+        attributes = {} if row is None else json.loads(row.to_json())
+        return {'node': node, 'n_neighbors': self.graph.degree(node), **attributes}
+
+    def ego(self, node: str, radius: int = 1) -> Dict[str, Any]:
+        """
+        Ego network of a character.
+        :param node: character name
+        :param radius: number of hops included
+        :return: dictionary with the nodes and the weighted edges of the ego network
+        """
+        import networkx as nx
+
+        self._check(node)
+        ego = nx.ego_graph(self.graph, node, radius=radius)
+        return {
+            'node': node,
+            'radius': radius,
+            'nodes': list(ego.nodes()),
+            'edges': [[u, v, data.get(self.weight)] for u, v, data in ego.edges(data=True)],
+        }
+
+    def neighborhood(self, node: str, k: int = 2) -> Dict[str, Any]:
+        """
+        Characters within k hops, grouped by distance.
+        :param node: character name
+        :param k: maximum number of hops
+        :return: dictionary mapping every distance 1..k to the characters at that distance
+        """
+        import networkx as nx
+
+        self._check(node)
+        hops: Dict[int, List[str]] = {hop: [] for hop in range(1, k + 1)}
+        for other, distance in nx.single_source_shortest_path_length(self.graph, node, cutoff=k).items():
+            if distance > 0:
+                hops[distance].append(other)
+        return {'node': node, 'k': k, 'hops': hops}
+
+    def path(self, source: str, target: str, weighted: bool = False) -> Dict[str, Any]:
+        """
+        Shortest path between two characters.
+        :param source: first character
+        :param target: second character
+        :param weighted: treat frequent co-occurrence as closeness (edge length 1 / weight) instead of counting hops
+        :return: dictionary with the path (None if the characters are not connected) and its number of hops
+        """
+        import networkx as nx
+
+        self._check(source)
+        self._check(target)
+        length = (lambda u, v, data: 1.0 / data.get(self.weight, 1.0)) if weighted and self.weight else None
+        try:
+            path = nx.shortest_path(self.graph, source, target, weight=length)
+        except nx.NetworkXNoPath:
+            path = None
+        return {'source': source, 'target': target, 'path': path, 'hops': None if path is None else len(path) - 1}
+
+    def similar(self, node: str, k: int = 10, metric: Literal['jaccard', 'cosine'] = 'jaccard') -> Dict[str, Any]:
+        """
+        Characters with the most similar neighborhoods.
+        :param node: character name
+        :param k: number of characters returned
+        :param metric: 'jaccard' (shared neighbors) or 'cosine' (of the weighted adjacency rows)
+        :return: dictionary with the top-k characters and their similarity, most similar first
+        :raises ValueError: If the metric is unknown
+        """
+        import numpy as np
+
+        index = self._check(node)
+        if metric == 'jaccard':
+            overlap = (self._binary[index] @ self._binary.T).toarray().ravel()
+            union = self._sizes[index] + self._sizes - overlap
+            scores = np.divide(overlap, union, out=np.zeros_like(overlap), where=union > 0)
+        elif metric == 'cosine':
+            scores = (self._normalized[index] @ self._normalized.T).toarray().ravel()
+        else:
+            raise ValueError(f"Unknown similarity metric '{metric}'; expected 'jaccard' or 'cosine'")
+        scores[index] = -np.inf
+        k = min(k, len(scores) - 1)
+        top = np.argpartition(-scores, k - 1)[:k] if k > 0 else np.array([], dtype=np.int64)
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return {
+            'node': node,
+            'metric': metric,
+            'similar': [[self.arrays.nodes[i], round(float(scores[i]), 4)] for i in top],
+        }
+
+    def community(self, node: str, algorithm: str = 'louvain') -> Dict[str, Any]:
+        """
+        Community of a character and its other members.
+        :param node: character name
+        :param algorithm: community column of the processed nodes data, with or without the `_community` suffix
+            (e.g. 'louvain', 'leiden', 'asyn_lpa', 'k_clique_percolation')
+        :return: dictionary with the community label (-1 if the node is in none) and its members
+        :raises ValueError: If there is no such community column
+        """
+        column = algorithm if algorithm in self.nodes.columns else f'{algorithm}_community'
+        if column not in self.nodes.columns:
+            raise ValueError(f"Unknown community algorithm '{algorithm}'")
+        self._check(node)
+        label = int(self.nodes.at[node, column]) if node in self.nodes.index else -1
+        members = [] if label < 0 else self.nodes.index[self.nodes[column] == label].tolist()
+        return {'node': node, 'algorithm': column, 'community': label, 'members': members}
+
+    def health(self) -> Dict[str, Any]:
+        """Size of the loaded graph and the artifacts it was loaded from"""
+        return {
+            'nodes': self.arrays.n,
+            'edges': self.arrays.m,
+            'loaded_at': self.loaded_at,
+            'artifacts': {str(path): mtime for path, mtime in self.mtimes.items()},
+        }
+
+
+def artifact_mtimes(paths: List[Path]) -> Dict[Path, Optional[int]]:
+    """
+    Modification times of the artifacts the index depends on.
+    :param paths: artifact files
+    :return: mapping of every path to its modification time in ns (None if missing)
+    """
+    return {Path(path): Path(path).stat().st_mtime_ns if Path(path).exists() else None for path in paths}
+
+
+def dispatch(index: GraphIndex, endpoint: str, query: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Answer a query from its endpoint and its query string parameters.
+    :param index: loaded graph index
+    :param endpoint: one of /health, /node, /ego, /neighborhood, /path, /similar, /community
+    :param query: query string parameters
+    :return: JSON-serializable answer
+    :raises LookupError: If the endpoint does not exist
+    :raises ValueError: If a required parameter is missing or has the wrong type
+    """
+    def required(name: str) -> str:
+        if name not in query:
+            raise ValueError(f"Missing query parameter '{name}'")
+        return query[name]
+
+    if endpoint == '/health':
+        return index.health()
+    if endpoint == '/node':
+        return index.node(required('node'))
+    if endpoint == '/ego':
+        return index.ego(required('node'), radius=int(query.get('radius', 1)))
+    if endpoint == '/neighborhood':
+        return index.neighborhood(required('node'), k=int(query.get('k', 2)))
+    if endpoint == '/path':
+        weighted = query.get('weighted', 'false').lower() in ('1', 'true', 'yes')
+        return index.path(required('source'), required('target'), weighted=weighted)
+    if endpoint == '/similar':
+        return index.similar(required('node'), k=int(query.get('k', 10)), metric=query.get('metric', 'jaccard'))
+    if endpoint == '/community':
+        return index.community(required('node'), algorithm=query.get('algorithm', 'louvain'))
+    raise LookupError(endpoint)
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """JSON over HTTP GET: the path selects the query, the query string holds its parameters"""
+
+    server: QueryServer
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        try:
+            status, body = HTTPStatus.OK, dispatch(self.server.index, url.path, query)
+        except UnknownNodeError as e:
+            status, body = HTTPStatus.NOT_FOUND, {'error': f"Unknown character {e.args[0]!r}"}
+        except LookupError:
+            status, body = HTTPStatus.NOT_FOUND, {'error': f"Unknown endpoint '{url.path}'"}
+        except ValueError as e:
+            status, body = HTTPStatus.BAD_REQUEST, {'error': str(e)}
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args):
+        logger.trace(f"{self.address_string()} {format % args}")
+
+
+class QueryServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server keeping a `GraphIndex` warm in memory. A watcher thread polls the artifacts and swaps
+    in a freshly built index once they changed and stopped changing (requests in flight keep the old one).
+
+    Attributes:
+        index (GraphIndex): Index answering the queries
+    """
+
+    daemon_threads = True
+
+    def __init__(
+            self,
+            address: tuple,
+            graph_path: Path,
+            nodes_path: Path,
+            reload_interval: float = 2.0,
+    ):
+        super().__init__(address, QueryHandler)
+        self.graph_path, self.nodes_path = Path(graph_path), Path(nodes_path)
+        self.reload_interval = reload_interval
+        self.index = GraphIndex(self.graph_path, self.nodes_path)
+        self._stopped = threading.Event()
+        self._watcher = threading.Thread(target=self._watch, name='artifact-watcher', daemon=True)
+
+    def reload_if_changed(self, previous: Optional[Dict[Path, Optional[int]]] = None) -> Dict[Path, Optional[int]]:
+        """
+        Rebuild the index when the artifacts differ from the loaded ones and equal `previous` (the previous poll),
+        so files still being written are not loaded half-way. A failed reload keeps the current index.
+        :param previous: artifact modification times seen by the previous poll (None to reload right away)
+        :return: current artifact modification times
+        """
+        current = artifact_mtimes([self.graph_path, self.nodes_path])
+        changed = current != self.index.mtimes
+        settled = previous is None or current == previous
+        if changed and settled and all(mtime is not None for mtime in current.values()):
+            try:
+                start = time.perf_counter()
+                self.index = GraphIndex(self.graph_path, self.nodes_path)
+                logger.info(f"Reloaded the graph index in {time.perf_counter() - start:.2f}s")
+            except Exception as e:
+                logger.warning(f"Reloading the graph index failed, keeping the previous one: {e}")
+        return current
+
+    def _watch(self):
+        previous = self.index.mtimes
+        while not self._stopped.wait(self.reload_interval):
+            previous = self.reload_if_changed(previous)
+
+    def serve_forever(self, poll_interval: float = 0.5):
+        self._watcher.start()
+        super().serve_forever(poll_interval)
+
+    def shutdown(self):
+        self._stopped.set()
+        super().shutdown()
+
+
+def query(
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        timeout: float = 10.0,
+) -> Dict[str, Any]:
+    """
+    Send a query to a running server.
+    :param endpoint: query name, e.g. 'similar' or '/similar'
+    :param params: query parameters (None values are left out)
+    :param host: server host
+    :param port: server port
+    :param timeout: timeout in seconds
+    :return: decoded answer
+    :raises RuntimeError: If the server answers with an error
+    """
+    params = {key: value for key, value in (params or {}).items() if value is not None}
+    url = f"http://{host}:{port}/{endpoint.lstrip('/')}?{urllib.parse.urlencode(params)}"
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(json.loads(e.read()).get('error', str(e))) from None
+
+
+@app.command()
+def serve(
+        graph_path: Path = PROCESSED_DATA_DIR / 'graph.pkl',
+        nodes_path: Path = PROCESSED_DATA_DIR / 'nodes_data_processed.csv',
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        reload_interval: float = 2.0,
+):
+    start = time.perf_counter()
+    server = QueryServer((host, port), graph_path, nodes_path, reload_interval=reload_interval)
+    logger.success(
+        f"Graph index ({server.index.arrays.n} nodes) loaded in {time.perf_counter() - start:.2f}s; "
+        f"serving on http://{host}:{port}"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+@app.command('query')
+def query_command(
+        endpoint: str = typer.Argument(..., help="health, node, ego, neighborhood, path, similar or community"),
+        node: Optional[str] = None,
+        source: Optional[str] = None,
+        target: Optional[str] = None,
+        k: Optional[int] = None,
+        radius: Optional[int] = None,
+        metric: Optional[str] = None,
+        algorithm: Optional[str] = None,
+        weighted: bool = False,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+):
+    params = {
+        'node': node, 'source': source, 'target': target, 'k': k, 'radius': radius, 'metric': metric,
+        'algorithm': algorithm, 'weighted': 'true' if weighted else None,
+    }
+    try:
+        answer = query(endpoint, params, host=host, port=port)
+    except (RuntimeError, urllib.error.URLError) as e:
+        logger.error(e)
+        raise typer.Exit(code=1)
+    print(json.dumps(answer, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    app()
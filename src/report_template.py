@@ -0,0 +1,207 @@
+import re
+import json
+import hashlib
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from loguru import logger
+
+# `${key}` is replaced by a value of results.yaml, `%{table_x}` by reports/figures/table_x.md
+PLACEHOLDER_PATTERN = re.compile(r'\$\{(?P<value>[^}]+)\}|%\{(?P<table>table_[^}]+)\}')
+# Sections start at level-2 headings; everything before the first one is the preamble
+SECTION_PATTERN = re.compile(r'^## ', flags=re.MULTILINE)
+
+
+class Token(NamedTuple):
+    """Piece of a compiled template: literal text, a value placeholder or a table placeholder"""
+    kind: str  # 'text', 'value' or 'table'
+    content: str  # literal text or placeholder name
+
+
+class Section(NamedTuple):
+    """Template section (text up to the next level-2 heading) with its tokens and the placeholders it uses"""
+    heading: str
+    tokens: List[Token]
+    values: Set[str]
+    tables: Set[str]
+
+
+class RenderSummary(NamedTuple):
+    """Outcome of a render: unresolved placeholders, results never referenced and reused sections"""
+    missing_values: List[str]
+    missing_tables: List[str]
+    unused_values: List[str]
+    rendered_sections: List[str]
+    reused_sections: List[str]
+
+
+def tokenize(text: str) -> List[Token]:
+    """
+    Split template text into literal text and placeholder tokens in one scan.
+    :param text: template text
+    :return: list of tokens, concatenating their contents gives back the placeholders' names in place
+    """
+    tokens, position = [], 0
+    for match in PLACEHOLDER_PATTERN.finditer(text):
+        if match.start() > position:
+            tokens.append(Token('text', text[position:match.start()]))
+        kind = 'value' if match.group('value') is not None else 'table'
+        tokens.append(Token(kind, match.group(kind)))
+        position = match.end()
+    if position < len(text):
+        tokens.append(Token('text', text[position:]))
+    return tokens
+
+
+def format_table(content: str) -> str:
+    """Indent a markdown table by 4 spaces so it renders inside the <details> blocks of the report"""
+    indented = '\n'.join('    ' + line for line in content.strip().split('\n'))
+    return f"\n{indented}\n"
+
+
+class ReportTemplate:
+    """
+    Compiled report template.
+
+    The template is split into sections at its level-2 headings and every section is tokenized once;
+    rendering resolves all placeholders of a section in a single pass over its tokens. With a section cache,
+    a section is only re-rendered when its text, the values it references or the files of its tables changed.
+
+    Attributes:
+        sections (list): Compiled sections in document order
+        values (set): Names of all `${key}` placeholders
+        tables (set): Names of all `%{table_x}` placeholders
+    """
+
+    def __init__(self, text: str):
+        """
+        Compile a template.
+        :param text: template text
+        """
+        starts = [0] + [match.start() for match in SECTION_PATTERN.finditer(text) if match.start() > 0] + [len(text)]
+        self.sections: List[Section] = []
+        for start, end in zip(starts[:-1], starts[1:]):
+            chunk = text[start:end]
+            tokens = tokenize(chunk)
+            self.sections.append(Section(
+                heading=chunk.split('\n', 1)[0].lstrip('# ').strip(),
+                tokens=tokens,
+                values={token.content for token in tokens if token.kind == 'value'},
+                tables={token.content for token in tokens if token.kind == 'table'},
+            ))
+        self.values = set().union(*(section.values for section in self.sections))
+        self.tables = set().union(*(section.tables for section in self.sections))
+
+    @classmethod
+    def from_file(cls, path: Union[Path, str]) -> 'ReportTemplate':
+        """
+        Compile a template file.
+        :param path: path of the template
+        :return: compiled template
+        """
+        with open(path, 'r') as f:
+            return cls(f.read())
+
+    @staticmethod
+    def _section_key(section: Section, results: Dict[str, Any], tables_dir: Path) -> str:
+        """Hash of everything a section's output depends on (table files by size and modification time)"""
+        digest = hashlib.sha256()
+        digest.update(''.join(token.kind + token.content for token in section.tokens).encode())
+        for key in sorted(section.values):
+            digest.update((f'{key}={results[key]!s}' if key in results else f'{key}:-').encode())
+        for table in sorted(section.tables):
+            path = tables_dir / f'{table}.md'
+            stat = path.stat() if path.exists() else None
+            digest.update((f'{table}:{stat.st_size}:{stat.st_mtime_ns}' if stat else f'{table}:-').encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def _render_section(section: Section, results: Dict[str, Any], tables_dir: Path) -> str:
+        """Resolve the placeholders of a section; unresolved ones are left in place"""
+        parts = []
+        for token in section.tokens:
+            if token.kind == 'text':
+                parts.append(token.content)
+            elif token.kind == 'value':
+                parts.append(str(results[token.content]) if token.content in results else f'${{{token.content}}}')
+            else:
+                path = tables_dir / f'{token.content}.md'
+                if path.exists():
+                    with open(path, 'r') as f:
+                        parts.append(format_table(f.read()))
+                else:
+                    parts.append(f'%{{{token.content}}}')
+        return ''.join(parts)
+
+    def render(
+            self,
+            results: Dict[str, Any],
+            tables_dir: Union[Path, str],
+            cache_path: Optional[Union[Path, str]] = None,
+    ) -> Tuple[str, RenderSummary]:
+        """
+        Render the template.
+        :param results: placeholder values (results.yaml)
+        :param tables_dir: directory of the `table_x.md` files
+        :param cache_path: JSON file keeping the rendered sections between runs (None to render everything)
+        :return: tuple (rendered markdown, render summary)
+        """
+        tables_dir = Path(tables_dir)
+        cache = {}
+        if cache_path is not None and Path(cache_path).exists():
+            with open(cache_path, 'r') as f:
+                cache = json.load(f)
+
+        outputs, new_cache, rendered, reused = [], {}, [], []
+        for section in self.sections:
+            key = self._section_key(section, results, tables_dir)
+            cached = cache.get(key)
+            if cached is None:
+                cached = self._render_section(section, results, tables_dir)
+                rendered.append(section.heading)
+            else:
+                reused.append(section.heading)
+            new_cache[key] = cached
+            outputs.append(cached)
+
+        if cache_path is not None:
+            with open(cache_path, 'w') as f:
+                json.dump(new_cache, f)
+
+        summary = RenderSummary(
+            missing_values=sorted(self.values - set(results)),
+            missing_tables=sorted(table for table in self.tables if not (tables_dir / f'{table}.md').exists()),
+            unused_values=sorted(set(results) - self.values),
+            rendered_sections=rendered,
+            reused_sections=reused,
+        )
+        return ''.join(outputs), summary
+
+
+def markdown_to_html(markdown: str, title: str = 'Analysis Report') -> Optional[str]:
+    """
+    Convert the rendered report to a standalone HTML page.
+    :param markdown: rendered markdown
+    :param title: page title
+    :return: HTML document, or None if markdown-it-py is not installed
+    """
+    try:
+        from markdown_it import MarkdownIt
+    except ModuleNotFoundError:
+        logger.warning("markdown-it-py is not installed; skipping the HTML report")
+        return None
+
+    body = MarkdownIt('commonmark', {'html': True}).enable('table').render(markdown)
+    return (
+        f'<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n<title>{title}</title>\n</head>\n'
+        f'<body>\n{body}</body>\n</html>\n'
+    )
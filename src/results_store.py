@@ -0,0 +1,363 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import hashlib
+import contextlib
+from datetime import (
+    datetime,
+    timezone,
+)
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Optional,
+    Union,
+)
+
+import yaml
+import typer
+from loguru import logger
+
+from src.config import REPORTS_DIR
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import networkx as nx
+
+RESULTS_DB_PATH = REPORTS_DIR / 'results.sqlite'
+RESULTS_YAML_PATH = REPORTS_DIR / 'results.yaml'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    stage TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    params_hash TEXT,
+    params TEXT,
+    graph_fingerprint TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    metric TEXT NOT NULL,
+    value TEXT NOT NULL,
+    numeric REAL,
+    PRIMARY KEY (run_id, metric)
+);
+CREATE INDEX IF NOT EXISTS results_by_metric ON results (metric, run_id);
+CREATE INDEX IF NOT EXISTS runs_by_params ON runs (params_hash, graph_fingerprint);
+"""
+
+# Run currently collecting results (stage, start time, parameters, graph fingerprint) and its buffered results
+_current_run: Optional[Dict[str, Any]] = None
+_pending: Dict[str, Any] = {}
+
+app = typer.Typer()
+
+
+def _to_native(value: Any) -> Any:
+    """JSON fallback for numpy scalars and arrays"""
+    import numpy as np
+
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _encode(value: Any) -> str:
+    return json.dumps(value, default=_to_native)
+
+
+def params_hash(params: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Hash identifying a parameter set (independent of key order).
+    :param params: parameters of the run, e.g. the content of params.yaml
+    :return: hex digest, None without parameters
+    """
+    if params is None:
+        return None
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=_to_native).encode()).hexdigest()[:16]
+
+
+def graph_fingerprint(graph: nx.Graph) -> str:
+    """
+    Hash identifying the structure of a graph: node labels and edge endpoints in graph order.
+    :param graph: NetworkX graph object
+    :return: hex digest
+    """
+    from src.graph_arrays import graph_arrays
+
+    arrays = graph_arrays(graph)
+    digest = hashlib.sha256(f'{arrays.n}:{arrays.m}:{type(graph).__name__}'.encode())
+    digest.update(repr(arrays.nodes).encode())
+    digest.update(arrays.src.tobytes())
+    digest.update(arrays.dst.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def connect(db_path: Union[Path, str] = RESULTS_DB_PATH) -> sqlite3.Connection:
+    """
+    Open the results store, creating the schema on first use. A new store imports the existing results.yaml
+    (next to it) as its first run, so metrics of stages that are not re-run are not lost.
+    :param db_path: SQLite database file
+    :return: connection
+    """
+    db_path = Path(db_path)
+    is_new = not db_path.exists()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(db_path)
+    connection.executescript(SCHEMA)
+    legacy_yaml = db_path.with_name(RESULTS_YAML_PATH.name)
+    if is_new and legacy_yaml.exists():
+        with open(legacy_yaml, 'r') as f:
+            legacy = yaml.safe_load(f) or {}
+        if legacy:
+            _insert_run(connection, 'import', legacy)
+            logger.info(f"Imported {len(legacy)} results from {legacy_yaml} into {db_path}")
+    return connection
+
+
+def _insert_run(
+        connection: sqlite3.Connection,
+        stage: str,
+        results: Dict[str, Any],
+        started_at: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+        fingerprint: Optional[str] = None,
+) -> int:
+    """Insert a run and all of its results in one transaction"""
+    with connection:
+        cursor = connection.execute(
+            'INSERT INTO runs (stage, started_at, params_hash, params, graph_fingerprint) VALUES (?, ?, ?, ?, ?)',
+            (
+                stage,
+                started_at or datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                params_hash(params),
+                None if params is None else _encode(params),
+                fingerprint,
+            ),
+        )
+        run_id = cursor.lastrowid
+        connection.executemany(
+            'INSERT OR REPLACE INTO results (run_id, metric, value, numeric) VALUES (?, ?, ?, ?)',
+            [
+                (run_id, metric, _encode(value), float(value) if _is_number(value) else None)
+                for metric, value in results.items()
+            ],
+        )
+    return run_id
+
+
+def _is_number(value: Any) -> bool:
+    import numpy as np
+
+    return isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, bool)
+
+
+def write(
+        stage: str,
+        results: Dict[str, Any],
+        params: Optional[Dict[str, Any]] = None,
+        graph: Optional[nx.Graph] = None,
+        db_path: Union[Path, str] = RESULTS_DB_PATH,
+        yaml_path: Optional[Union[Path, str]] = RESULTS_YAML_PATH,
+) -> int:
+    """
+    Store the results of a run in one batch and re-export the current results.
+    :param stage: pipeline stage the results come from
+    :param results: metric names and values (numbers, strings, lists or dicts)
+    :param params: parameters of the run
+    :param graph: graph the results were computed on
+    :param db_path: SQLite database file
+    :param yaml_path: results YAML to re-export (None to skip)
+    :return: id of the new run
+    """
+    fingerprint = graph_fingerprint(graph) if graph is not None else None
+    with contextlib.closing(connect(db_path)) as connection:
+        run_id = _insert_run(connection, stage, results, params=params, fingerprint=fingerprint)
+    if yaml_path is not None:
+        export_yaml(yaml_path, db_path)
+    return run_id
+
+
+def db_path_for(yaml_path: Optional[Union[Path, str]]) -> Path:
+    """Store backing a results YAML: the results.sqlite next to it (the default store for None)"""
+    return RESULTS_DB_PATH if yaml_path is None else Path(yaml_path).with_name(RESULTS_DB_PATH.name)
+
+
+def record(new_data: Dict[str, Any], yaml_path: Optional[Union[Path, str]] = RESULTS_YAML_PATH):
+    """
+    Record results in the store next to `yaml_path`. Inside a `run` on that store they are buffered and written
+    in one batch when the run ends; otherwise they are written right away as a run of their own.
+    :param new_data: metric names and values
+    :param yaml_path: results YAML (re-exported after an immediate write); its directory selects the store
+    :return: None
+    """
+    db_path = db_path_for(yaml_path)
+    if _current_run is not None and Path(_current_run['db_path']).resolve() == db_path.resolve():
+        _pending.update(new_data)
+        return
+    write('adhoc', new_data, db_path=db_path, yaml_path=yaml_path)
+
+
+def describe_run(params: Optional[Dict[str, Any]] = None, graph: Optional[nx.Graph] = None):
+    """
+    Attach the parameter set and the graph to the current run (no-op outside of a `run`).
+    :param params: parameters of the run, e.g. the content of params.yaml
+    :param graph: graph the stage analyses
+    :return: None
+    """
+    if _current_run is None:
+        return
+    if params is not None:
+        _current_run['params'] = params
+    if graph is not None:
+        _current_run['fingerprint'] = graph_fingerprint(graph)
+
+
+@contextlib.contextmanager
+def run(
+        stage: str,
+        db_path: Union[Path, str] = RESULTS_DB_PATH,
+        yaml_path: Optional[Union[Path, str]] = RESULTS_YAML_PATH,
+):
+    """
+    Collect the results recorded inside (see `record`) and write them in one transaction when the stage ends,
+    then re-export the results YAML. Also usable as a decorator of the stage entry point.
+    :param stage: stage name (e.g. 'plots')
+    :param db_path: SQLite database file
+    :param yaml_path: results YAML to re-export (None to skip)
+    """
+    global _current_run
+    previous_run, previous_pending = _current_run, dict(_pending)
+    _current_run = {
+        'stage': stage, 'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'params': None, 'fingerprint': None, 'db_path': db_path,
+    }
+    _pending.clear()
+    try:
+        yield
+    finally:
+        current, results = _current_run, dict(_pending)
+        _current_run = previous_run
+        _pending.clear()
+        _pending.update(previous_pending)
+        if results:
+            with contextlib.closing(connect(db_path)) as connection:
+                run_id = _insert_run(
+                    connection, stage, results, started_at=current['started_at'], params=current['params'],
+                    fingerprint=current['fingerprint'],
+                )
+            logger.info(f"{len(results)} results of stage '{stage}' saved as run {run_id} to {db_path}")
+            if yaml_path is not None:
+                export_yaml(yaml_path, db_path)
+
+
+def latest(db_path: Union[Path, str] = RESULTS_DB_PATH) -> Dict[str, Any]:
+    """
+    Latest value of every metric, in the order metrics were first recorded.
+    :param db_path: SQLite database file
+    :return: dictionary in the shape of results.yaml
+    """
+    with contextlib.closing(connect(db_path)) as connection:
+        rows = connection.execute(
+            """
+            SELECT r.metric, r.value
+            FROM results r
+            JOIN (SELECT metric, MAX(run_id) AS run_id, MIN(rowid) AS first FROM results GROUP BY metric) l
+                ON r.metric = l.metric AND r.run_id = l.run_id
+            ORDER BY l.first
+            """
+        ).fetchall()
+    return {metric: json.loads(value) for metric, value in rows}
+
+
+def export_yaml(
+        yaml_path: Union[Path, str] = RESULTS_YAML_PATH, db_path: Union[Path, str] = RESULTS_DB_PATH
+):
+    """
+    Write the latest value of every metric as results.yaml (read by `update_report`).
+    :param yaml_path: destination YAML file
+    :param db_path: SQLite database file
+    :return: None
+    """
+    with open(yaml_path, 'w') as f:
+        yaml.dump(latest(db_path), f, sort_keys=False)
+
+
+def history(
+        metric: str, last: Optional[int] = 20, db_path: Union[Path, str] = RESULTS_DB_PATH
+) -> pd.DataFrame:
+    """
+    Values of a metric over the most recent runs that recorded it.
+    :param metric: metric name, e.g. 'avg_clustering'
+    :param last: number of runs (None for all)
+    :param db_path: SQLite database file
+    :return: DataFrame with run id, stage, start time, parameter hash, graph fingerprint and value, oldest first
+    """
+    import pandas as pd
+
+    with contextlib.closing(connect(db_path)) as connection:
+        frame = pd.read_sql_query(
+            """
+            SELECT r.run_id, u.stage, u.started_at, u.params_hash, u.graph_fingerprint, r.numeric, r.value
+            FROM results r JOIN runs u ON u.run_id = r.run_id
+            WHERE r.metric = ?
+            ORDER BY r.run_id DESC
+            LIMIT ?
+            """,
+            connection,
+            params=(metric, -1 if last is None else last),
+        )
+    frame['value'] = [
+        numeric if pd.notna(numeric) else json.loads(value) for numeric, value in zip(frame['numeric'], frame['value'])
+    ]
+    return frame.drop(columns='numeric').iloc[::-1].reset_index(drop=True)
+
+
+def versus(metric: str, parameter: str, db_path: Union[Path, str] = RESULTS_DB_PATH) -> pd.DataFrame:
+    """
+    Numeric values of a metric against a run parameter, e.g. 'avg_clustering' vs 'min_co_occurence_threshold'.
+    :param metric: metric name
+    :param parameter: top-level key of the run parameters
+    :param db_path: SQLite database file
+    :return: DataFrame with one row per run that has both: parameter value, metric value, run id and fingerprint
+    """
+    import pandas as pd
+
+    with contextlib.closing(connect(db_path)) as connection:
+        return pd.read_sql_query(
+            """
+            SELECT json_extract(u.params, '$."' || ? || '"') AS parameter, r.numeric AS value,
+                r.run_id, u.graph_fingerprint
+            FROM results r JOIN runs u ON u.run_id = r.run_id
+            WHERE r.metric = ? AND r.numeric IS NOT NULL AND parameter IS NOT NULL
+            ORDER BY parameter, r.run_id
+            """,
+            connection,
+            params=(parameter, metric),
+        ).rename(columns={'parameter': parameter, 'value': metric})
+
+
+@app.command('history')
+def history_command(metric: str, last: int = 20, db_path: Path = RESULTS_DB_PATH):
+    print(history(metric, last=last, db_path=db_path).to_string(index=False))
+
+
+@app.command('versus')
+def versus_command(metric: str, parameter: str, db_path: Path = RESULTS_DB_PATH):
+    print(versus(metric, parameter, db_path=db_path).to_string(index=False))
+
+
+@app.command('export')
+def export_command(yaml_path: Path = RESULTS_YAML_PATH, db_path: Path = RESULTS_DB_PATH):
+    export_yaml(yaml_path, db_path)
+    logger.success(f"Latest results exported to {yaml_path}")
+
+
+if __name__ == '__main__':
+    app()
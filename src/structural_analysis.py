@@ -1,17 +1,21 @@
+import os
+import warnings
+
 import numpy as np
 import pandas as pd
 import networkx as nx
-from scipy import stats
 
-import seaborn as sns
-import matplotlib.pyplot as plt
 from collections import Counter
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 
 from typing import (
+    Any,
     Dict,
     List,
     Tuple,
     Literal,
+    Optional,
 )
 from pathlib import Path
 from loguru import logger
@@ -21,9 +25,176 @@ from src.config import (
     FIGURES_DIR,
 )
 from src.my_utils import (
-    PowerLawAnalysis,
+    fit_power_law,
     save_table_to_markdown,
 )
+from src import (
+    figure_cache,
+    layout,
+)
+from src.profiling import profiled
+from src.graph_arrays import (
+    GraphArrays,
+    graph_arrays,
+)
+from src.node_attributes import attribute_values
+from src.triangles import triangle_statistics
+from src.path_metrics import path_statistics
+from src.null_models import (
+    degree_preserving_graph,
+    double_edge_swap,
+)
+
+
+def category_edge_counts(
+        codes: np.ndarray, k: int, src: np.ndarray, dst: np.ndarray, weights: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Directed category counts B[i, j]: (weighted) number of edges (u, v) with u in category i and v in j.
+    :param codes: integer category code per node (-1 for missing values, whose edges are ignored)
+    :param k: number of categories
+    :param src: source node index of every edge
+    :param dst: target node index of every edge
+    :param weights: edge weights (None counts edges)
+    :return: k x k matrix
+    """
+    u_codes = codes[src]
+    v_codes = codes[dst]
+    valid = (u_codes >= 0) & (v_codes >= 0)
+    weights = weights[valid] if weights is not None else None
+    counts = np.bincount(u_codes[valid] * k + v_codes[valid], weights=weights, minlength=k * k)
+    return counts.reshape(k, k).astype(float)
+
+
+def assortativity_from_counts(counts: np.ndarray) -> float:
+    """
+    Newman's assortativity coefficient of a directed category count matrix of an undirected graph.
+    :param counts: matrix as returned by `category_edge_counts`
+    :return: assortativity coefficient (NaN if the matrix is empty)
+    """
+    joint = counts + counts.T
+    total = joint.sum()
+    if total == 0:
+        return np.nan
+    joint = joint / total
+    expected = joint.sum(axis=1) @ joint.sum(axis=0)
+    return (np.trace(joint) - expected) / (1 - expected)
+
+
+def neighbor_similarity(
+        arrays: GraphArrays, indices: np.ndarray, metric: Literal['jaccard', 'cosine'] = 'jaccard'
+) -> np.ndarray:
+    """
+    Pairwise neighborhood similarity of a node subset from its k adjacency rows only: Jaccard index of the
+    neighbor sets or cosine similarity of the (weighted) adjacency rows.
+    :param arrays: array representation of the graph (weighted for a weighted cosine)
+    :param indices: integer node indices of the subset
+    :param metric: 'jaccard' or 'cosine'
+    :return: k x k similarity matrix (0 where a node has no neighbors)
+    """
+    rows = arrays.adjacency[indices]
+    if metric == 'jaccard':
+        rows = (rows != 0).astype(np.float64)
+        overlap = (rows @ rows.T).toarray()
+        sizes = np.asarray(rows.sum(axis=1)).ravel()
+        total = sizes[:, None] + sizes[None, :] - overlap
+    else:
+        overlap = (rows @ rows.T).toarray()
+        norms = np.sqrt(np.asarray(rows.multiply(rows).sum(axis=1)).ravel())
+        total = np.outer(norms, norms)
+    return np.divide(overlap, total, out=np.zeros_like(overlap), where=total > 0)
+
+
+def top_node_matrix(
+        graph: nx.Graph,
+        nodes: List[str],
+        measure: Literal['weight', 'jaccard', 'cosine'] = 'weight',
+        weight: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Matrix between a subset of nodes (e.g. the top-k by a centrality) extracted from the sparse adjacency with
+    integer index arrays, so a k x k heatmap costs O(k^2) memory regardless of the graph size.
+    :param graph: NetworkX graph object
+    :param nodes: node labels of the subset, in display order
+    :param measure: 'weight' for the edge weights between the nodes, 'jaccard' or 'cosine' for their
+        neighborhood similarity
+    :param weight: edge attribute holding the weight (None for unweighted)
+    :return: k x k DataFrame labelled by node
+    :raises ValueError: If some of the nodes do not exist in the graph
+    """
+    arrays = graph_arrays(graph, weight=weight)
+    indices = arrays.indices_of(nodes)
+    matrix = arrays.block(indices) if measure == 'weight' else neighbor_similarity(arrays, indices, measure)
+    return pd.DataFrame(matrix, index=list(nodes), columns=list(nodes))
+
+
+class AttributeMixing:
+    """
+    Edge-array based attribute mixing engine.
+
+    Every node attribute is categorically encoded once, aligned with the graph's integer node order (read
+    column-wise from the attached node attribute table when there is one), so the mixing matrix of any
+    attribute is a single bincount over the edge index arrays and the assortativity coefficient is derived
+    from that matrix instead of walking the edges again.
+
+    :param graph: NetworkX graph object
+    :param attributes: node attributes to encode
+    :param weight: edge attribute used for weighted mixing (optional)
+
+    Attributes:
+        arrays (GraphArrays): Edge index arrays of the graph
+        codes (dict): Attribute name -> integer category code per node (-1 for missing/NaN values)
+        categories (dict): Attribute name -> sorted list of attribute values
+    """
+
+    def __init__(self, graph: nx.Graph, attributes: List[str], weight: Optional[str] = None):
+        self.arrays = graph_arrays(graph, weight=weight)
+        self.codes = {}
+        self.categories = {}
+        for attribute in attributes:
+            values = attribute_values(graph, attribute, self.arrays.nodes)
+            codes, categories = pd.factorize(values, sort=True)
+            self.codes[attribute] = codes
+            self.categories[attribute] = list(categories)
+
+    def _edge_counts(self, attribute: str, weighted: bool = False) -> np.ndarray:
+        """Directed category counts B[i, j]: (weighted) number of edges (u, v) with u in i and v in j"""
+        return category_edge_counts(
+            self.codes[attribute],
+            len(self.categories[attribute]),
+            self.arrays.src,
+            self.arrays.dst,
+            self.arrays.weights if weighted else None,
+        )
+
+    def mixing_matrix(self, attribute: str, weighted: bool = False) -> np.ndarray:
+        """
+        Symmetric mixing matrix: off-diagonal cells count edges between two attribute values in both
+        positions, the diagonal counts edges within the same value once.
+        :param attribute: encoded node attribute
+        :param weighted: sum edge weights instead of counting edges
+        :return: k x k matrix ordered as `categories[attribute]`
+        """
+        counts = self._edge_counts(attribute, weighted)
+        return counts + counts.T - np.diag(np.diag(counts))
+
+    def assortativity(self, attribute: str, weighted: bool = False) -> float:
+        """
+        Attribute assortativity coefficient (Newman), identical to `nx.attribute_assortativity_coefficient`
+        on the subgraph of nodes with a known value when `weighted` is False.
+        :param attribute: encoded node attribute
+        :param weighted: weight the edges
+        :return: assortativity coefficient (NaN if there are no edges between known values)
+        """
+        return assortativity_from_counts(self._edge_counts(attribute, weighted))
+
+    def assortativity_coefficients(self, weighted: bool = False) -> Dict[str, float]:
+        """
+        Assortativity coefficients of all encoded attributes.
+        :param weighted: weight the edges
+        :return: dictionary attribute -> assortativity coefficient
+        """
+        return {attribute: self.assortativity(attribute, weighted) for attribute in self.codes}
 
 
 class NetworkStructuralAnalyser:
@@ -40,31 +211,43 @@ class NetworkStructuralAnalyser:
         models (dict): Dictionary of network generation functions
         seed (int): Random seed for reproducibility
         ws_rewire_probe (float): Rewiring probability for Watts-Strogatz model
+        swaps_per_edge (float): Successful double edge swaps per edge for degree-preserving randomization
+        path_options (dict): Keyword arguments of `path_metrics.path_statistics` used for every path length analysis
 
     Methods:
         generate_er: Generate Erdős-Rényi random graph
         generate_ba: Generate Barabási-Albert scale-free network
         generate_ws: Generate Watts-Strogatz small-world network
+        generate_cm: Generate degree-preserving configuration model graph
+        generate_dpr: Generate degree-preserving randomization (edge swaps) of the analysed graph
         analyze_degree_distribution: Analyze degree distribution properties
         analyze_clustering: Analyze clustering coefficient properties
         analyze_path_length: Analyze path length properties
         analyze_network_properties: Comprehensive network analysis
+        analyze_network_ensemble: Comparison with ensembles of random graphs, with confidence intervals
+        analyze_degree_preserving_null: Z-scores of the network against degree-preserving randomizations
     """
 
-    def __init__(self, graph: nx.Graph, ws_rewire_probe: float = 0.1):
+    def __init__(self, graph: nx.Graph, ws_rewire_probe: float = 0.1, path_options: Optional[Dict[str, Any]] = None):
         self.graph = graph
         self.models = {
             'ER': self.generate_er,
             'BA': self.generate_ba,
-            'WS': self.generate_ws
+            'WS': self.generate_ws,
+            'DPR': self.generate_dpr,
         }
         self.seed = 42
         self.ws_rewire_probe = ws_rewire_probe
+        self.swaps_per_edge = 10
+        self.path_options = path_options or {}
 
     @staticmethod
     def generate_er(n: int, avg_degree: float, seed: int = 42) -> nx.Graph:
         """Returns Erdos-Renyi graph based on number of nodes and average degree."""
         p = avg_degree / (n - 1)
+        if p < SPARSE_ER_THRESHOLD:
+            # O(n + m) generator instead of testing all O(n²) node pairs
+            return nx.fast_gnp_random_graph(n, p, seed=seed)
         return nx.erdos_renyi_graph(n, p, seed=seed)
 
     @staticmethod
@@ -94,6 +277,29 @@ class NetworkStructuralAnalyser:
             k += 1
         return nx.watts_strogatz_graph(n, k, seed=seed, p=rewire_prob)
 
+    @staticmethod
+    def generate_cm(degree_sequence: List[int], seed: int = 42) -> nx.Graph:
+        """
+        Returns configuration model graph that preserves the given degree sequence (up to removed multi-edges
+        and self-loops).
+        :param degree_sequence: Degree of every node
+        :param seed: Random seed for reproducibility (default: 42)
+        :return: NetworkX simple graph
+        """
+        G = nx.Graph(nx.configuration_model(degree_sequence, seed=seed))
+        G.remove_edges_from(nx.selfloop_edges(G))
+        return G
+
+    def generate_dpr(self, n: int = None, avg_degree: float = None, seed: int = 42) -> nx.Graph:
+        """
+        Returns degree-preserving randomization of the analysed graph obtained by double edge swaps.
+        :param n: Number of nodes (implied by the analysed graph, kept for compatibility with other generators)
+        :param avg_degree: Average degree (implied by the analysed graph, kept for compatibility)
+        :param seed: Random seed for reproducibility (default: 42)
+        :return: NetworkX graph with the same nodes and degree sequence as the analysed graph
+        """
+        return degree_preserving_graph(self.graph, swaps_per_edge=self.swaps_per_edge, seed=seed)
+
     @staticmethod
     def analyze_degree_distribution(graph: nx.Graph) -> Dict[str, float]:
         """
@@ -101,7 +307,7 @@ class NetworkStructuralAnalyser:
 
         :param graph: NetworkX graph object to analyze
         :return: Dictionary containing alpha (power law exponent), x_min (minimum x value),
-                degree_dist (degree distribution), and mean_degree
+                ks_statistic of the fit, degree_dist (degree distribution), and mean_degree
         """
         degrees = [d for n, d in graph.degree()]
         degree_counts = Counter(degrees)
@@ -109,13 +315,13 @@ class NetworkStructuralAnalyser:
         degree_dist = {k: v / total_nodes for k, v in degree_counts.items()}
         mean_degree = sum(degrees) / total_nodes
 
-        # Estimate power law parameters
-        power_law_analyzer = PowerLawAnalysis(graph)
-        alpha, x_min = power_law_analyzer.mle_power_law_params()
+        # Estimate power law parameters (shared with PowerLawAnalysis of the same degree sequence)
+        power_law_fit = fit_power_law(degrees)
 
         return {
-            'alpha': alpha,
-            'x_min': x_min,
+            'alpha': power_law_fit['alpha'],
+            'x_min': power_law_fit['x_min'],
+            'ks_statistic': power_law_fit['ks_statistic'],
             'degree_dist': degree_dist,
             'mean_degree': mean_degree,
         }
@@ -129,19 +335,22 @@ class NetworkStructuralAnalyser:
         :return: Dictionary containing average clustering coefficient, global clustering coefficient,
                 and node-wise clustering distribution
         """
+        triangles = triangle_statistics(graph)
         return {
-            'avg_clustering': nx.average_clustering(graph),
-            'global_clustering': nx.transitivity(graph),
-            'clustering_distribution': dict(nx.clustering(graph)),
+            'avg_clustering': triangles.average_clustering,
+            'global_clustering': triangles.transitivity,
+            'clustering_distribution': triangles.clustering_dict(),
         }
 
     @staticmethod
-    def analyze_path_length(graph: nx.Graph) -> Dict[str, float]:
+    def analyze_path_length(graph: nx.Graph, **path_options) -> Dict[str, float]:
         """
         Analyze path length properties of the largest connected component.
 
         :param graph: NetworkX graph object to analyze
-        :return: Dictionary containing average path length, diameter, and radius of the network
+        :param path_options: keyword arguments of `path_metrics.path_statistics` (exact metrics by default)
+        :return: Dictionary containing average path length, diameter, and radius of the network, with the
+                 confidence interval of the average and the bounds of diameter and radius
         """
         components = list(nx.connected_components(graph))
         if not components:
@@ -153,15 +362,14 @@ class NetworkStructuralAnalyser:
                 'component_size_ratio': 0
             }
 
-        largest_cc = max(components, key=len)
-        largest_subgraph = graph.subgraph(largest_cc)
-
-        # Calculate component size ratio
-
+        paths = path_statistics(graph, **path_options)
         return {
-            'avg_path_length': nx.average_shortest_path_length(largest_subgraph),
-            'diameter': nx.diameter(largest_subgraph),
-            'radius': nx.radius(largest_subgraph),
+            'avg_path_length': paths['avg_path_length'],
+            'diameter': paths['diameter'],
+            'radius': paths['radius'],
+            'avg_path_length_ci': paths['avg_path_length_ci'],
+            'diameter_bounds': paths['diameter_bounds'],
+            'radius_bounds': paths['radius_bounds'],
         }
 
     @staticmethod
@@ -174,6 +382,8 @@ class NetworkStructuralAnalyser:
         :param ax: Matplotlib axes object to plot on (optional)
         :return: Matplotlib axes object with the plot
         """
+        import matplotlib.pyplot as plt
+
         if ax is None:
             fig, ax = plt.subplots()
 
@@ -198,6 +408,22 @@ class NetworkStructuralAnalyser:
         :param model_graphs_properties: Dictionary of model networks properties
         :return: None
         """
+        import matplotlib.pyplot as plt
+
+        filename = FIGURES_DIR / 'random_networks_comparison.png'
+        key = figure_cache.data_hash(
+            {
+                name: {
+                    'degrees': sorted(d for _, d in props['graph'].degree()),
+                    'avg_clustering': props['clustering']['avg_clustering'],
+                    'avg_path_length': props['path_length']['avg_path_length'],
+                }
+                for name, props in {'Original': original_properties, **model_graphs_properties}.items()
+            }
+        )
+        if figure_cache.is_cached(filename, key):
+            return
+
         fig = plt.figure(figsize=(15, 12))
 
         # 1. Degree distribution
@@ -233,7 +459,7 @@ class NetworkStructuralAnalyser:
             ax3.set_title('Average Path Length')
             plt.setp(ax3.xaxis.get_majorticklabels(), rotation=45)
 
-        plt.savefig(FIGURES_DIR / 'random_networks_comparison.png', dpi=300, bbox_inches='tight')
+        figure_cache.save_figure(filename, key, dpi=300, bbox_inches='tight')
 
     def _preprocess_network(graph: nx.Graph) -> nx.Graph:
         """Ensure network has consecutive integer node labels"""
@@ -248,22 +474,33 @@ class NetworkStructuralAnalyser:
         :param comparison: Pandas DataFrame containing comparison of network properties
         :return: None
         """
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
+        filename = FIGURES_DIR / 'random_networks_summary.png'
+        key = figure_cache.data_hash(comparison)
+        if figure_cache.is_cached(filename, key):
+            return
+
         fig = plt.figure(figsize=(15, 10))
         ax1 = fig.add_subplot(222)
         sns.heatmap(comparison.T, annot=True, cmap='YlOrRd', fmt='.3f', ax=ax1)
         ax1.set_title('Network Properties Comparison')
         plt.tight_layout()
-        plt.savefig(FIGURES_DIR / 'random_networks_summary.png', dpi=300, bbox_inches='tight')
+        figure_cache.save_figure(filename, key, dpi=300, bbox_inches='tight')
         plt.show()
 
+    @profiled
     def plot_random_networks(self):
         """
-        Plot examples of different random network models using spring layout.
+        Plot examples of different random network models using a seeded ForceAtlas2 layout.
 
         :param n: Number of nodes in each network (default: 100)
         :param avg_degree: Average degree for the networks (default: 4)
         :return: None
         """
+        import matplotlib.pyplot as plt
+
         fig, axes = plt.subplots(1, 3, figsize=(15, 5))
 
         n = self.graph.number_of_nodes()
@@ -272,7 +509,7 @@ class NetworkStructuralAnalyser:
 
         # Generate and plot ER network
         G_er = self.generate_er(n, avg_degree)
-        pos_er = nx.spring_layout(G_er)
+        pos_er = layout.graph_layout(G_er, path=None)
         axes[0].set_title('Erdős-Rényi (ER)')
         nx.draw(G_er, pos_er, ax=axes[0],
                 with_labels=False,
@@ -283,7 +520,7 @@ class NetworkStructuralAnalyser:
 
         # Generate and plot BA network
         G_ba = self.generate_ba(n, avg_degree)
-        pos_ba = nx.spring_layout(G_ba)
+        pos_ba = layout.graph_layout(G_ba, path=None)
         axes[1].set_title('Barabási-Albert (BA)')
         nx.draw(G_ba, pos_ba, ax=axes[1],
                 with_labels=False,
@@ -294,7 +531,7 @@ class NetworkStructuralAnalyser:
 
         # Generate and plot WS network
         G_ws = self.generate_ws(n, avg_degree, rewire_prob=self.ws_rewire_probe)
-        pos_ws = nx.spring_layout(G_ws)
+        pos_ws = layout.graph_layout(G_ws, path=None)
         axes[2].set_title('Watts-Strogatz (WS)')
         nx.draw(G_ws, pos_ws, ax=axes[2],
                 with_labels=False,
@@ -308,50 +545,47 @@ class NetworkStructuralAnalyser:
         plt.show()
 
     @staticmethod
+    @profiled
     def plot_attribute_mixing(
-            graph: nx.Graph, attribute: str, figsize: Tuple[int, int] = (20, 20)
-    ):
+            graph: nx.Graph,
+            attribute: str,
+            figsize: Tuple[int, int] = (20, 20),
+            mixing: Optional[AttributeMixing] = None,
+            weighted: bool = False,
+    ) -> float:
         """
         Calculate attribute assortativity and visualize mixing patterns through a heatmap.
 
         :param graph: NetworkX graph object
         :param attribute: Node attribute to analyze mixing patterns for
         :param figsize: Tuple specifying figure dimensions (width, height)
-        :return: None. Displays and saves heatmap visualization
+        :param mixing: AttributeMixing engine with `attribute` already encoded, shared between calls (optional)
+        :param weighted: Weight the mixing matrix by `total_co_occurance` instead of counting edges
+        :return: assortativity coefficient. Displays and saves heatmap visualization
 
         The function:
-        - Removes nodes with NaN values for the specified attribute
+        - Ignores nodes with NaN values for the specified attribute
         - Creates a mixing matrix showing frequency of connections between attribute values
         - Calculates the assortativity coefficient
         - Plots a bottom triangle heatmap of the mixing matrix
         - Saves the plot directly to figures directory
         """
-        # Create a subgraph without NaN nodes
-        non_nan_nodes = [
-            (n, d) for n, d in graph.nodes(data=True)
-            if attribute in d and not (isinstance(d[attribute], float) and np.isnan(d[attribute]))
-        ]
-
-        G_clean = graph.subgraph([n for n, _ in non_nan_nodes])
-
-        # Get unique attribute values
-        attr_values = sorted(set(d[attribute] for _, d in non_nan_nodes))
-        # Create mapping for attributes to indices
-        attr_to_idx = {attr: idx for idx, attr in enumerate(attr_values)}
-        # Calculate mixing matrix manually to ensure correct order
-        n = len(attr_values)
-        mixing_matrix = np.zeros((n, n))
-
-        for u, v in G_clean.edges():
-            u_attr = G_clean.nodes[u][attribute]
-            v_attr = G_clean.nodes[v][attribute]
-            i, j = attr_to_idx[u_attr], attr_to_idx[v_attr]
-            mixing_matrix[i, j] += 1
-            if i != j:  # Add to symmetric position if different attributes
-                mixing_matrix[j, i] += 1
-
-        # Calculate assortativity coefficient
-        assort_coef = nx.attribute_assortativity_coefficient(G_clean, attribute)
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
+        if mixing is None or attribute not in mixing.codes:
+            mixing = AttributeMixing(graph, [attribute], weight='total_co_occurance' if weighted else None)
+
+        attr_values = mixing.categories[attribute]
+        mixing_matrix = mixing.mixing_matrix(attribute, weighted=weighted)
+        assort_coef = mixing.assortativity(attribute, weighted=weighted)
+        logger.info(f"'{attribute}' assortativity coefficient: {assort_coef:.3f}")
+
+        filename = FIGURES_DIR / f'heatmap_assortativity_mixing_{attribute}.png'
+        key = figure_cache.data_hash(mixing_matrix, attr_values, attribute=attribute, figsize=figsize)
+        if figure_cache.is_cached(filename, key):
+            return assort_coef
+
         mask = np.triu(np.ones_like(mixing_matrix), k=1)
         plt.figure(figsize=figsize)
 
@@ -383,10 +617,12 @@ class NetworkStructuralAnalyser:
         plt.xlabel(f'{attribute}', fontsize=20)
         plt.ylabel(f'{attribute}',fontsize=20)
         plt.tight_layout()
-        plt.savefig(FIGURES_DIR / f'heatmap_assortativity_mixing_{attribute}.png', dpi=300, bbox_inches='tight')
+        figure_cache.save_figure(filename, key, dpi=300, bbox_inches='tight')
         plt.show()
+        return assort_coef
 
     @staticmethod
+    @profiled
     def plot_node_similarity_matrix(
             graph: nx.Graph,
             top_nodes: List[str] = None,
@@ -394,7 +630,8 @@ class NetworkStructuralAnalyser:
             figsize: Tuple[int, int] = (10, 8),
             cmap: str = 'Blues',
             show_labels: bool = True,
-            weight_attr: str = None  # New parameter for weight attribute
+            weight_attr: str = None,  # New parameter for weight attribute
+            figures_dir: Path = FIGURES_DIR,
     ):
         """
         Creates and plots a node similarity matrix for a given graph, showing how similar nodes are to each other based on their neighbors.
@@ -414,70 +651,27 @@ class NetworkStructuralAnalyser:
         :type show_labels: bool
         :param weight_attr: Name of the edge attribute containing weights (None for unweighted graphs)
         :type weight_attr: str, optional
+        :param figures_dir: Directory the heatmap is saved to
+        :type figures_dir: Path
         :return: Matrix containing pairwise similarity scores between nodes
         :rtype: numpy.ndarray
         """
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
         assert similarity_metric in ['jaccard', 'cosine'], "provided similarity_metric isn't implemented"
 
-        # Initialize similarity matrix
-        n_nodes = len(graph.nodes())
-        similarity_matrix = np.zeros((n_nodes, n_nodes))
-        nodes_list = list(graph.nodes())
+        nodes_display = list(graph.nodes()) if top_nodes is None else top_nodes
+        similarity_matrix_display = top_node_matrix(
+            graph, nodes_display, measure=similarity_metric, weight=weight_attr
+        ).to_numpy()
 
-        def get_neighbor_weights(node):
-            """Helper function to get neighbors and their weights"""
-            if weight_attr is None:
-                # Unweighted case: return dict with all weights = 1
-                return {neighbor: 1 for neighbor in graph.neighbors(node)}
-            else:
-                # Weighted case: return dict with actual weights
-                return {neighbor: graph[node][neighbor][weight_attr] for neighbor in graph.neighbors(node)}
-
-        # Calculate similarities
-        for i, node1 in enumerate(nodes_list):
-            for j, node2 in enumerate(nodes_list):
-                neighbors1 = get_neighbor_weights(node1)
-                neighbors2 = get_neighbor_weights(node2)
-
-                if similarity_metric == 'jaccard':
-                    neighbors1 = set(graph.neighbors(node1))
-                    neighbors2 = set(graph.neighbors(node2))
-                    if len(neighbors1.union(neighbors2)) == 0:
-                        similarity = 0
-                    else:
-                        similarity = len(neighbors1.intersection(neighbors2)) / len(neighbors1.union(neighbors2))
-
-                elif similarity_metric == 'cosine':
-                    # For weighted cosine, use weights as vector components
-                    if not neighbors1 or not neighbors2:
-                        similarity = 0
-                    else:
-                        # Calculate dot product
-                        dot_product = sum(
-                            neighbors1.get(n, 0) * neighbors2.get(n, 0)
-                            for n in set(neighbors1.keys()).intersection(set(neighbors2.keys()))
-                        )
-                        # Calculate magnitudes
-                        mag1 = np.sqrt(sum(w * w for w in neighbors1.values()))
-                        mag2 = np.sqrt(sum(w * w for w in neighbors2.values()))
-                        similarity = dot_product / (mag1 * mag2) if mag1 * mag2 != 0 else 0
-
-                similarity_matrix[i][j] = similarity
-
-        # If top_nodes is specified, select those specific nodes
-        if top_nodes is not None:
-            # Verify all requested nodes exist in the graph
-            if not all(node in nodes_list for node in top_nodes):
-                raise ValueError("Some specified nodes do not exist in the graph")
-
-            # Get indices of specified nodes
-            top_indices = [nodes_list.index(node) for node in top_nodes]
-            # Select submatrix of specified nodes
-            similarity_matrix_display = similarity_matrix[top_indices][:, top_indices]
-            nodes_display = top_nodes
-        else:
-            similarity_matrix_display = similarity_matrix
-            nodes_display = nodes_list
+        filename = figures_dir / f'heatmap_nodes_structural_similarity_{similarity_metric}.png'
+        key = figure_cache.data_hash(
+            similarity_matrix_display, list(nodes_display), figsize=figsize, cmap=cmap, show_labels=show_labels
+        )
+        if figure_cache.is_cached(filename, key):
+            return similarity_matrix_display
 
         # Plot
         plt.figure(figsize=figsize)
@@ -490,12 +684,175 @@ class NetworkStructuralAnalyser:
 
         plt.title(f'Node Similarity Matrix (sim metric: {similarity_metric})')
         plt.tight_layout()
-        plt.savefig(
-            FIGURES_DIR / f'heatmap_nodes_structural_similarity_{similarity_metric}.png',
-            dpi=300, bbox_inches='tight'
-        )
+        figure_cache.save_figure(filename, key, dpi=300, bbox_inches='tight')
         plt.show()
+        return similarity_matrix_display
+
+    @profiled
+    def analyze_network_ensemble(
+            self,
+            n_instances: int = 20,
+            n_jobs: Optional[int] = None,
+            confidence: float = 0.95,
+            path_length: bool = True,
+            save_table: bool = True,
+    ) -> pd.DataFrame:
+        """
+        Compare the network with ensembles of random graphs: `n_instances` graphs per model (ER, BA, WS and the
+        degree-preserving configuration model CM and edge-swap randomization DPR) are generated and summarized across a process pool. Only the
+        per-instance summary statistics travel back and are streamed into running means/variances, so no graph
+        is kept in memory.
+
+        :param n_instances: Number of random graphs per model
+        :param n_jobs: Number of worker processes (default: number of CPUs; 1 runs in-process)
+        :param confidence: Confidence level of the intervals around the ensemble means
+        :param path_length: Whether to compute the average path length of every instance (exact or sampled, as
+                            set by `path_options`)
+        :param save_table: Whether to save the summary as a markdown table to figures directory
+        :return: Pandas DataFrame indexed by (model, metric) with ensemble mean, std, confidence interval,
+                 number of instances and the value of the original network
+        """
+        from scipy import stats
 
+        G_original = self.graph
+        n = G_original.number_of_nodes()
+        avg_degree = 2 * G_original.number_of_edges() / n
+        degree_sequence = [d for _, d in G_original.degree()]
+
+        original = _summarize_graph(
+            G_original, degree_sequence, path_length=path_length, path_options=self.path_options
+        )
+        original['KS statistic'] = None
+
+        arrays = graph_arrays(G_original)
+        tasks = [(model, self.seed + i) for model in ENSEMBLE_MODELS for i in range(n_instances)]
+        worker = partial(
+            _null_model_summary,
+            n=n,
+            avg_degree=avg_degree,
+            degree_sequence=degree_sequence,
+            rewire_prob=self.ws_rewire_probe,
+            edges=(arrays.src, arrays.dst),
+            swaps_per_edge=self.swaps_per_edge,
+            path_length=path_length,
+            path_options=self.path_options,
+        )
+
+        running = {model: {} for model in ENSEMBLE_MODELS}
+        if n_jobs == 1:
+            summaries = map(worker, tasks)
+        else:
+            executor = ProcessPoolExecutor(max_workers=n_jobs)
+            summaries = executor.map(worker, tasks, chunksize=max(1, len(tasks) // (4 * (n_jobs or 4))))
+        try:
+            for (model, _), summary in zip(tasks, summaries):
+                for metric, value in summary.items():
+                    running[model].setdefault(metric, _RunningStats()).add(value)
+        finally:
+            if n_jobs != 1:
+                executor.shutdown()
+
+        rows = []
+        for model, metrics in running.items():
+            for metric, acc in metrics.items():
+                # Student-t interval around the ensemble mean (NaN for fewer than 2 instances)
+                t_quantile = stats.t.ppf((1 + confidence) / 2, acc.count - 1) if acc.count > 1 else np.nan
+                half_width = t_quantile * acc.std / np.sqrt(acc.count) if acc.count else np.nan
+                rows.append({
+                    'model': model,
+                    'metric': metric,
+                    'mean': acc.mean,
+                    'std': acc.std,
+                    'ci_low': acc.mean - half_width,
+                    'ci_high': acc.mean + half_width,
+                    'n': acc.count,
+                    'original': original.get(metric),
+                })
+        ensemble_summary = pd.DataFrame(rows).set_index(['model', 'metric'])
+
+        if save_table:
+            save_table_to_markdown(
+                df=ensemble_summary.round(4).reset_index(),
+                filename=FIGURES_DIR / 'table_null_model_ensemble.md',
+                table_title=f"Random Graph Ensembles ({n_instances} instances per model, {confidence:.0%} CI)",
+            )
+
+        return ensemble_summary
+
+    @profiled
+    def analyze_degree_preserving_null(
+            self,
+            n_replicates: int = 100,
+            attributes: Optional[List[str]] = None,
+            n_jobs: Optional[int] = None,
+            save_table: bool = True,
+    ) -> pd.DataFrame:
+        """
+        Compare clustering, assortativity and clique counts of the network with degree-preserving randomizations
+        (double edge swaps), which keep every node's degree and attributes and only randomize the wiring.
+        Replicates are generated across a process pool and only their statistics are kept.
+
+        :param n_replicates: Number of randomized replicates
+        :param attributes: Node attributes whose assortativity should be tested (optional)
+        :param n_jobs: Number of worker processes (default: number of CPUs; 1 runs in-process)
+        :param save_table: Whether to save the result as a markdown table to figures directory
+        :return: Pandas DataFrame indexed by metric with the original value, the null mean and std and the z-score
+        """
+        arrays = graph_arrays(self.graph)
+        attribute_codes = {}
+        for attribute in attributes or []:
+            values = attribute_values(self.graph, attribute, arrays.nodes)
+            codes, categories = pd.factorize(values, sort=True)
+            attribute_codes[attribute] = (codes, len(categories))
+
+        original = _edge_list_statistics(arrays.src, arrays.dst, arrays.n, attribute_codes)
+        worker = partial(
+            _edge_swap_replicate_statistics,
+            src=arrays.src,
+            dst=arrays.dst,
+            n_nodes=arrays.n,
+            n_swaps=int(self.swaps_per_edge * arrays.m),
+            attribute_codes=attribute_codes,
+        )
+        seeds = [self.seed + i for i in range(n_replicates)]
+
+        running = {}
+        if n_jobs == 1:
+            replicates = map(worker, seeds)
+        else:
+            executor = ProcessPoolExecutor(max_workers=n_jobs)
+            replicates = executor.map(worker, seeds, chunksize=max(1, n_replicates // (4 * (n_jobs or 4))))
+        try:
+            for replicate in replicates:
+                for metric, value in replicate.items():
+                    running.setdefault(metric, _RunningStats()).add(value)
+        finally:
+            if n_jobs != 1:
+                executor.shutdown()
+
+        zscores = pd.DataFrame(
+            [
+                {
+                    'metric': metric,
+                    'original': original[metric],
+                    'null_mean': acc.mean,
+                    'null_std': acc.std,
+                    'z_score': (original[metric] - acc.mean) / acc.std if acc.std > 0 else np.nan,
+                }
+                for metric, acc in running.items()
+            ]
+        ).set_index('metric')
+
+        if save_table:
+            save_table_to_markdown(
+                df=zscores.round(4).reset_index(),
+                filename=FIGURES_DIR / 'table_degree_preserving_zscores.md',
+                table_title=f"Z-scores against {n_replicates} Degree-Preserving Randomizations",
+            )
+
+        return zscores
+
+    @profiled
     def analyze_network_properties(self, plot=True):
         """
         Perform comprehensive network analysis and comparison with random models.
@@ -504,6 +861,8 @@ class NetworkStructuralAnalyser:
         :param plot: Whether to generate visualization plots (default: True)
         :return: Pandas DataFrame containing comparison summary of network properties
         """
+        from scipy import stats
+
         # Load and preprocess network
         G_original = self.graph
 
@@ -517,7 +876,7 @@ class NetworkStructuralAnalyser:
             'graph': G_original,
             'degree_dist': self.analyze_degree_distribution(G_original),
             'clustering': self.analyze_clustering(G_original),
-            'path_length': self.analyze_path_length(G_original)
+            'path_length': self.analyze_path_length(G_original, **self.path_options)
         }
 
         # Generate and analyze random models
@@ -531,7 +890,7 @@ class NetworkStructuralAnalyser:
                 'graph': G_model,
                 'degree_dist': self.analyze_degree_distribution(G_model),
                 'clustering': self.analyze_clustering(G_model),
-                'path_length': self.analyze_path_length(G_model)
+                'path_length': self.analyze_path_length(G_model, **self.path_options)
             }
 
         # Create comparison summary
@@ -573,41 +932,370 @@ class NetworkStructuralAnalyser:
         return comparison_summary
 
 
-def get_centrality(nodes_data: pd.DataFrame, column_name: str, centrality_name: str):
-    data = (
-        nodes_data
-        .sort_values(by=column_name, ascending=False)
-        .drop(columns=['norm_name', 'affiliation_second', 'pov_words_per_book_with_pov'])
-        .reset_index(drop=True)
-        .head(15)
-    )
-    mean_value = nodes_data[column_name].mean()
-    percentile_90 = nodes_data[column_name].quantile(0.90)
+# Below this edge probability ER graphs are generated with the sparse O(n + m) generator
+SPARSE_ER_THRESHOLD = 0.1
+ENSEMBLE_MODELS = ('ER', 'BA', 'WS', 'CM', 'DPR')
+
+
+class _RunningStats:
+    """Welford accumulator of mean and variance, missing values (None/NaN) are skipped"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = np.nan
+        self._m2 = 0.0
+
+    def add(self, value):
+        if value is None or np.isnan(value):
+            return
+        self.count += 1
+        if self.count == 1:
+            self.mean = float(value)
+            return
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def std(self) -> float:
+        return np.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else np.nan
+
+
+def _summarize_graph(
+        graph: nx.Graph,
+        original_degrees: List[int],
+        path_length: bool = True,
+        path_options: Optional[Dict[str, Any]] = None,
+) -> Dict[str, float]:
+    """Scalar summary statistics of a graph, compared against the degree sequence of the original network"""
+    from scipy import stats
+
+    degree_props = NetworkStructuralAnalyser.analyze_degree_distribution(graph)
+    clustering = NetworkStructuralAnalyser.analyze_clustering(graph)
+    summary = {
+        'Avg Degree': degree_props['mean_degree'],
+        'Power Law α': degree_props['alpha'],
+        'Avg Clustering': clustering['avg_clustering'],
+        'Global Clustering': clustering['global_clustering'],
+        'KS statistic': stats.ks_2samp(original_degrees, [d for _, d in graph.degree()]).statistic,
+    }
+    if path_length:
+        summary['Avg Path Length'] = NetworkStructuralAnalyser.analyze_path_length(
+            graph, **(path_options or {})
+        )['avg_path_length']
+    return summary
+
+
+def _null_model_summary(
+        task: Tuple[str, int],
+        n: int,
+        avg_degree: float,
+        degree_sequence: List[int],
+        rewire_prob: float,
+        edges: Tuple[np.ndarray, np.ndarray],
+        swaps_per_edge: float = 10,
+        path_length: bool = True,
+        path_options: Optional[Dict[str, Any]] = None,
+) -> Dict[str, float]:
+    """
+    Generate one random graph and return its summary statistics (runs in a worker process).
+    :param task: tuple (model name, seed)
+    :param n: Number of nodes
+    :param avg_degree: Average degree of the original network
+    :param degree_sequence: Degree sequence of the original network
+    :param rewire_prob: Rewiring probability for Watts-Strogatz model
+    :param edges: Edge index arrays (src, dst) of the original network, used for edge swaps
+    :param swaps_per_edge: Successful double edge swaps per edge for degree-preserving randomization
+    :param path_length: Whether to compute the average path length
+    :param path_options: keyword arguments of `path_metrics.path_statistics`
+    :return: dictionary metric -> value
+    """
+    model, seed = task
+    if model == 'DPR':
+        src, dst = edges
+        src, dst, _ = double_edge_swap(src, dst, n, n_swaps=int(swaps_per_edge * len(src)), seed=seed)
+        G_model = nx.Graph()
+        G_model.add_nodes_from(range(n))
+        G_model.add_edges_from(zip(src.tolist(), dst.tolist()))
+    elif model == 'CM':
+        G_model = NetworkStructuralAnalyser.generate_cm(degree_sequence, seed=seed)
+    elif model == 'WS':
+        G_model = NetworkStructuralAnalyser.generate_ws(n, avg_degree, seed=seed, rewire_prob=rewire_prob)
+    elif model == 'ER':
+        G_model = NetworkStructuralAnalyser.generate_er(n, avg_degree, seed=seed)
+    else:
+        G_model = NetworkStructuralAnalyser.generate_ba(n, avg_degree, seed=seed)
+    return _summarize_graph(G_model, degree_sequence, path_length=path_length, path_options=path_options)
+
+
+def _edge_list_statistics(
+        src: np.ndarray, dst: np.ndarray, n_nodes: int, attribute_codes: Dict[str, Tuple[np.ndarray, int]]
+) -> Dict[str, float]:
+    """Clustering, assortativity and clique statistics of a graph given by its edge index arrays"""
+    G = nx.Graph()
+    G.add_nodes_from(range(n_nodes))
+    G.add_edges_from(zip(src.tolist(), dst.tolist()))
+    clique_sizes = [len(clique) for clique in nx.find_cliques(G)]
+    triangles = triangle_statistics(G)
+    statistics = {
+        'Avg Clustering': triangles.average_clustering,
+        'Global Clustering': triangles.transitivity,
+        'Degree Assortativity': nx.degree_assortativity_coefficient(G),
+        'Triangles': float(triangles.total_triangles),
+        'Maximal Cliques': len(clique_sizes),
+        'Maximal Cliques (size >= 4)': sum(size >= 4 for size in clique_sizes),
+        'Max Clique Size': max(clique_sizes, default=0),
+    }
+    for attribute, (codes, k) in attribute_codes.items():
+        statistics[f'{attribute} Assortativity'] = assortativity_from_counts(
+            category_edge_counts(codes, k, src, dst)
+        )
+    return statistics
+
+
+def _edge_swap_replicate_statistics(
+        seed: int,
+        src: np.ndarray,
+        dst: np.ndarray,
+        n_nodes: int,
+        n_swaps: int,
+        attribute_codes: Dict[str, Tuple[np.ndarray, int]],
+) -> Dict[str, float]:
+    """Randomize the edge arrays by double edge swaps and return the replicate's statistics (worker process)"""
+    src, dst, _ = double_edge_swap(src, dst, n_nodes, n_swaps=n_swaps, seed=seed)
+    return _edge_list_statistics(src, dst, n_nodes, attribute_codes)
+
+
+# Reported name of every ranked column of the processed nodes data
+CENTRALITY_COLUMNS: Dict[str, str] = {
+    'pov': 'total_words_count',
+    'degree': 'degree',
+    'closeness': 'closeness',
+    'betweenness': 'betweenness',
+    'eigenvector': 'eigenvector',
+    'pagerank': 'pagerank',
+}
+
+
+def rank_top_k(nodes_data: pd.DataFrame, columns: List[str], k: int = 15) -> Tuple[Dict[str, np.ndarray], pd.DataFrame]:
+    """
+    Top-k rows of several metric columns and their mean and 90th percentile in one vectorized pass: a single
+    `argpartition` over the value matrix finds the k-th largest value of every column, and only the rows at or
+    above it are sorted (largest first, ties in row order).
+    :param nodes_data: processed nodes data
+    :param columns: metric columns to rank
+    :param k: number of top rows per column
+    :return: tuple (row positions of the top-k rows of every column, DataFrame indexed by column with
+        `mean` and `percentile_90`; NaN values are ignored)
+    """
+    values = nodes_data[list(columns)].to_numpy(dtype=np.float64)
+    ranked = np.where(np.isnan(values), -np.inf, values)
+    k = min(k, len(values))
+    if k == 0:
+        return {column: np.array([], dtype=np.int64) for column in columns}, pd.DataFrame(
+            {'mean': np.nan, 'percentile_90': np.nan}, index=pd.Index(columns)
+        )
 
-    save_table_to_markdown(
-        df=data,
-        filename=FIGURES_DIR / f'table_top_{centrality_name}_centrality.md'
-    )
+    kth = -np.partition(-ranked, k - 1, axis=0)[k - 1]
+    top = {}
+    for j, column in enumerate(columns):
+        candidates = np.flatnonzero(ranked[:, j] >= kth[j])
+        order = np.lexsort((candidates, -ranked[candidates, j]))
+        top[column] = candidates[order[:k]]
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN columns
+        stats = pd.DataFrame(
+            {'mean': np.nanmean(values, axis=0), 'percentile_90': np.nanquantile(values, 0.90, axis=0)},
+            index=pd.Index(columns),
+        )
+    return top, stats
+
+
+def _render_top_k_bar_plot(task: Tuple[Path, pd.DataFrame, str, float, float]) -> Path:
+    """Render one top-k bar plot (module-level so it can run in a worker process)"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    filename, data, column_name, mean_value, percentile_90 = task
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.barplot(data=data, x='id', y=column_name, ax=ax)
+    ax.tick_params(axis='x', labelrotation=45)
+    ax.axhline(y=mean_value, color='r', linestyle='--', label=f'Mean: {mean_value:.3f}')
+    ax.axhline(y=percentile_90, color='g', linestyle='--', label=f'90th percentile: {percentile_90:.3f}')
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(filename, dpi=300, bbox_inches='tight')
+    plt.close(fig)
+    return filename
+
+
+@profiled
+def save_top_k_centralities(
+        nodes_data: pd.DataFrame,
+        centralities: Dict[str, str] = CENTRALITY_COLUMNS,
+        k: int = 15,
+        figures_dir: Path = FIGURES_DIR,
+        n_jobs: Optional[int] = None,
+):
+    """
+    Save the top-k table and bar plot of every centrality at once: all rankings and quantiles come from one
+    `rank_top_k` pass, all tables are written together, and only the bar plots whose data changed are rendered,
+    across a process pool (the figure manifest is updated by this process only).
+    :param nodes_data: processed nodes data
+    :param centralities: mapping of the reported centrality name to its column, e.g. {'pov': 'total_words_count'}
+    :param k: number of top characters per centrality
+    :param figures_dir: directory of the tables and figures
+    :param n_jobs: number of worker processes (default: number of CPUs; 1 renders in-process)
+    :return: None
+    """
+    columns = list(centralities.values())
+    top, stats = rank_top_k(nodes_data, columns, k=k)
+    display = nodes_data.drop(columns=['norm_name', 'affiliation_second', 'pov_words_per_book_with_pov'])
+
+    tasks = []
+    for name, column_name in centralities.items():
+        data = display.iloc[top[column_name]].reset_index(drop=True)
+        mean_value, percentile_90 = stats.at[column_name, 'mean'], stats.at[column_name, 'percentile_90']
+        save_table_to_markdown(df=data, filename=figures_dir / f'table_top_{name}_centrality.md')
+
+        filename = figures_dir / f'bar_plot_top_{name}_centrality.png'
+        key = figure_cache.data_hash(data[['id', column_name]], mean_value, percentile_90)
+        if not figure_cache.is_cached(filename, key):
+            tasks.append(((filename, data[['id', column_name]], column_name, mean_value, percentile_90), key))
+
+    renders = [task for task, _ in tasks]
+    n_jobs = min(n_jobs or os.cpu_count() or 1, len(renders))
+    if n_jobs <= 1:
+        rendered = list(map(_render_top_k_bar_plot, renders))
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            rendered = list(executor.map(_render_top_k_bar_plot, renders))
+    for filename, (_, key) in zip(rendered, tasks):
+        figure_cache.record(filename, key)
 
-    plt.figure(figsize=(10, 6))
-    sns.barplot(data=data, x='id', y=column_name)
-    plt.xticks(rotation=45)
-    plt.axhline(y=mean_value, color='r', linestyle='--', label=f'Mean: {mean_value:.3f}')
-    plt.axhline(y=percentile_90, color='g', linestyle='--', label=f'90th percentile: {percentile_90:.3f}')
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig(FIGURES_DIR / f'bar_plot_top_{centrality_name}_centrality.png', dpi=300, bbox_inches='tight')
-    plt.show()
+
+def get_centrality(nodes_data: pd.DataFrame, column_name: str, centrality_name: str):
+    """
+    Save the top-15 table and bar plot of a single centrality (see `save_top_k_centralities` for several).
+    :param nodes_data: processed nodes data
+    :param column_name: column holding the centrality
+    :param centrality_name: name the table and figure are saved under
+    :return: None
+    """
+    save_top_k_centralities(nodes_data, {centrality_name: column_name}, figures_dir=FIGURES_DIR, n_jobs=1)
 
 
-def plot_centralities_pairplot(nodes_data: pd.DataFrame, figures_dir: Path = FIGURES_DIR):
-    sns.pairplot(nodes_data[['degree', 'closeness', 'betweenness', 'eigenvector', 'pagerank']])
-    plt.savefig(figures_dir / f'pairplot_centralities_and_pagerank.png', dpi=300, bbox_inches='tight')
+def _binned_pairplot(
+        data: pd.DataFrame, bins: int = 50, outlier_quantile: Optional[float] = 0.99, max_outliers: int = 500
+):
+    """
+    Pairplot of aggregated data: every off-diagonal panel is a 2-D histogram of the metric pair binned with numpy
+    and drawn as one image (log color scale), the diagonal shows the 1-D histograms. Rendering cost depends on
+    the number of bins, not on the number of nodes.
+    :param data: one column per metric
+    :param bins: number of bins per axis
+    :param outlier_quantile: nodes above this quantile of any metric are overlaid as points (None for none)
+    :param max_outliers: maximum number of overlaid points, the most extreme ones first
+    :return: matplotlib figure
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import LogNorm
+
+    values = data.to_numpy(dtype=np.float64)
+    values = values[~np.isnan(values).any(axis=1)]
+    columns = list(data.columns)
+    k = len(columns)
+    edges = [np.histogram_bin_edges(values[:, j], bins=bins) for j in range(k)]
+
+    outliers = np.empty((0, k))
+    if outlier_quantile is not None and len(values):
+        # how far every node lies beyond the quantile of each metric, relative to the metric's range above it
+        threshold = np.quantile(values, outlier_quantile, axis=0)
+        span = values.max(axis=0) - threshold
+        excess = np.divide(values - threshold, span, out=np.zeros_like(values), where=span > 0).max(axis=1)
+        extreme = np.flatnonzero(excess > 0)
+        extreme = extreme[np.argsort(-excess[extreme], kind='stable')[:max_outliers]]
+        outliers = values[extreme]
+
+    fig, axes = plt.subplots(k, k, figsize=(2.5 * k, 2.5 * k), squeeze=False)
+    for i in range(k):
+        for j in range(k):
+            ax = axes[i, j]
+            if i == j:
+                counts, _ = np.histogram(values[:, j], bins=edges[j])
+                ax.stairs(counts, edges[j], fill=True, alpha=0.7)
+            else:
+                counts, _, _ = np.histogram2d(values[:, j], values[:, i], bins=(edges[j], edges[i]))
+                ax.imshow(
+                    np.ma.masked_equal(counts.T, 0), origin='lower', aspect='auto', cmap='Blues',
+                    norm=LogNorm(vmin=1, vmax=max(counts.max(), 1)),
+                    extent=(edges[j][0], edges[j][-1], edges[i][0], edges[i][-1]), interpolation='nearest',
+                )
+                if len(outliers):
+                    ax.scatter(outliers[:, j], outliers[:, i], s=4, color='tab:red', alpha=0.6, linewidths=0)
+            ax.set_xlabel(columns[j] if i == k - 1 else '')
+            ax.set_ylabel(columns[i] if j == 0 else '')
+            if i != k - 1:
+                ax.tick_params(labelbottom=False)
+    fig.tight_layout()
+    return fig
+
+
+@profiled
+def plot_centralities_pairplot(
+        nodes_data: pd.DataFrame,
+        figures_dir: Path = FIGURES_DIR,
+        mode: Literal['auto', 'scatter', 'binned'] = 'auto',
+        max_points: int = 5000,
+        bins: int = 50,
+        outlier_quantile: Optional[float] = 0.99,
+):
+    """
+    Pairplot of the centralities and PageRank.
+    :param nodes_data: processed nodes data
+    :param figures_dir: directory of the figure
+    :param mode: 'scatter' for a seaborn pairplot of every node, 'binned' for 2-D histograms (see
+        `_binned_pairplot`), 'auto' for scatter up to `max_points` nodes and binned above
+    :param max_points: largest number of nodes drawn as a scatter pairplot in 'auto' mode
+    :param bins: number of bins per axis of the binned mode
+    :param outlier_quantile: quantile above which nodes are overlaid as points in the binned mode (None for none)
+    :return: None
+    """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    data = nodes_data[['degree', 'closeness', 'betweenness', 'eigenvector', 'pagerank']]
+    if mode == 'auto':
+        mode = 'scatter' if len(data) <= max_points else 'binned'
+    filename = figures_dir / 'pairplot_centralities_and_pagerank.png'
+    key = figure_cache.data_hash(data) if mode == 'scatter' else figure_cache.data_hash(
+        data, mode=mode, bins=bins, outlier_quantile=outlier_quantile
+    )
+    if figure_cache.is_cached(filename, key):
+        return
+
+    if mode == 'scatter':
+        sns.pairplot(data)
+    else:
+        _binned_pairplot(data, bins=bins, outlier_quantile=outlier_quantile)
+    figure_cache.save_figure(filename, key, dpi=300, bbox_inches='tight')
     plt.show()
 
 
+@profiled
 def plot_centralities_corr_matrix(nodes_data: pd.DataFrame, figures_dir: Path = FIGURES_DIR):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     correlation_matrix = nodes_data[['degree', 'closeness', 'betweenness', 'eigenvector', 'pagerank']].corr()
+    filename = figures_dir / 'corr_centralities_and_pagerank.png'
+    key = figure_cache.data_hash(correlation_matrix)
+    if figure_cache.is_cached(filename, key):
+        return
+
     mask = np.triu(np.ones_like(correlation_matrix, dtype=bool))
 
     # Create a heatmap
@@ -621,21 +1309,25 @@ def plot_centralities_corr_matrix(nodes_data: pd.DataFrame, figures_dir: Path =
                 center=0.5,
                 square=True)
     plt.title('Correlation Matrix of Network Metrics')
-    plt.savefig(figures_dir / f'corr_centralities_and_pagerank.png', dpi=300, bbox_inches='tight')
+    figure_cache.save_figure(filename, key, dpi=300, bbox_inches='tight')
     plt.show()
 
 
+@profiled
 def get_weights_between_top_nodes(
         nodes_data: pd.DataFrame, graph: nx.Graph, figures_dir: Path = FIGURES_DIR
 ):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     top_nodes = nodes_data.nlargest(20, 'degree')['id'].tolist()
-    # Get adjacency matrix for the whole graph and convert to dense numpy array
-    adj_matrix = nx.adjacency_matrix(graph, weight='total_co_occurance')
-    adj_matrix = adj_matrix.todense()
-    # Convert to DataFrame with all node labels
-    adj_df = pd.DataFrame(adj_matrix, index=list(graph.nodes()), columns=list(graph.nodes()))
-    # Filter for top 100 nodes
-    matrix = adj_df.loc[top_nodes, top_nodes]
+    # Slice the top nodes' block straight from the sparse adjacency
+    matrix = top_node_matrix(graph, top_nodes, measure='weight', weight='total_co_occurance')
+
+    filename = figures_dir / 'heatmap_edges_weights.png'
+    key = figure_cache.data_hash(matrix)
+    if figure_cache.is_cached(filename, key):
+        return
 
     # Create heatmap
     plt.figure(figsize=(10, 8))
@@ -651,5 +1343,5 @@ def get_weights_between_top_nodes(
     plt.title('Connection Weights between Top 20 Nodes by Degree')
 
     plt.tight_layout()
-    plt.savefig(figures_dir / f'heatmap_edges_weights.png')
+    figure_cache.save_figure(filename, key)
     plt.show()
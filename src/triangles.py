@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import weakref
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+)
+
+import numpy as np
+import networkx as nx
+
+from src.graph_arrays import (
+    GraphArrays,
+    graph_arrays,
+)
+from src.profiling import profiled
+
+if TYPE_CHECKING:
+    from scipy import sparse
+
+
+class TriangleStatistics:
+    """
+    Triangle counts of every node and the clustering measures derived from them.
+
+    Attributes:
+        nodes (list): Node labels in graph order
+        triangles (np.ndarray): Number of triangles through every node
+        degree (np.ndarray): Degree of every node, self-loops excluded
+        clustering (np.ndarray): Local clustering coefficient of every node (0 for degree < 2)
+        average_clustering (float): Mean local clustering over all nodes (as `nx.average_clustering`)
+        transitivity (float): Share of closed triads, 3 x triangles / connected triples (as `nx.transitivity`)
+        onnela (np.ndarray): Weighted local clustering of Onnela et al. (as `nx.clustering` with a weight;
+            None for unweighted statistics)
+        barrat (np.ndarray): Weighted local clustering of Barrat et al. (None for unweighted statistics)
+    """
+
+    def __init__(
+            self,
+            nodes: List[Hashable],
+            triangles: np.ndarray,
+            degree: np.ndarray,
+            onnela: Optional[np.ndarray] = None,
+            barrat: Optional[np.ndarray] = None,
+    ):
+        self.nodes = nodes
+        self.triangles = triangles
+        self.degree = degree
+        pairs = degree * (degree - 1) / 2
+        self.clustering = np.divide(triangles, pairs, out=np.zeros(len(nodes)), where=pairs > 0)
+        self.average_clustering = float(self.clustering.mean()) if len(nodes) else 0.0
+        self.transitivity = float(triangles.sum() / pairs.sum()) if triangles.sum() else 0.0
+        self.onnela = onnela
+        self.barrat = barrat
+
+    @property
+    def total_triangles(self) -> int:
+        """Number of distinct triangles of the graph"""
+        return int(self.triangles.sum() // 3)
+
+    def clustering_dict(self, values: Optional[np.ndarray] = None) -> Dict[Hashable, float]:
+        """
+        Per-node values as a dictionary, like the return value of `nx.clustering`.
+        :param values: per-node array (default: the unweighted local clustering)
+        :return: mapping node -> value
+        """
+        values = self.clustering if values is None else values
+        return dict(zip(self.nodes, values.tolist()))
+
+
+def _simple_adjacency(arrays: GraphArrays) -> sparse.csr_matrix:
+    """Symmetric weighted CSR adjacency without self-loops"""
+    adjacency = arrays.adjacency.tolil(copy=True)
+    adjacency.setdiag(0)
+    adjacency = adjacency.tocsr()
+    adjacency.eliminate_zeros()
+    return adjacency
+
+
+def count_triangles(pattern: sparse.csr_matrix) -> np.ndarray:
+    """
+    Triangles through every node of a simple undirected graph with a degree-ordered orientation: every edge
+    points from the endpoint of lower (degree, index) rank to the higher one, so the out-degrees stay small and
+    every triangle i -> j -> k appears exactly once in T = (U U) * U. Its lowest node is counted by the row sums
+    of T, its highest by the column sums, and its middle node by the row sums of (U^T U) * U.
+    :param pattern: symmetric 0/1 CSR adjacency without self-loops
+    :return: triangle count of every node
+    """
+    from scipy import sparse
+
+    degree = np.diff(pattern.indptr)
+    rank = np.empty(len(degree), dtype=np.int64)
+    rank[np.lexsort((np.arange(len(degree)), degree))] = np.arange(len(degree))
+    upper = pattern.tocoo()
+    keep = rank[upper.row] < rank[upper.col]
+    oriented = sparse.csr_matrix((upper.data[keep], (upper.row[keep], upper.col[keep])), shape=pattern.shape)
+
+    closing = (oriented @ oriented).multiply(oriented)
+    middle = (oriented.T @ oriented).multiply(oriented)
+    counts = (
+        np.asarray(closing.sum(axis=1)).ravel()
+        + np.asarray(closing.sum(axis=0)).ravel()
+        + np.asarray(middle.sum(axis=1)).ravel()
+    )
+    return np.rint(counts).astype(np.int64)
+
+
+@profiled
+def compute(graph: nx.Graph, weight: Optional[str] = None) -> TriangleStatistics:
+    """
+    Count the triangles of a graph once and derive the unweighted and (with `weight`) the weighted clustering
+    measures from sparse products over its CSR adjacency. Self-loops are ignored, as in networkx.
+    Onnela: c_i = sum_jk (w_ij w_ik w_jk)^(1/3) / (k_i (k_i - 1)) with weights scaled by the largest weight.
+    Barrat: c_i = sum_jk (w_ij + w_ik) / 2 a_ij a_ik a_jk / (s_i (k_i - 1)), s_i the strength of node i.
+    :param graph: NetworkX graph object
+    :param weight: edge attribute holding the weight (None for unweighted statistics only)
+    :return: triangle statistics
+    """
+    arrays = graph_arrays(graph, weight=weight)
+    weighted = _simple_adjacency(arrays)
+    pattern = weighted.copy()
+    pattern.data = np.ones_like(pattern.data)
+    degree = np.diff(pattern.indptr).astype(np.float64)
+    triangles = count_triangles(pattern)
+
+    onnela = barrat = None
+    if weight is not None:
+        scaled = weighted.copy()
+        max_weight = scaled.data.max() if scaled.nnz else 1.0
+        scaled.data = np.cbrt(scaled.data / max_weight)
+        cycles = np.asarray((scaled @ scaled).multiply(scaled).sum(axis=1)).ravel()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            onnela = np.where(triangles > 0, cycles / (degree * (degree - 1)), 0.0)
+            strength = np.asarray(weighted.sum(axis=1)).ravel()
+            # sum_jk (w_ij + w_ik) / 2 a_jk a_ik equals sum_jk w_ij a_jk a_ik by symmetry
+            closed_weight = np.asarray((weighted @ pattern).multiply(pattern).sum(axis=1)).ravel()
+            barrat = np.where(triangles > 0, closed_weight / (strength * (degree - 1)), 0.0)
+
+    return TriangleStatistics(arrays.nodes, triangles, degree, onnela=onnela, barrat=barrat)
+
+
+# Statistics are cached per graph object and weight, invalidated when the graph's size changes. A weighted
+# entry also answers unweighted lookups, since its triangle counts and clusterings do not depend on the weight.
+_CACHE: 'weakref.WeakKeyDictionary[nx.Graph, Dict]' = weakref.WeakKeyDictionary()
+
+
+def triangle_statistics(graph: nx.Graph, weight: Optional[str] = None) -> TriangleStatistics:
+    """
+    Return the (cached) triangle statistics of a graph, shared by the overview, the clustering histogram and
+    the structural analysis.
+    :param graph: NetworkX graph object
+    :param weight: edge attribute of the weighted variants (None for unweighted statistics only)
+    :return: TriangleStatistics instance (unweighted lookups may get one that also holds weighted variants)
+    """
+    signature = (graph.number_of_nodes(), graph.number_of_edges())
+    per_graph = _CACHE.setdefault(graph, {})
+    cached = per_graph.get(weight)
+    if weight is None and (cached is None or cached[0] != signature):
+        cached = next((entry for entry in per_graph.values() if entry[0] == signature), None)
+    if cached is None or cached[0] != signature:
+        cached = (signature, compute(graph, weight=weight))
+        per_graph[weight] = cached
+    return cached[1]
@@ -1,58 +1,66 @@
-import re
-
 import yaml
 import typer
 from pathlib import Path
 from loguru import logger
 
 from src.config import REPORTS_DIR
+from src import profiling
+from src.report_template import (
+    ReportTemplate,
+    markdown_to_html,
+)
 # from config import REPORTS_DIR
 
 app = typer.Typer()
 
 
 @app.command()
-def main(reports_dir: Path = REPORTS_DIR):
+def main(
+        reports_dir: Path = REPORTS_DIR,
+        html: bool = typer.Option(False, help="Also write analysis_report.html"),
+        use_cache: bool = typer.Option(True, help="Only re-render sections whose inputs changed"),
+):
     logger.info("Begin analysis_report.md update")
 
     # Read results
     with open(reports_dir / 'results.yaml', 'r') as f:
-        results = yaml.safe_load(f)
-
-    # Read markdown template
-    with open(reports_dir / 'analysis_report_template.md', 'r') as f:
-        markdown = f.read()
-
-    # Replace placeholders
-    for key, value in results.items():
-        placeholder = f'${{{key}}}'
-        if placeholder in markdown:
-            logger.info(f"'{placeholder}' placeholder found!")
-        else:
-            logger.warning(f"'{placeholder}' placeholder not found in markdown")
-        markdown = markdown.replace(placeholder, str(value))
-
-    # Replace table placeholders
-    table_pattern = r'%{(table_[^}]+)}'
-    tables = re.findall(table_pattern, markdown)
-
-    for table_id in tables:
-        table_file = reports_dir / 'figures' / f'{table_id}.md'
-        if table_file.exists():
-            with open(table_file, 'r') as f:
-                table_content = f.read().strip()
-                # Indent each line of the table content by 4 spaces
-                indented_table = '\n'.join('    ' + line for line in table_content.split('\n'))
-                # Add newline after the table while maintaining indentation for following content
-                formatted_content = f"\n{indented_table}\n"
-            markdown = markdown.replace(f'%{{{table_id}}}', formatted_content)
-        else:
-            logger.warning(f"Table file not found: {table_file}")
+        results = yaml.safe_load(f) or {}
+
+    # Render the timings of the pipeline stages
+    if (reports_dir / 'timings.yaml').exists():
+        profiling.save_timings_table(
+            reports_dir / 'timings.yaml', filename=reports_dir / 'figures' / 'table_pipeline_timings.md'
+        )
+
+    # Compile the template once and resolve all placeholders in a single pass
+    template = ReportTemplate.from_file(reports_dir / 'analysis_report_template.md')
+    markdown, summary = template.render(
+        results,
+        tables_dir=reports_dir / 'figures',
+        cache_path=reports_dir / 'report_cache.json' if use_cache else None,
+    )
+
+    for key in summary.missing_values:
+        logger.warning(f"'${{{key}}}' placeholder has no value in results.yaml")
+    for table_id in summary.missing_tables:
+        logger.warning(f"Table file not found: {reports_dir / 'figures' / f'{table_id}.md'}")
+    for key in summary.unused_values:
+        logger.warning(f"'{key}' of results.yaml is not used in the template")
+    logger.info(
+        f"{len(summary.rendered_sections)} sections rendered, {len(summary.reused_sections)} reused from cache"
+    )
 
     # Write updated markdown
     with open(reports_dir / 'analysis_report.md', 'w') as f:
         f.write(markdown)
 
+    if html:
+        document = markdown_to_html(markdown)
+        if document is not None:
+            with open(reports_dir / 'analysis_report.html', 'w') as f:
+                f.write(document)
+            logger.info(f"HTML report saved to {reports_dir / 'analysis_report.html'}")
+
     logger.success("analysis_report.md updated")
 
 